@@ -1,9 +1,13 @@
 import sys
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QApplication
+from sigminer.core.preload import preload_modules
 from sigminer.ui.main_window import MainWindow
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    # Import the model and HTML libraries while the user signs in
+    QTimer.singleShot(0, preload_modules)
     sys.exit(app.exec_())
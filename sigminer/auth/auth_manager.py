@@ -1,6 +1,13 @@
 from msal import PublicClientApplication, SerializableTokenCache
 import os
 
+try:
+    import fcntl
+except ImportError:  # Windows, where the cache is written without a lock
+    fcntl = None
+
+GRAPH_SCOPES = ["User.Read", "Mail.Read", "Mail.Read.Shared"]
+
 
 class AuthManager:
     # Define the path to the token cache file
@@ -13,6 +20,8 @@ class AuthManager:
     )
 
     def __init__(self, client_id, tenant_id):
+        self.client_id = client_id
+        self.tenant_id = tenant_id
         authority = f"https://login.microsoftonline.com/{tenant_id}"
         self.app = PublicClientApplication(client_id, authority=authority)
 
@@ -21,12 +30,29 @@ class AuthManager:
             self.token_cache.deserialize(open(self.CACHE_PATH, "r").read())
         self.app.token_cache = self.token_cache
 
-    def get_access_token(self, scopes):
+    def acquire_token_silent(self, scopes, force_refresh=False):
+        """Returns the MSAL result of a token refreshed from the cache, without any prompt."""
         accounts = self.app.get_accounts()
+        result = None
         if accounts:
-            result = self.app.acquire_token_silent(scopes=scopes, account=accounts[0])
-            if result and "access_token" in result:
-                return result["access_token"]
+            # Only bypasses the cached access token when asked, e.g. after a 401
+            options = {"force_refresh": True} if force_refresh else {}
+            result = self.app.acquire_token_silent(
+                scopes=scopes, account=accounts[0], **options
+            )
+        if not (result and "access_token" in result):
+            raise Exception(
+                "Unable to obtain a token silently: sign in once from the app to fill the token cache."
+            )
+        self.save_cache()
+        return result
+
+    def get_access_token(self, scopes, interactive=True):
+        try:
+            return self.acquire_token_silent(scopes)["access_token"]
+        except Exception:
+            if not interactive:
+                raise
 
         result = self.app.acquire_token_interactive(scopes=scopes)
         if "access_token" in result:
@@ -35,7 +61,18 @@ class AuthManager:
         raise Exception(f"Unable to obtain a token: {result.get('error_description')}")
 
     def save_cache(self):
+        """
+        Writes the token cache when it changed.
+
+        Shard processes refresh tokens too, so writers take a lock and replace the file
+        atomically: a process loading the cache never reads it half written.
+        """
         if self.token_cache.has_state_changed:
             os.makedirs(os.path.dirname(self.CACHE_PATH), exist_ok=True)
-            with open(self.CACHE_PATH, "w") as f:
-                f.write(self.token_cache.serialize())
+            with open(f"{self.CACHE_PATH}.lock", "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                temporary_path = f"{self.CACHE_PATH}.{os.getpid()}.tmp"
+                with open(temporary_path, "w") as f:
+                    f.write(self.token_cache.serialize())
+                os.replace(temporary_path, self.CACHE_PATH)
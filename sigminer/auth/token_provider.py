@@ -0,0 +1,78 @@
+import threading
+import time
+from typing import Optional, Protocol
+
+# Seconds before expiry at which a token is refreshed
+DEFAULT_REFRESH_MARGIN = 300
+
+
+class TokenProvider(Protocol):
+    def get_token(self, force_refresh: bool = False) -> str: ...
+
+
+class StaticTokenProvider:
+    """Provides a token obtained elsewhere, which cannot be refreshed."""
+
+    def __init__(self, access_token: str) -> None:
+        self.access_token = access_token
+
+    def get_token(self, force_refresh: bool = False) -> str:
+        return self.access_token
+
+
+class MsalTokenProvider:
+    """
+    Provides Graph tokens refreshed silently through MSAL before they expire.
+
+    Tokens come from the cache persisted by `AuthManager`, so a run lasting longer than
+    a token keeps going without signing in again. Worker threads share the provider,
+    and pickling it for a worker process only carries what is needed to rebuild it.
+    """
+
+    def __init__(
+        self,
+        auth_manager,
+        scopes: Optional[list[str]] = None,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+    ) -> None:
+        from sigminer.auth.auth_manager import GRAPH_SCOPES
+
+        self.auth_manager = auth_manager
+        self.scopes = scopes or GRAPH_SCOPES
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.access_token: Optional[str] = None
+        self.expires_at = 0.0
+        self.total_refreshes = 0
+
+    def get_token(self, force_refresh: bool = False) -> str:
+        with self.lock:
+            if (
+                force_refresh
+                or self.access_token is None
+                or time.time() >= self.expires_at - self.refresh_margin
+            ):
+                result = self.auth_manager.acquire_token_silent(
+                    self.scopes, force_refresh=force_refresh
+                )
+                self.access_token = result["access_token"]
+                self.expires_at = time.time() + float(result.get("expires_in", 0))
+                self.total_refreshes += 1
+            return self.access_token
+
+    def __getstate__(self) -> dict:
+        return {
+            "client_id": self.auth_manager.client_id,
+            "tenant_id": self.auth_manager.tenant_id,
+            "scopes": self.scopes,
+            "refresh_margin": self.refresh_margin,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        from sigminer.auth.auth_manager import AuthManager
+
+        self.__init__(
+            AuthManager(state["client_id"], state["tenant_id"]),
+            state["scopes"],
+            state["refresh_margin"],
+        )
@@ -0,0 +1,172 @@
+import json
+import re
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from sigminer.bench.runner import run_offline_extraction
+from sigminer.bench.synthetic import SyntheticMailbox
+from sigminer.core.llm.multi_modal_llm import Completion
+from sigminer.core.models.extraction import LauncherConfig
+
+# Settings of a preset that do not apply to a local corpus, or would stop the run early
+CORPUS_IGNORED_SETTINGS = (
+    "mailboxes",
+    "scope",
+    "mirror_mode",
+    "mirror_path",
+    "shard_processes",
+    "budget",
+)
+
+
+def load_corpus(path: str) -> SyntheticMailbox:
+    """
+    Loads a labeled corpus from a JSON file.
+
+    The file holds Graph-shaped `messages`, the `attachments` of each message ID, and
+    the expected field values of each sender address under `labels`.
+    """
+    with open(path, "r") as corpus_file:
+        data = json.load(corpus_file)
+    return SyntheticMailbox(
+        messages=data["messages"],
+        attachments=data.get("attachments", {}),
+        contacts={
+            normalize_address(address): labels for address, labels in data["labels"].items()
+        },
+    )
+
+
+def save_corpus(corpus: SyntheticMailbox, path: str) -> None:
+    """Saves a corpus in the format read by `load_corpus`."""
+    data = asdict(corpus)
+    data["labels"] = data.pop("contacts")
+    with open(path, "w") as corpus_file:
+        json.dump(data, corpus_file)
+
+
+def normalize_address(address: str) -> str:
+    """Normalizes a sender address for matching contacts to labels, ignoring case."""
+    return address.strip().casefold()
+
+
+def normalize_value(value: Optional[str]) -> str:
+    """Normalizes a field value for comparison: case and whitespace are ignored."""
+    if value in (None, "null", "0"):
+        return ""
+    return re.sub(r"\s+", " ", str(value)).strip().casefold()
+
+
+def get_scores(true_positives: int, false_positives: int, false_negatives: int) -> Dict:
+    predicted = true_positives + false_positives
+    expected = true_positives + false_negatives
+    precision = true_positives / predicted if predicted else 0.0
+    recall = true_positives / expected if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "true_positives": true_positives,
+        "false_positives": false_positives,
+        "false_negatives": false_negatives,
+    }
+
+
+def score_contacts(
+    contacts: Dict[str, Dict], labels: Dict[str, Dict[str, str]], field_names: list[str]
+) -> Dict[str, Dict]:
+    """
+    Scores extracted contacts against the labels, per field and overall.
+
+    Only labeled senders are scored. A wrong value counts both as a false positive and
+    as a false negative, and an empty label means the field should not be extracted.
+
+    Returns:
+        Dict[str, Dict]: The scores of each field, and the micro average under `all`.
+    """
+    # Contacts are keyed by the address as sent, in any case
+    contacts = {normalize_address(address): contact for address, contact in contacts.items()}
+    counts = {field_name: [0, 0, 0] for field_name in field_names}
+    for address, expected_fields in labels.items():
+        contact = contacts.get(normalize_address(address), {})
+        for field_name in field_names:
+            expected = normalize_value(expected_fields.get(field_name))
+            predicted = normalize_value(contact.get(field_name))
+            field_counts = counts[field_name]
+            if predicted and predicted == expected:
+                field_counts[0] += 1
+                continue
+            if predicted:
+                field_counts[1] += 1
+            if expected:
+                field_counts[2] += 1
+    scores = {field_name: get_scores(*field_counts) for field_name, field_counts in counts.items()}
+    scores["all"] = get_scores(*[sum(column) for column in zip(*counts.values())])
+    return scores
+
+
+def get_evaluation_config(
+    preset: dict,
+    model: Optional[str] = None,
+    escalation_model: Optional[str] = None,
+    truncation_strategy: Optional[str] = None,
+) -> LauncherConfig:
+    """Builds the configuration of a preset run over a whole local corpus."""
+    config = {
+        key: value for key, value in preset.items() if key not in CORPUS_IGNORED_SETTINGS
+    }
+    config["max_emails"] = None
+    # Batch runs go through the Batch API, which the model backend does not stand in for
+    config["execution_mode"] = "interactive"
+    config["exclusion_guideline"] = preset.get("exclusion_guideline") or None
+    config["file_path"] = ""
+    if model:
+        config["model"] = model
+    if escalation_model:
+        config["escalation_model"] = escalation_model
+    if truncation_strategy:
+        config["truncation_strategy"] = truncation_strategy
+    return config
+
+
+def run_evaluation(
+    corpus: SyntheticMailbox,
+    launcher_config: LauncherConfig,
+    completion: Optional[Completion] = None,
+) -> dict:
+    """
+    Runs a configuration over a labeled corpus and reports its accuracy next to its cost.
+
+    Args:
+        corpus (SyntheticMailbox): The messages and the expected fields of their senders.
+        launcher_config (LauncherConfig): The configuration to evaluate.
+        completion (Optional[Completion]): The model backend. If None, LiteLLM.
+
+    Returns:
+        dict: Per-field precision and recall, tokens, cost and latency of the run.
+    """
+    run = run_offline_extraction(corpus, launcher_config, completion)
+    engine = run.engine
+    field_names = [field["field_name"] for field in launcher_config["fields"]]
+    usage = engine.llm.usage.values()
+    requests = sum(stats["requests"] for stats in usage)
+    emails = len(corpus.messages)
+    return {
+        "model": launcher_config["model"],
+        "escalation_model": launcher_config.get("escalation_model"),
+        "truncation_strategy": launcher_config.get("truncation_strategy", "head_tail"),
+        "emails": emails,
+        "labeled_contacts": len(corpus.contacts),
+        "scores": score_contacts(engine.existing_contacts, corpus.contacts, field_names),
+        "prompt_tokens": sum(stats["prompt_tokens"] for stats in usage),
+        "cached_tokens": sum(stats["cached_tokens"] for stats in usage),
+        "completion_tokens": sum(stats["completion_tokens"] for stats in usage),
+        "total_cost": engine.total_cost,
+        "cost_per_email": engine.total_cost / emails if emails else 0.0,
+        "llm_requests": requests,
+        "llm_latency_ms": (
+            sum(stats["latency"] for stats in usage) / requests * 1000 if requests else 0.0
+        ),
+        "elapsed_seconds": run.elapsed_seconds,
+    }
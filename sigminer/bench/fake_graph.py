@@ -0,0 +1,123 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from sigminer.bench.synthetic import SyntheticMailbox
+
+# Page size Graph uses when a listing has no $top
+GRAPH_DEFAULT_PAGE_SIZE = 10
+
+MESSAGES_PATH = re.compile(
+    r"^/v1\.0/(?:me|users/[^/]+)(?:/mailFolders/[^/]+)?/messages(/(?:\$|%24)count)?$"
+)
+ATTACHMENTS_PATH = re.compile(r"^/v1\.0/(?:me|users/[^/]+)/messages/([^/]+)/attachments$")
+
+
+class FakeGraphServer:
+    """
+    Serves a synthetic mailbox over HTTP the way Graph lists messages and attachments.
+
+    Every mailbox and folder serves the same messages, paged with `$top` and `$skip`.
+    Responses can be delayed, and a share of them throttled with a 429 and a zero
+    `Retry-After`, to exercise the retries of the client.
+
+    Use as a context manager, and point the email manager to `base_url`.
+    """
+
+    def __init__(
+        self,
+        mailbox: SyntheticMailbox,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.mailbox = mailbox
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.total_requests = 0
+        self.total_throttled = 0
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1.0"
+
+    def __enter__(self) -> "FakeGraphServer":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                status, headers, body = fake.handle(self.path)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def handle(self, path: str) -> tuple[int, Dict[str, str], bytes]:
+        """Returns the status, headers and body of the response to a GET request."""
+        with self.lock:
+            self.total_requests += 1
+            throttled = self.random.random() < self.throttle_rate
+            if throttled:
+                self.total_throttled += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return 429, {"Retry-After": "0"}, b""
+
+        url = urlsplit(path)
+        params = dict(parse_qsl(url.query))
+        messages_match = MESSAGES_PATH.match(url.path)
+        if messages_match and messages_match.group(1):
+            return 200, {"Content-Type": "text/plain"}, str(len(self.mailbox.messages)).encode()
+        if messages_match:
+            return self.json_response(self.list_messages(url.path, params))
+        attachments_match = ATTACHMENTS_PATH.match(url.path)
+        if attachments_match:
+            attachments = self.mailbox.attachments.get(attachments_match.group(1))
+            if attachments is None:
+                return 404, {}, b""
+            return self.json_response({"value": attachments})
+        return 404, {}, b""
+
+    def list_messages(self, path: str, params: Dict[str, str]) -> Dict:
+        top = int(params.get("$top", GRAPH_DEFAULT_PAGE_SIZE))
+        skip = int(params.get("$skip", 0))
+        fields = params.get("$select", "").split(",") if params.get("$select") else None
+        page: List[Dict] = self.mailbox.messages[skip : skip + top]
+        if fields:
+            page = [{key: message[key] for key in fields if key in message} for message in page]
+        data: Dict = {"value": page}
+        if skip + top < len(self.mailbox.messages):
+            next_params = {**params, "$skip": str(skip + top)}
+            data["@odata.nextLink"] = f"{self.base_url}{path[len('/v1.0'):]}?{urlencode(next_params)}"
+        return data
+
+    @staticmethod
+    def json_response(data: Dict) -> tuple[int, Dict[str, str], bytes]:
+        return 200, {"Content-Type": "application/json"}, json.dumps(data).encode()
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import random
+import re
+import uuid
+from typing import Any, Dict, List, Optional
+
+from litellm import ModelResponse
+
+FIELD_QUERY = re.compile(r"Extract this metadata: (.+?)\.")
+# Characters per token of English text, to report plausible prompt sizes
+CHARS_PER_TOKEN = 4
+
+
+class FakeLLMError(Exception):
+    pass
+
+
+def get_text(messages: List[Dict[str, Any]]) -> str:
+    """Returns the text parts of the messages of a request, without images."""
+    texts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        elif isinstance(content, list):
+            texts.extend(part.get("text", "") for part in content if part.get("type") == "text")
+    return "\n".join(texts)
+
+
+def find_labeled_value(text: str, label: str) -> str:
+    """Returns the value written after `label:` in the text, as in synthetic signatures."""
+    match = re.search(rf"{re.escape(label)}:\s*([^<\n]+)", text, re.IGNORECASE)
+    return match.group(1).strip() if match else ""
+
+
+class FakeCompletion:
+    """
+    Stands in for `litellm.acompletion`, without network nor API key.
+
+    Metadata answers are read from `Field: value` lines of the email, as written in
+    the signatures of synthetic mailboxes, and exclusion checks always answer False.
+    Latency, token counts and a share of failed requests are configurable. Failed
+    requests are retried as many times as the caller asks through `num_retries`, like
+    LiteLLM does.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: int = 50,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.total_requests = 0
+        self.total_errors = 0
+
+    async def __call__(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        num_retries: int = 0,
+        **kwargs: Any,
+    ) -> ModelResponse:
+        for attempt in range(num_retries + 1):
+            self.total_requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.random.random() >= self.error_rate:
+                return self.respond(model, messages, tools)
+            self.total_errors += 1
+        raise FakeLLMError(f"Fake {model} request failed {num_retries + 1} times")
+
+    def respond(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+    ) -> ModelResponse:
+        text = get_text(messages)
+        prompt_tokens = self.prompt_tokens or max(len(text) // CHARS_PER_TOKEN, 1)
+        message: Dict[str, Any] = {"role": "assistant", "content": None}
+        if tools:
+            function = tools[0]["function"]
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {
+                        "name": function["name"],
+                        "arguments": json.dumps(self.answer(function["parameters"], text)),
+                    },
+                }
+            ]
+        else:
+            message["content"] = ""
+        return ModelResponse(
+            model=model,
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "tool_calls" if tools else "stop",
+                    "message": message,
+                }
+            ],
+            usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": prompt_tokens + self.completion_tokens,
+            },
+        )
+
+    @staticmethod
+    def answer(parameters: Dict[str, Any], text: str) -> Dict[str, Any]:
+        """Fills the answer tool arguments from the prompt text."""
+        if parameters.get("properties", {}).get("answer", {}).get("type") == "boolean":
+            return {"answer": False}
+        field_match = FIELD_QUERY.search(text)
+        value = find_labeled_value(text, field_match.group(1)) if field_match else ""
+        return {
+            "thoughtProcess": "Read from the signature." if value else "Not found.",
+            "answer": value,
+            "confidence_score": 0.95 if value else 0.1,
+        }
@@ -0,0 +1,182 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional, Type
+
+from sigminer.bench.fake_graph import FakeGraphServer
+from sigminer.bench.fake_llm import FakeCompletion
+from sigminer.bench.synthetic import SIGNATURE_FIELDS, SyntheticMailbox, generate_mailbox
+from sigminer.core.extraction_engine import ExtractionEngine
+from sigminer.core.llm.multi_modal_llm import Completion
+from sigminer.core.loop_monitor import get_percentile
+from sigminer.core.models.extraction import LauncherConfig
+
+BENCHMARK_MODEL = "gpt-4o-mini"
+
+
+@dataclass
+class BenchmarkOptions:
+    emails: int = 200
+    senders: Optional[int] = None
+    thread_depth: int = 2
+    signature_variety: int = 3
+    image_rate: float = 0.2
+    graph_latency: float = 0.0
+    graph_throttle_rate: float = 0.0
+    llm_latency: float = 0.05
+    llm_prompt_tokens: Optional[int] = None
+    llm_completion_tokens: int = 50
+    llm_error_rate: float = 0.0
+    max_concurrent_emails: int = 20
+    stream_emails: bool = True
+    seed: int = 0
+
+
+class BenchmarkEngine(ExtractionEngine):
+    """Extraction engine recording the time spent on each email."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.email_latencies: list[float] = []
+
+    async def process_email(self, email: dict, total_emails: int):
+        start_time = time.perf_counter()
+        try:
+            await super().process_email(email, total_emails)
+        finally:
+            self.email_latencies.append(time.perf_counter() - start_time)
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    """Returns the peak resident memory of the process in MiB, or None where unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def get_benchmark_config(options: BenchmarkOptions) -> LauncherConfig:
+    return {
+        "fields": [
+            {"field_name": field_name, "guideline": "", "can_be_overwritten": False}
+            for field_name in SIGNATURE_FIELDS
+        ],
+        "excluded_hosts": [],
+        "include_mode": False,
+        "file_path": "",
+        "max_emails": options.emails,
+        "model": BENCHMARK_MODEL,
+        "exclusion_guideline": None,
+        "max_concurrent_emails": options.max_concurrent_emails,
+        "stream_emails": options.stream_emails,
+    }
+
+
+@dataclass
+class OfflineRun:
+    engine: ExtractionEngine
+    elapsed_seconds: float
+    graph_requests: int
+
+
+def run_offline_extraction(
+    mailbox: SyntheticMailbox,
+    launcher_config: LauncherConfig,
+    completion: Optional[Completion] = None,
+    graph_latency: float = 0.0,
+    graph_throttle_rate: float = 0.0,
+    seed: int = 0,
+    engine_class: Type[ExtractionEngine] = ExtractionEngine,
+) -> OfflineRun:
+    """
+    Runs an extraction on a local mailbox served by a fake Graph server.
+
+    The contacts and the process log are written to a temporary directory. The
+    completion function defaults to LiteLLM, so real models can be evaluated too.
+    """
+    with tempfile.TemporaryDirectory() as directory, FakeGraphServer(
+        mailbox, graph_latency, graph_throttle_rate, seed
+    ) as graph:
+        engine = engine_class(
+            "offline-token",
+            {**launcher_config, "file_path": os.path.join(directory, "contacts.csv")},
+            log_path=os.path.join(directory, "process_log.txt"),
+            completion=completion,
+            graph_base_url=graph.base_url,
+        )
+        # The graph client retries throttled requests without waiting on a fake server
+        engine.email_manager.client.backoff_max = 0.0
+        start_time = time.perf_counter()
+        asyncio.run(engine.launch_extraction())
+        elapsed = time.perf_counter() - start_time
+        return OfflineRun(engine, elapsed, graph.total_requests)
+
+
+def run_benchmark(options: BenchmarkOptions) -> dict:
+    """
+    Runs an extraction end to end on a synthetic mailbox, against a local fake Graph
+    server and a fake LLM, and reports its throughput.
+
+    The same engine as the app and the CLI runs, so the report measures everything
+    but the network and the model: listing, HTML parsing, image loading, prompt
+    building, schema validation and CSV writing.
+
+    Returns:
+        dict: The options of the run and its throughput, latency, memory and token counts.
+    """
+    mailbox = generate_mailbox(
+        options.emails,
+        options.senders,
+        options.thread_depth,
+        options.signature_variety,
+        options.image_rate,
+        options.seed,
+    )
+    completion = FakeCompletion(
+        options.llm_latency,
+        options.llm_prompt_tokens,
+        options.llm_completion_tokens,
+        options.llm_error_rate,
+        options.seed,
+    )
+    run = run_offline_extraction(
+        mailbox,
+        get_benchmark_config(options),
+        completion,
+        options.graph_latency,
+        options.graph_throttle_rate,
+        options.seed,
+        BenchmarkEngine,
+    )
+    engine, elapsed = run.engine, run.elapsed_seconds
+
+    usage = engine.llm.usage.values()
+    total_tokens = sum(stats["prompt_tokens"] + stats["completion_tokens"] for stats in usage)
+    contacts = len(engine.existing_contacts)
+    processed = len(engine.email_latencies)
+    return {
+        "options": asdict(options),
+        "emails": processed,
+        "contacts": contacts,
+        "elapsed_seconds": elapsed,
+        "emails_per_second": processed / elapsed if elapsed else 0.0,
+        "latency_p50_ms": get_percentile(engine.email_latencies, 50) * 1000,
+        "latency_p95_ms": get_percentile(engine.email_latencies, 95) * 1000,
+        "peak_rss_mb": get_peak_rss_mb(),
+        "loop_lag_p95_ms": get_percentile(engine.loop_monitor.lags, 95) * 1000,
+        "loop_lag_max_ms": max(engine.loop_monitor.lags, default=0.0) * 1000,
+        "loop_blocked": engine.loop_monitor.total_blocked,
+        "tokens_per_contact": total_tokens / contacts if contacts else 0.0,
+        "llm_requests": completion.total_requests,
+        "llm_errors": completion.total_errors,
+        "llm_failed_queries": engine.total_llm_errors,
+        "graph_requests": run.graph_requests,
+        "graph_retries": engine.email_manager.client.total_retries,
+        "total_cost": engine.total_cost,
+    }
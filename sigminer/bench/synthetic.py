@@ -0,0 +1,136 @@
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+# Smallest valid PNG, enough for the image pipeline to fetch and encode
+PIXEL_PNG_BASE64 = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+SIGNATURE_FIELDS = ["Job title", "Company", "Phone"]
+
+FIRST_NAMES = ["Alice", "Bruno", "Chloe", "Dmitri", "Emma", "Farid", "Grace", "Hugo", "Ines", "Jonas"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Garcia", "Smith", "Nguyen", "Rossi", "Schmidt", "Kowalski"]
+JOB_TITLES = ["Sales Manager", "CTO", "Account Executive", "Buyer", "Head of Procurement", "Founder"]
+COMPANIES = ["Contoso", "Fabrikam", "Northwind", "Tailspin", "Litware", "Adventure Works"]
+HOSTS = ["contoso.com", "fabrikam.com", "northwind.io", "tailspin.net", "gmail.com", "outlook.com"]
+PARAGRAPHS = [
+    "Following up on our call, please find the proposal attached.",
+    "Could we move the meeting to Thursday afternoon?",
+    "Thanks for the quick turnaround on the invoice.",
+    "We are reviewing the contract and will come back to you next week.",
+    "Let me know if the new pricing works for your team.",
+]
+
+
+@dataclass
+class SyntheticMailbox:
+    messages: List[Dict]
+    attachments: Dict[str, List[Dict]]
+    # Expected field values per sender address, as written in their signatures
+    contacts: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+
+def make_sender(rng: random.Random, index: int) -> Dict[str, str]:
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "name": f"{first_name} {last_name}",
+        "address": f"{first_name}.{last_name}.{index}@{rng.choice(HOSTS)}".lower(),
+        "Job title": rng.choice(JOB_TITLES),
+        "Company": rng.choice(COMPANIES),
+        "Phone": f"+33 1 {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)}",
+    }
+
+
+def make_signature(sender: Dict[str, str], variant: int) -> str:
+    """Renders one of several signature layouts, all carrying the labeled fields."""
+    lines = [f"{label}: {sender[label]}" for label in SIGNATURE_FIELDS]
+    if variant % 3 == 1:
+        lines.reverse()
+    if variant % 3 == 2:
+        return f"<table><tr><td><b>{sender['name']}</b></td></tr>" + "".join(
+            f"<tr><td>{line}</td></tr>" for line in lines
+        ) + "</table>"
+    return f"<p>--<br>{sender['name']}<br>" + "<br>".join(lines) + "</p>"
+
+
+def make_body(
+    rng: random.Random,
+    sender: Dict[str, str],
+    signature: str,
+    thread_depth: int,
+    image_cid: Optional[str],
+) -> str:
+    body = f"<p>Hello,</p><p>{rng.choice(PARAGRAPHS)}</p>{signature}"
+    if image_cid:
+        body += f'<img src="cid:{image_cid}" alt="logo">'
+    # Earlier messages of the thread are quoted below the reply, as mail clients do
+    for depth in range(thread_depth):
+        body += (
+            f"<blockquote><p>On a previous day, {sender['name']} wrote:</p>"
+            f"<p>{rng.choice(PARAGRAPHS)}</p>"
+        )
+    body += "</blockquote>" * thread_depth
+    return f"<html><body>{body}</body></html>"
+
+
+def generate_mailbox(
+    size: int = 100,
+    senders: Optional[int] = None,
+    thread_depth: int = 2,
+    signature_variety: int = 3,
+    image_rate: float = 0.2,
+    seed: int = 0,
+) -> SyntheticMailbox:
+    """
+    Generates a mailbox shaped like Graph message listings, for benchmarks and evaluations.
+
+    Args:
+        size (int): Number of messages.
+        senders (Optional[int]): Number of distinct senders. If None, a quarter of the messages.
+        thread_depth (int): Number of earlier messages quoted in each body.
+        signature_variety (int): Number of signature layouts in use.
+        image_rate (float): Share of messages with an inline image.
+        seed (int): Seed of the generator, the same seed giving the same mailbox.
+
+    Returns:
+        SyntheticMailbox: The messages, their attachments and the expected contact fields.
+    """
+    rng = random.Random(seed)
+    sender_pool = [make_sender(rng, index) for index in range(senders or max(size // 4, 1))]
+    received = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    mailbox = SyntheticMailbox(messages=[], attachments={})
+    for index in range(size):
+        sender = rng.choice(sender_pool)
+        message_id = f"msg-{index:06d}"
+        image_cid = f"image{index}@sigminer" if rng.random() < image_rate else None
+        signature = make_signature(sender, rng.randrange(max(signature_variety, 1)))
+        received += timedelta(minutes=rng.randint(1, 240))
+        mailbox.messages.append(
+            {
+                "id": message_id,
+                "subject": f"RE: {rng.choice(PARAGRAPHS)[:40]}",
+                "body": {
+                    "contentType": "html",
+                    "content": make_body(rng, sender, signature, thread_depth, image_cid),
+                },
+                "from": {"emailAddress": {"name": sender["name"], "address": sender["address"]}},
+                "receivedDateTime": received.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        )
+        mailbox.attachments[message_id] = (
+            [
+                {
+                    "contentId": image_cid,
+                    "contentType": "image/png",
+                    "contentBytes": PIXEL_PNG_BASE64,
+                    "isInline": True,
+                }
+            ]
+            if image_cid
+            else []
+        )
+        mailbox.contacts[sender["address"]] = {
+            label: sender[label] for label in SIGNATURE_FIELDS
+        }
+    return mailbox
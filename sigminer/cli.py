@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import sys
+from datetime import datetime
+from typing import List, Optional
+
+from sigminer.auth.token_provider import MsalTokenProvider, StaticTokenProvider, TokenProvider
+from sigminer.config.config_manager import ConfigManager
+from sigminer.core.email.html_parsing import HTML_PARSERS
+from sigminer.core.email.mirror import MIRROR_MODES
+from sigminer.core.models.extraction import LauncherConfig
+from sigminer.core.tracing import TRACE_FORMATS
+
+TOKEN_ENV_VAR = "SIGMINER_ACCESS_TOKEN"
+
+
+def print_event(event: str, **data) -> None:
+    """Prints a structured progress event as a JSON line."""
+    print(json.dumps({"time": datetime.now().isoformat(), "event": event, **data}), flush=True)
+
+
+def launcher_config_from_preset(preset: dict, args: argparse.Namespace) -> LauncherConfig:
+    """Builds a launcher configuration from a preset saved in the app."""
+    config = dict(preset)
+    max_emails = args.max_emails if args.max_emails is not None else preset.get("max_emails")
+    config["max_emails"] = int(max_emails) if max_emails else None
+    config["exclusion_guideline"] = preset.get("exclusion_guideline") or None
+    if args.file_path:
+        config["file_path"] = args.file_path
+    if args.mailbox:
+        config["mailboxes"] = args.mailbox
+    scope = dict(preset.get("scope") or {})
+    for key in ("folders", "received_after", "received_before", "filter", "search"):
+        if getattr(args, key):
+            scope[key] = getattr(args, key)
+    config["scope"] = scope or None
+    if args.shard_processes:
+        config["shard_processes"] = args.shard_processes
+    if args.html_parser:
+        config["html_parser"] = args.html_parser
+    if args.parse_executor:
+        config["parse_executor"] = args.parse_executor
+    if args.parse_workers:
+        config["parse_workers"] = args.parse_workers
+    if args.prefetch_pages:
+        config["prefetch_pages"] = args.prefetch_pages
+    if args.no_stream:
+        config["stream_emails"] = False
+    if args.mirror:
+        config["mirror_mode"] = args.mirror
+    if args.mirror_path:
+        config["mirror_path"] = args.mirror_path
+    if args.trace_file:
+        config["trace_path"] = args.trace_file
+        config["trace_format"] = args.trace_format
+    if args.metrics_port is not None:
+        config["metrics_port"] = args.metrics_port
+    if args.metrics_textfile:
+        config["metrics_textfile"] = args.metrics_textfile
+    if args.profile:
+        config["profile"] = True
+        config["profile_seconds"] = args.profile_seconds
+        config["slow_callback_threshold"] = args.slow_callback_ms / 1000
+    if args.loop_block_ms is not None:
+        config["loop_blocking_threshold"] = args.loop_block_ms / 1000
+    return config
+
+
+def get_token_provider(args: argparse.Namespace, config_manager: ConfigManager) -> TokenProvider:
+    if args.token_source == "env":
+        token = os.environ.get(args.token_env)
+        if not token:
+            raise Exception(f"The {args.token_env} environment variable is not set.")
+        return StaticTokenProvider(token)
+
+    if args.token_source == "file":
+        if not args.token_file:
+            raise Exception("--token-file is required with --token-source file.")
+        with open(args.token_file, "r") as token_file:
+            return StaticTokenProvider(token_file.read().strip())
+
+    from sigminer.auth.auth_manager import GRAPH_SCOPES, AuthManager
+
+    # Refreshed silently from the MSAL cache, so runs can outlive a token
+    auth_manager = AuthManager(config_manager.get_client_id(), config_manager.get_tenant_id())
+    return MsalTokenProvider(auth_manager, GRAPH_SCOPES)
+
+
+async def run_engine(engine) -> None:
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        # Signal handlers are not available on Windows event loops
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signal_number, engine.stop)
+    await engine.launch_extraction()
+
+
+def run_extract(args: argparse.Namespace) -> int:
+    from sigminer.core.extraction_engine import ExtractionEngine
+    from sigminer.core.preload import preload_modules
+
+    # Import the model and HTML libraries while the token is fetched
+    preload_modules()
+    config_manager = ConfigManager()
+    if args.preset not in config_manager.get_all_presets():
+        print_event("error", message=f"Preset '{args.preset}' not found.")
+        return 2
+
+    try:
+        launcher_config = launcher_config_from_preset(config_manager.get_preset(args.preset), args)
+        token_provider = get_token_provider(args, config_manager)
+        access_token = token_provider.get_token()
+    except Exception as e:
+        print_event("error", message=str(e))
+        return 2
+
+    last_progress = None
+
+    def on_progress(progress: int) -> None:
+        nonlocal last_progress
+        if progress != last_progress:
+            last_progress = progress
+            print_event("progress", progress=progress)
+
+    engine = ExtractionEngine(
+        access_token,
+        launcher_config,
+        on_log=lambda message, level: print_event("log", message=message, level=level),
+        on_progress=on_progress,
+        log_path=args.log_file,
+        token_provider=token_provider,
+    )
+
+    try:
+        asyncio.run(run_engine(engine))
+    except Exception as e:
+        print_event("error", message=str(e))
+        return 1
+
+    print_event(
+        "finished",
+        status="stopped" if engine.total_emails_skipped else "completed",
+        total_cost=engine.total_cost,
+        total_contacts_processed=engine.total_contacts_processed,
+        total_meta_found=engine.total_meta_found,
+    )
+    return 0
+
+
+def run_bench(args: argparse.Namespace) -> int:
+    from sigminer.bench.runner import BenchmarkOptions, run_benchmark
+
+    options = BenchmarkOptions(
+        emails=args.emails,
+        senders=args.senders,
+        thread_depth=args.thread_depth,
+        signature_variety=args.signature_variety,
+        image_rate=args.image_rate,
+        graph_latency=args.graph_latency,
+        graph_throttle_rate=args.graph_throttle_rate,
+        llm_latency=args.llm_latency,
+        llm_prompt_tokens=args.llm_prompt_tokens,
+        llm_completion_tokens=args.llm_completion_tokens,
+        llm_error_rate=args.llm_error_rate,
+        max_concurrent_emails=args.max_concurrent_emails,
+        stream_emails=not args.no_stream,
+        seed=args.seed,
+    )
+    try:
+        report = run_benchmark(options)
+    except Exception as e:
+        print_event("error", message=str(e))
+        return 1
+    print_event("benchmark", **report)
+    return 0
+
+
+def run_eval(args: argparse.Namespace) -> int:
+    from sigminer.bench.evaluation import (
+        get_evaluation_config,
+        load_corpus,
+        run_evaluation,
+        save_corpus,
+    )
+    from sigminer.bench.fake_llm import FakeCompletion
+    from sigminer.bench.synthetic import generate_mailbox
+
+    config_manager = ConfigManager()
+    if args.preset not in config_manager.get_all_presets():
+        print_event("error", message=f"Preset '{args.preset}' not found.")
+        return 2
+    if bool(args.corpus) == bool(args.synthetic):
+        print_event("error", message="Pass either --corpus or --synthetic.")
+        return 2
+
+    try:
+        corpus = load_corpus(args.corpus) if args.corpus else generate_mailbox(args.synthetic)
+        if args.save_corpus:
+            save_corpus(corpus, args.save_corpus)
+        launcher_config = get_evaluation_config(
+            config_manager.get_preset(args.preset),
+            args.model,
+            args.escalation_model,
+            args.truncation_strategy,
+        )
+        completion = FakeCompletion() if args.backend == "fake" else None
+        report = run_evaluation(corpus, launcher_config, completion)
+    except Exception as e:
+        print_event("error", message=str(e))
+        return 1
+    print_event("evaluation", **report)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="sigminer", description="Run SigMiner extractions without the desktop app."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extract = subparsers.add_parser("extract", help="Run an extraction preset.")
+    extract.add_argument("--preset", required=True, help="Name of a preset saved in the app.")
+    extract.add_argument(
+        "--token-source",
+        choices=["env", "file", "msal"],
+        default="env",
+        help="Where to read the Graph access token from: an environment variable, a file, "
+        "or the MSAL token cache filled by the app.",
+    )
+    extract.add_argument("--token-env", default=TOKEN_ENV_VAR, help="Environment variable holding the token.")
+    extract.add_argument("--token-file", help="File holding the token.")
+    extract.add_argument("--file-path", help="CSV file to save contacts to, instead of the preset's.")
+    extract.add_argument("--max-emails", type=int, help="Maximum number of emails, instead of the preset's.")
+    extract.add_argument(
+        "--mailbox",
+        action="append",
+        help="User ID or address of a mailbox to process, instead of the preset's. "
+        "Repeat to process several mailboxes into the same CSV file.",
+    )
+    extract.add_argument(
+        "--folder",
+        dest="folders",
+        action="append",
+        help="Well-known name (e.g. inbox) or ID of a folder to process. Repeat for "
+        "several folders. All folders by default.",
+    )
+    extract.add_argument("--received-after", help="Only process emails received on or after this ISO date.")
+    extract.add_argument("--received-before", help="Only process emails received before this ISO date.")
+    extract.add_argument("--filter", help="Graph $filter predicate applied to the messages.")
+    extract.add_argument("--search", help="Graph $search query applied to the messages.")
+    extract.add_argument(
+        "--shard-processes",
+        type=int,
+        help="Number of worker processes to split the emails across, by sender.",
+    )
+    extract.add_argument(
+        "--html-parser",
+        choices=HTML_PARSERS,
+        help="HTML parser used to find inline images. lxml and selectolax are faster but optional.",
+    )
+    extract.add_argument(
+        "--parse-executor",
+        choices=["thread", "process"],
+        help="Pool running HTML parsing off the event loop.",
+    )
+    extract.add_argument("--parse-workers", type=int, help="Number of workers of the parsing pool.")
+    extract.add_argument(
+        "--prefetch-pages",
+        type=int,
+        help="Number of Graph pages requested ahead of the one being processed.",
+    )
+    extract.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="List every email before processing, instead of processing them as they arrive.",
+    )
+    extract.add_argument(
+        "--mirror",
+        choices=MIRROR_MODES,
+        help="Local mailbox mirror: auto reuses mirrored emails and records the others, "
+        "refresh records them again, offline never calls Graph for emails.",
+    )
+    extract.add_argument("--mirror-path", help="SQLite file of the mailbox mirror.")
+    extract.add_argument(
+        "--trace-file",
+        help="File to write a span per Graph request, parsing, model query and CSV write to.",
+    )
+    extract.add_argument(
+        "--trace-format",
+        choices=TRACE_FORMATS,
+        default="jsonl",
+        help="Format of the trace file: JSON lines, or Chrome trace for Perfetto.",
+    )
+    extract.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Local port to serve Prometheus metrics on, at /metrics, during the run.",
+    )
+    extract.add_argument(
+        "--metrics-textfile",
+        help="File to keep Prometheus metrics in, for the textfile collector of the node "
+        "exporter. Use a .prom file in the collector directory.",
+    )
+    extract.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run: CPU profile of the event loop, slow callbacks and event loop "
+        "lag, reported next to the log file.",
+    )
+    extract.add_argument(
+        "--profile-seconds",
+        type=float,
+        help="Only run the CPU profiler over the first seconds of the run.",
+    )
+    extract.add_argument(
+        "--slow-callback-ms",
+        type=float,
+        default=100.0,
+        help="Report callbacks holding the event loop longer than this, in milliseconds.",
+    )
+    extract.add_argument(
+        "--loop-block-ms",
+        type=float,
+        help="Log the stack of the code blocking the event loop longer than this, in "
+        "milliseconds. 250 by default.",
+    )
+    extract.add_argument("--log-file", default="process_log.txt", help="File to append the process log to.")
+    extract.set_defaults(handler=run_extract)
+
+    bench = subparsers.add_parser(
+        "bench",
+        help="Benchmark the pipeline on a synthetic mailbox, with a fake Graph server and LLM.",
+    )
+    bench.add_argument("--emails", type=int, default=200, help="Number of synthetic emails.")
+    bench.add_argument("--senders", type=int, help="Number of distinct senders.")
+    bench.add_argument("--thread-depth", type=int, default=2, help="Quoted messages per email.")
+    bench.add_argument("--signature-variety", type=int, default=3, help="Number of signature layouts.")
+    bench.add_argument("--image-rate", type=float, default=0.2, help="Share of emails with an inline image.")
+    bench.add_argument("--graph-latency", type=float, default=0.0, help="Seconds per Graph request.")
+    bench.add_argument(
+        "--graph-throttle-rate", type=float, default=0.0, help="Share of Graph requests throttled."
+    )
+    bench.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per LLM request.")
+    bench.add_argument(
+        "--llm-prompt-tokens",
+        type=int,
+        help="Prompt tokens reported per LLM request, estimated from the prompt by default.",
+    )
+    bench.add_argument(
+        "--llm-completion-tokens", type=int, default=50, help="Completion tokens per LLM request."
+    )
+    bench.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of failed LLM requests.")
+    bench.add_argument("--max-concurrent-emails", type=int, default=20, help="Emails processed at once.")
+    bench.add_argument("--no-stream", action="store_true", help="List every email before processing.")
+    bench.add_argument("--seed", type=int, default=0, help="Seed of the synthetic mailbox.")
+    bench.set_defaults(handler=run_bench)
+
+    evaluate = subparsers.add_parser(
+        "eval", help="Score a preset against a labeled corpus, with its tokens, cost and latency."
+    )
+    evaluate.add_argument("--preset", required=True, help="Name of a preset saved in the app.")
+    evaluate.add_argument("--corpus", help="JSON file of messages, attachments and labels.")
+    evaluate.add_argument("--synthetic", type=int, help="Evaluate on this many synthetic emails instead.")
+    evaluate.add_argument("--save-corpus", help="Write the evaluated corpus to this JSON file.")
+    evaluate.add_argument(
+        "--backend",
+        choices=["litellm", "fake"],
+        default="litellm",
+        help="Model backend: LiteLLM, or a fake reading labeled signature lines.",
+    )
+    evaluate.add_argument("--model", help="Model to evaluate, instead of the preset's.")
+    evaluate.add_argument("--escalation-model", help="Escalation model, instead of the preset's.")
+    evaluate.add_argument(
+        "--truncation-strategy",
+        choices=["head_tail", "head", "none"],
+        help="Truncation strategy, instead of the preset's.",
+    )
+    evaluate.set_defaults(handler=run_eval)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+from typing import Optional
+
+from sigminer.core.models.extraction import BudgetConfig
+
+# Emails to observe before the actual spend rate replaces the sampled estimate
+MIN_OBSERVED_EMAILS = 10
+
+
+class BudgetTracker:
+    """
+    Tracks the spend of a run against its budget and projects the total spend.
+
+    The projection starts from an estimate made on a sample of emails, then follows the
+    actual spend rate once enough emails have been processed.
+    """
+
+    def __init__(self, budget: BudgetConfig, total_emails: int) -> None:
+        self.max_cost: Optional[float] = budget.get("max_cost")
+        self.max_tokens: Optional[int] = budget.get("max_tokens")
+        self.total_emails = total_emails
+        self.estimated_cost_per_email = 0.0
+        self.estimated_tokens_per_email = 0.0
+        self.spent_cost = 0.0
+        self.spent_tokens = 0
+        self.processed_emails = 0
+
+    def set_estimate(self, cost_per_email: float, tokens_per_email: float) -> None:
+        self.estimated_cost_per_email = cost_per_email
+        self.estimated_tokens_per_email = tokens_per_email
+
+    def update(self, spent_cost: float, spent_tokens: int, processed_emails: int) -> None:
+        self.spent_cost = spent_cost
+        self.spent_tokens = spent_tokens
+        self.processed_emails = processed_emails
+
+    def _project(self, spent: float, estimated_per_email: float) -> float:
+        remaining_emails = max(self.total_emails - self.processed_emails, 0)
+        if self.processed_emails >= MIN_OBSERVED_EMAILS:
+            per_email = spent / self.processed_emails
+        else:
+            per_email = estimated_per_email
+        return spent + per_email * remaining_emails
+
+    @property
+    def projected_cost(self) -> float:
+        return self._project(self.spent_cost, self.estimated_cost_per_email)
+
+    @property
+    def projected_tokens(self) -> float:
+        return self._project(self.spent_tokens, self.estimated_tokens_per_email)
+
+    def is_exhausted(self) -> bool:
+        """Checks whether the actual spend has reached the budget."""
+        return (self.max_cost is not None and self.spent_cost >= self.max_cost) or (
+            self.max_tokens is not None and self.spent_tokens >= self.max_tokens
+        )
+
+    def is_projected_over(self) -> bool:
+        """Checks whether the projected total spend goes over the budget."""
+        return (self.max_cost is not None and self.projected_cost > self.max_cost) or (
+            self.max_tokens is not None and self.projected_tokens > self.max_tokens
+        )
+
+    def describe(self) -> str:
+        limits = []
+        if self.max_cost is not None:
+            limits.append(
+                f"${self.spent_cost:.4f} spent, ${self.projected_cost:.4f} projected, "
+                f"${self.max_cost:.4f} budget"
+            )
+        if self.max_tokens is not None:
+            limits.append(
+                f"{self.spent_tokens} tokens spent, {self.projected_tokens:.0f} projected, "
+                f"{self.max_tokens} budget"
+            )
+        return "; ".join(limits)
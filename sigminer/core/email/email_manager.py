@@ -1,106 +1,299 @@
 import requests
-from bs4 import BeautifulSoup
-from PIL import Image
-import io
-import base64
+import asyncio
+import contextlib
 import logging
-from typing import List, Dict, Optional
+from concurrent.futures import Executor
+from typing import AsyncIterator, List, Dict, Optional
+from urllib.parse import quote
+
+from sigminer.auth.token_provider import StaticTokenProvider, TokenProvider
+from sigminer.core.email.graph_client import DEFAULT_MAX_CONCURRENCY, GraphClient
+from sigminer.core.email.graph_query import build_message_params, get_message_paths
+from sigminer.core.email.html_parsing import HtmlParser, extract_image_cids, to_data_urls
+from sigminer.core.email.mirror import MailboxMirror, MirrorMode
+from sigminer.core.email.prefetch import DEFAULT_PREFETCH_PAGES, prefetch_pages
+from sigminer.core.models.extraction import MailboxScope
+from sigminer.core.tracing import Tracer
 
 logger = logging.getLogger(__name__)
 
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+
 
 class EmailManager:
-    def __init__(self, access_token: str) -> None:
-        self.headers = {"Authorization": f"Bearer {access_token}"}
+    def __init__(
+        self,
+        access_token: str,
+        html_parser: HtmlParser = "html.parser",
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        token_provider: Optional[TokenProvider] = None,
+        mirror: Optional[MailboxMirror] = None,
+        mirror_mode: MirrorMode = "auto",
+        graph_base_url: str = GRAPH_BASE_URL,
+        tracer: Optional[Tracer] = None,
+    ) -> None:
+        self.client = GraphClient(
+            token_provider or StaticTokenProvider(access_token),
+            max_concurrency=max_concurrency,
+        )
+        self.html_parser = html_parser
+        self.graph_base_url = graph_base_url
+        self.tracer = tracer or Tracer()
+        self.mirror = mirror
+        self.mirror_mode = mirror_mode
 
-    def get_emails(self, max_emails: Optional[int] = None) -> List[Dict]:
+    def can_replay(self) -> bool:
+        """Whether reads are served from the mirror when it holds them."""
+        return self.mirror is not None and self.mirror_mode in ("auto", "offline")
+
+    def get_mailbox_url(self, mailbox: Optional[str] = None) -> str:
+        """
+        Returns the Graph URL of a mailbox.
+
+        Args:
+            mailbox (Optional[str]): The ID or principal name of a user or shared mailbox.
+                If None, the mailbox of the signed-in user.
+
+        Returns:
+            str: The URL under which the messages of the mailbox are listed.
+        """
+        if mailbox is None:
+            return f"{self.graph_base_url}/me"
+        return f"{self.graph_base_url}/users/{quote(mailbox, safe='@')}"
+
+    def get_emails(
+        self,
+        max_emails: Optional[int] = None,
+        mailbox: Optional[str] = None,
+        scope: Optional[MailboxScope] = None,
+    ) -> List[Dict]:
         """
         Fetches emails from the Microsoft Graph API.
 
+        Folders, the received-date window and predicates of the scope are applied by
+        Graph, so messages outside of it are never downloaded.
+
         Args:
             max_emails (Optional[int]): Maximum number of emails to fetch. If None, fetches all emails.
+            mailbox (Optional[str]): The mailbox to fetch from. If None, the signed-in user's.
+            scope (Optional[MailboxScope]): The folders, dates and predicates to fetch.
 
         Returns:
-            List[Dict]: A list of email data dictionaries.
+            List[Dict]: A list of email data dictionaries, tagged with their mailbox.
         """
-        endpoint = "https://graph.microsoft.com/v1.0/me/messages"
         emails: List[Dict] = []
-        while endpoint and (max_emails is None or len(emails) < max_emails):
-            response = requests.get(endpoint, headers=self.headers)
-            response.raise_for_status()
-            data = response.json()
-            emails.extend(data.get("value", []))
-            endpoint = data.get("@odata.nextLink", None)
+        for path in get_message_paths(scope):
+            endpoint = f"{self.get_mailbox_url(mailbox)}/{path}"
+            params = build_message_params(
+                scope, None if max_emails is None else max_emails - len(emails)
+            )
+            while endpoint and (max_emails is None or len(emails) < max_emails):
+                # Next links already carry the query parameters
+                with self.tracer.span("graph.page", mailbox=mailbox):
+                    data = self.client.get(endpoint, params=params, mailbox=mailbox).json()
+                for email in data.get("value", []):
+                    email["mailbox"] = mailbox
+                    emails.append(email)
+                endpoint = data.get("@odata.nextLink", None)
+                params = None
         return emails if max_emails is None else emails[:max_emails]
 
-    def extract_images_from_text(self, text: str) -> List[str]:
+    async def stream_emails(
+        self,
+        max_emails: Optional[int] = None,
+        mailbox: Optional[str] = None,
+        scope: Optional[MailboxScope] = None,
+        lookahead: int = DEFAULT_PREFETCH_PAGES,
+    ) -> AsyncIterator[Dict]:
         """
-        Extracts image content IDs from the HTML text.
+        Yields emails from the Microsoft Graph API as their pages arrive.
+
+        Unlike `get_emails`, several pages are requested ahead of the one being
+        consumed, so listing a large mailbox is not bound by one round trip per page.
+        With a mirror, listings it holds are read from disk, and the others are
+        recorded into it as they are fetched.
 
         Args:
-            text (str): The HTML content of the email.
+            max_emails (Optional[int]): Maximum number of emails to fetch. If None, fetches all emails.
+            mailbox (Optional[str]): The mailbox to fetch from. If None, the signed-in user's.
+            scope (Optional[MailboxScope]): The folders, dates and predicates to fetch.
+            lookahead (int): Maximum number of page requests in flight.
+
+        Yields:
+            Dict: Email data dictionaries, tagged with their mailbox.
+
+        Raises:
+            ValueError: If the mirror is offline and does not hold the listing.
+        """
+        if self.can_replay():
+            emails = await asyncio.to_thread(
+                self.mirror.get_listing, mailbox, scope, max_emails
+            )
+            if emails is not None:
+                for email in emails:
+                    yield email
+                return
+        if self.mirror is not None and self.mirror_mode == "offline":
+            raise ValueError(
+                f"The mirror does not hold the emails of mailbox {mailbox or 'me'} "
+                "for this scope, record them once without offline mode."
+            )
+        # Each page is recorded before its emails are yielded, since the extraction
+        # adds images to them, and an interrupted listing keeps the pages it listed
+        listed = 0
+        async for page in self.stream_graph_pages(max_emails, mailbox, scope, lookahead):
+            if self.mirror is not None:
+                await asyncio.to_thread(
+                    self.mirror.save_listing, mailbox, scope, page, False, listed
+                )
+            listed += len(page)
+            for email in page:
+                yield email
+        if self.mirror is not None:
+            await asyncio.to_thread(
+                self.mirror.save_listing,
+                mailbox,
+                scope,
+                [],
+                max_emails is None or listed < max_emails,
+                listed,
+            )
+
+    async def stream_graph_pages(
+        self,
+        max_emails: Optional[int] = None,
+        mailbox: Optional[str] = None,
+        scope: Optional[MailboxScope] = None,
+        lookahead: int = DEFAULT_PREFETCH_PAGES,
+    ) -> AsyncIterator[List[Dict]]:
+        """Yields the pages of emails listed by Graph, with several requested ahead."""
+
+        def fetch_page(url: str, params: Optional[Dict[str, str]]) -> Dict:
+            skip = (params or {}).get("$skip")
+            with self.tracer.span("graph.page", mailbox=mailbox, skip=skip):
+                return self.client.get(url, params=params, mailbox=mailbox).json()
+
+        fetched = 0
+        for path in get_message_paths(scope):
+            remaining = None if max_emails is None else max_emails - fetched
+            if remaining is not None and remaining <= 0:
+                return
+            endpoint = f"{self.get_mailbox_url(mailbox)}/{path}"
+            params = build_message_params(scope, remaining)
+            pages = prefetch_pages(fetch_page, endpoint, params, remaining, lookahead)
+            async with contextlib.aclosing(pages):
+                async for page in pages:
+                    if max_emails is not None:
+                        page = page[: max_emails - fetched]
+                    for email in page:
+                        email["mailbox"] = mailbox
+                    fetched += len(page)
+                    if page:
+                        yield page
+                    if max_emails is not None and fetched >= max_emails:
+                        return
+
+    def count_emails(
+        self, mailbox: Optional[str] = None, scope: Optional[MailboxScope] = None
+    ) -> Optional[int]:
+        """
+        Counts the emails of a scope without downloading them.
+
+        Args:
+            mailbox (Optional[str]): The mailbox to count in. If None, the signed-in user's.
+            scope (Optional[MailboxScope]): The folders, dates and predicates to count.
 
         Returns:
-            List[str]: A list of image content IDs.
+            Optional[int]: The number of emails, or None if Graph cannot count the scope.
         """
-        soup = BeautifulSoup(text, "html.parser")
-        images = soup.find_all("img")
-        image_cids: List[str] = [
-            img["src"].replace("cid:", "")
-            for img in images
-            if "src" in img.attrs and img["src"].startswith("cid:")
-        ]
-        return image_cids
-
-    def fetch_image_attachments(
-        self, message_id: str, cids: List[str]
-    ) -> Dict[str, str]:
+        if self.can_replay():
+            emails = self.mirror.get_listing(mailbox, scope)
+            if emails is not None:
+                return len(emails)
+            if self.mirror_mode == "offline":
+                return None
+        params = build_message_params(scope)
+        params = {key: value for key, value in params.items() if key in ("$filter", "$search")}
+        total = 0
+        try:
+            for path in get_message_paths(scope):
+                with self.tracer.span("graph.count", mailbox=mailbox):
+                    response = self.client.get(
+                        f"{self.get_mailbox_url(mailbox)}/{path}/$count",
+                        params=params,
+                        headers={"ConsistencyLevel": "eventual"},
+                        mailbox=mailbox,
+                    )
+                total += int(response.text)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Unable to count the emails of mailbox {mailbox or 'me'}: {e}")
+            return None
+        return total
+
+    def fetch_attachments(
+        self, message_id: str, mailbox: Optional[str] = None
+    ) -> List[Dict]:
         """
-        Fetches image attachments from an email by content IDs.
+        Fetches the attachments of an email.
 
         Args:
             message_id (str): The ID of the email message.
-            cids (List[str]): A list of content IDs to fetch.
+            mailbox (Optional[str]): The mailbox of the email. If None, the signed-in user's.
 
         Returns:
-            Dict[str, str]: A dictionary mapping content IDs to base64-encoded image data.
+            List[Dict]: The attachments, with their base64-encoded content.
         """
+        if self.can_replay():
+            attachments = self.mirror.get_attachments(mailbox, message_id)
+            if attachments is not None:
+                return attachments
+            if self.mirror_mode == "offline":
+                logger.warning(f"The attachments of message {message_id} are not mirrored")
+                return []
         logger.info(f"Fetching image attachments for message {message_id}")
         attachments_endpoint = (
-            f"https://graph.microsoft.com/v1.0/me/messages/{message_id}/attachments"
+            f"{self.get_mailbox_url(mailbox)}/messages/{message_id}/attachments"
         )
-        response = requests.get(attachments_endpoint, headers=self.headers)
-        response.raise_for_status()
-        attachments = response.json().get("value", [])
-
-        images: Dict[str, str] = {}
-        for attachment in attachments:
-            if attachment.get("contentId") in cids:
-                image_data = attachment.get("contentBytes")
-                images[attachment["contentId"]] = image_data
+        with self.tracer.span("graph.attachments", mailbox=mailbox, email_id=message_id):
+            response = self.client.get(attachments_endpoint, mailbox=mailbox)
+            attachments = response.json().get("value", [])
+        if self.mirror is not None:
+            self.mirror.save_attachments(mailbox, message_id, attachments)
+        return attachments
 
-        return images
-
-    def get_images_from_text(self, text: str, message_id: str) -> List[bytes]:
+    async def get_image_urls(
+        self,
+        text: str,
+        message_id: str,
+        executor: Optional[Executor] = None,
+        mailbox: Optional[str] = None,
+    ) -> List[str]:
         """
-        Extracts and decodes image attachments from an email's HTML content.
+        Fetches the inline images of an email as data URLs, without blocking the event loop.
+
+        The HTML is parsed in the given pool, or in the default thread pool when None,
+        and the attachments are fetched in a thread.
 
         Args:
             text (str): The HTML content of the email.
             message_id (str): The ID of the email message.
+            executor (Optional[Executor]): The pool running the HTML parsing.
+            mailbox (Optional[str]): The mailbox of the email. If None, the signed-in user's.
 
         Returns:
-            List[bytes]: A list of image data in bytes.
+            List[str]: A list of base64 data URLs, ready to send to the model.
         """
-        image_cids = self.extract_images_from_text(text)
-        if not image_cids:
+        if "cid:" not in text:
             return []
 
-        images = self.fetch_image_attachments(message_id, image_cids)
-        image_bytes_list: List[bytes] = []
-
-        for _, image_data in images.items():
-            image_bytes = base64.b64decode(image_data)
-            image_bytes_list.append(image_bytes)
+        loop = asyncio.get_running_loop()
+        with self.tracer.span("html.parse", email_id=message_id):
+            image_cids = await loop.run_in_executor(
+                executor, extract_image_cids, text, self.html_parser
+            )
+        if not image_cids:
+            return []
 
-        return image_bytes_list
+        attachments = await asyncio.to_thread(self.fetch_attachments, message_id, mailbox)
+        images = to_data_urls(attachments)
+        return [images[cid] for cid in image_cids if cid in images]
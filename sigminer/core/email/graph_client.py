@@ -0,0 +1,196 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Optional
+
+import requests
+
+from sigminer.auth.token_provider import TokenProvider
+
+logger = logging.getLogger(__name__)
+
+# Graph allows few concurrent requests per mailbox before throttling
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+DEFAULT_TIMEOUT = 60.0
+RETRY_STATUS_CODES = (429, 503, 504)
+
+
+class ConcurrencyGovernor:
+    """
+    Adapts the number of concurrent requests on a mailbox to its throttling.
+
+    The limit is halved each time Graph throttles a request, and grows back by one
+    after a limit's worth of successful requests, so it settles just under the
+    mailbox limit. Requests run in worker threads, so the governor is thread-safe.
+    """
+
+    def __init__(self, max_limit: int = DEFAULT_MAX_CONCURRENCY, min_limit: int = 1) -> None:
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Waits for a request slot and holds it while the request runs."""
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    def on_success(self) -> None:
+        with self.condition:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self.successes = 0
+                self.condition.notify_all()
+
+    def on_throttled(self) -> None:
+        with self.condition:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self.successes = 0
+
+
+def get_retry_after(response: requests.Response) -> Optional[float]:
+    """Returns the delay requested by a `Retry-After` header, in seconds."""
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class GraphClient:
+    """
+    Sends Microsoft Graph requests with throttling-aware retries.
+
+    Throttled (429) and unavailable (503, 504) responses and connection errors are
+    retried, waiting as long as `Retry-After` asks or with jittered exponential
+    backoff. Requests on a mailbox go through its concurrency governor. The token is
+    asked to the provider on each request, and refreshed once on a 401.
+    """
+
+    def __init__(
+        self,
+        token_provider: TokenProvider,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.token_provider = token_provider
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.governors: Dict[Optional[str], ConcurrencyGovernor] = {}
+        self.governors_lock = threading.Lock()
+        self.total_requests = 0
+        self.total_retries = 0
+        self.total_throttled = 0
+        self.total_retry_wait = 0.0
+
+    def get_governor(self, mailbox: Optional[str] = None) -> ConcurrencyGovernor:
+        with self.governors_lock:
+            if mailbox not in self.governors:
+                self.governors[mailbox] = ConcurrencyGovernor(self.max_concurrency)
+            return self.governors[mailbox]
+
+    def get_backoff(self, attempt: int) -> float:
+        """Returns a full-jitter exponential backoff delay, in seconds."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        mailbox: Optional[str] = None,
+    ) -> requests.Response:
+        """
+        Sends a GET request, retrying it while Graph throttles it or is unavailable.
+
+        Args:
+            url (str): The request URL.
+            params (Optional[Dict[str, str]]): The query parameters.
+            headers (Optional[Dict[str, str]]): Headers to send on top of the authorization.
+            mailbox (Optional[str]): The mailbox the request reads, to share its governor.
+
+        Returns:
+            requests.Response: The successful response.
+
+        Raises:
+            requests.HTTPError: If the request fails, or is still throttled after the retries.
+        """
+        governor = self.get_governor(mailbox)
+        attempt = 0
+        token_refreshed = False
+        while True:
+            self.total_requests += 1
+            try:
+                with governor.slot():
+                    response = self.session.get(
+                        url,
+                        headers={
+                            "Authorization": f"Bearer {self.token_provider.get_token()}",
+                            **(headers or {}),
+                        },
+                        params=params,
+                        timeout=self.timeout,
+                    )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.get_backoff(attempt)
+                logger.warning(f"Graph request failed ({e}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code == 401 and not token_refreshed:
+                    # The token expired or was revoked early, retry once with a new one
+                    token_refreshed = True
+                    self.token_provider.get_token(force_refresh=True)
+                    continue
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    governor.on_success()
+                    return response
+                if response.status_code in (429, 503):
+                    self.total_throttled += 1
+                    governor.on_throttled()
+                if attempt >= self.max_retries:
+                    response.raise_for_status()
+                retry_after = get_retry_after(response)
+                delay = retry_after if retry_after is not None else self.get_backoff(attempt)
+                logger.warning(
+                    f"Graph responded {response.status_code}, retrying in {delay:.1f}s "
+                    f"(concurrency limit {governor.limit})"
+                )
+            self.total_retries += 1
+            self.total_retry_wait += delay
+            attempt += 1
+            time.sleep(delay)
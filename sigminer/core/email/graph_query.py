@@ -0,0 +1,125 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sigminer.core.models.extraction import MailboxScope
+
+# Graph returns at most this many messages per page
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+# Message properties read by the extraction, so bodies of other properties are not downloaded
+MESSAGE_SELECT = ["id", "subject", "body", "from", "receivedDateTime"]
+
+
+def format_graph_datetime(value: str) -> str:
+    """
+    Formats a date or datetime as the UTC timestamp expected in Graph filters.
+
+    Args:
+        value (str): An ISO 8601 date or datetime, e.g. `2024-01-31`. Naive values are UTC.
+
+    Returns:
+        str: The timestamp, e.g. `2024-01-31T00:00:00Z`.
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def build_filter(scope: MailboxScope) -> Optional[str]:
+    """Combines the received-date window and the custom filter of a scope."""
+    predicates = []
+    if scope.get("received_after"):
+        predicates.append(
+            f"receivedDateTime ge {format_graph_datetime(scope['received_after'])}"
+        )
+    if scope.get("received_before"):
+        predicates.append(
+            f"receivedDateTime lt {format_graph_datetime(scope['received_before'])}"
+        )
+    if scope.get("filter"):
+        predicates.append(f"({scope['filter']})")
+    return " and ".join(predicates) or None
+
+
+def build_message_params(
+    scope: Optional[MailboxScope] = None, max_emails: Optional[int] = None
+) -> Dict[str, str]:
+    """
+    Builds the query parameters of a message listing.
+
+    Args:
+        scope (Optional[MailboxScope]): The date window and predicates to apply server side.
+        max_emails (Optional[int]): Maximum number of emails wanted, to size the pages.
+
+    Returns:
+        Dict[str, str]: The `$select`, `$top`, `$filter` and `$search` parameters.
+
+    Raises:
+        ValueError: If the scope combines a search with a filter, which Graph rejects
+            on messages.
+    """
+    scope = scope or {}
+    page_size = DEFAULT_PAGE_SIZE if max_emails is None else min(max_emails, MAX_PAGE_SIZE)
+    params = {"$select": ",".join(MESSAGE_SELECT), "$top": str(max(page_size, 1))}
+
+    message_filter = build_filter(scope)
+    search = scope.get("search")
+    if search and message_filter:
+        raise ValueError(
+            "Graph does not support $search together with $filter or a date window "
+            "on messages. Use one or the other."
+        )
+    if message_filter:
+        params["$filter"] = message_filter
+    if search:
+        params["$search"] = f'"{search}"'
+    return params
+
+
+def get_message_paths(scope: Optional[MailboxScope] = None) -> List[str]:
+    """
+    Returns the paths listing the messages of a scope, relative to a mailbox URL.
+
+    Args:
+        scope (Optional[MailboxScope]): The folders to list, as well-known names such as
+            `inbox` or folder IDs. All folders when empty.
+
+    Returns:
+        List[str]: One `messages` path per folder.
+    """
+    folders = (scope or {}).get("folders") or []
+    if not folders:
+        return ["messages"]
+    return [f"mailFolders/{folder}/messages" for folder in folders]
+
+
+def push_down_hosts(
+    scope: Optional[MailboxScope], hosts: List[str], include_mode: bool
+) -> Optional[MailboxScope]:
+    """
+    Adds an include-mode host list to the search of a scope, as KQL `from:` terms.
+
+    The sender address cannot be matched by domain in a message `$filter`, and `$search`
+    cannot be combined with one, so only include-mode lists on scopes without a filter
+    or date window are pushed down. Search terms also match similar senders, so the
+    host list is still checked on the fetched emails.
+
+    Args:
+        scope (Optional[MailboxScope]): The scope of the run.
+        hosts (List[str]): The sender hosts of the preset.
+        include_mode (bool): Whether the hosts are the only ones to keep.
+
+    Returns:
+        Optional[MailboxScope]: The scope with the sender search, or None if Graph cannot
+        apply the host list.
+    """
+    scope = scope or {}
+    if not include_mode or not hosts or build_filter(scope):
+        return None
+
+    sender_search = " OR ".join(f"from:{host}" for host in hosts)
+    search = scope.get("search")
+    pushed_down: MailboxScope = dict(scope)
+    pushed_down["search"] = f"({search}) AND ({sender_search})" if search else sender_search
+    return pushed_down
@@ -0,0 +1,89 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Literal
+
+HtmlParser = Literal["html.parser", "lxml", "selectolax"]
+HTML_PARSERS = ("html.parser", "lxml", "selectolax")
+ParseExecutor = Literal["thread", "process"]
+DEFAULT_PARSE_WORKERS = 4
+
+
+def get_img_sources(text: str, parser: HtmlParser = "html.parser") -> List[str]:
+    """
+    Returns the `src` attribute of every image of an HTML document.
+
+    Args:
+        text (str): The HTML content.
+        parser (HtmlParser): `html.parser` (BeautifulSoup, always available), or the
+            faster `lxml` and `selectolax` backends when installed.
+
+    Returns:
+        List[str]: The image sources, in document order.
+    """
+    if parser == "selectolax":
+        from selectolax.parser import HTMLParser
+
+        return [node.attributes.get("src") or "" for node in HTMLParser(text).css("img")]
+
+    if parser == "lxml":
+        import lxml.html
+
+        if not text.strip():
+            return []
+        return [str(src) for src in lxml.html.document_fromstring(text).xpath("//img/@src")]
+
+    if parser != "html.parser":
+        raise ValueError(f"Unknown HTML parser: {parser}. Expected one of {HTML_PARSERS}.")
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(text, "html.parser")
+    return [img["src"] for img in soup.find_all("img") if "src" in img.attrs]
+
+
+def extract_image_cids(text: str, parser: HtmlParser = "html.parser") -> List[str]:
+    """
+    Extracts the content IDs of the inline images of an HTML document.
+
+    Documents without any `cid:` reference, which are most emails, are not parsed.
+
+    Args:
+        text (str): The HTML content.
+        parser (HtmlParser): The parser backend.
+
+    Returns:
+        List[str]: A list of image content IDs.
+    """
+    if "cid:" not in text:
+        return []
+    return [
+        src.replace("cid:", "")
+        for src in get_img_sources(text, parser)
+        if src.startswith("cid:")
+    ]
+
+
+def to_data_urls(attachments: List[Dict]) -> Dict[str, str]:
+    """
+    Maps the content IDs of image attachments to data URLs.
+
+    Graph returns attachments already base64 encoded, so they are sent to the model as
+    they are instead of being decoded and encoded again.
+    """
+    return {
+        attachment["contentId"]: (
+            f"data:{attachment.get('contentType') or 'image/jpeg'};base64,"
+            f"{attachment.get('contentBytes', '')}"
+        )
+        for attachment in attachments
+        if attachment.get("contentId")
+    }
+
+
+def create_parse_executor(
+    kind: ParseExecutor = "thread", max_workers: int = DEFAULT_PARSE_WORKERS
+) -> Executor:
+    """Creates the pool that runs HTML parsing off the event loop."""
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="html-parse")
+
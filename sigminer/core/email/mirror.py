@@ -0,0 +1,208 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, List, Literal, Optional
+
+from sigminer.core.models.extraction import MailboxScope
+
+MirrorMode = Literal["off", "auto", "refresh", "offline"]
+MIRROR_MODES = ["off", "auto", "refresh", "offline"]
+
+DEFAULT_MIRROR_PATH = os.path.join(
+    os.path.expanduser("~"),
+    "Library",
+    "Application Support",
+    "sigminer",
+    "mailbox_mirror.sqlite",
+)
+# Bytes of the database file mapped in memory, so replays read pages without copies
+DEFAULT_MMAP_SIZE = 1 << 30
+# Seconds a shard process waits for another one writing to the mirror
+BUSY_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    mailbox TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (mailbox, id)
+);
+CREATE TABLE IF NOT EXISTS listings (
+    mailbox TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    complete INTEGER NOT NULL,
+    PRIMARY KEY (mailbox, scope)
+);
+CREATE TABLE IF NOT EXISTS listing_messages (
+    mailbox TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    message_id TEXT NOT NULL,
+    PRIMARY KEY (mailbox, scope, position)
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    mailbox TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (mailbox, message_id)
+);
+"""
+
+
+def encode(value) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def decode(data: bytes):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def get_mailbox_key(mailbox: Optional[str]) -> str:
+    """Returns the key of a mailbox, the empty string for the signed-in user's."""
+    return (mailbox or "").lower()
+
+
+def get_scope_key(scope: Optional[MailboxScope]) -> str:
+    """Returns a key identifying a scope, whatever the order of its keys."""
+    return json.dumps(scope or {}, sort_keys=True)
+
+
+class MailboxMirror:
+    """
+    Keeps a local copy of mailbox listings, messages and attachments in SQLite.
+
+    Messages and attachments are stored once, compressed with zlib, and each listing
+    of a mailbox and scope records the order of its message IDs. Re-running an
+    extraction on the same mailbox and scope then reads the messages from disk
+    instead of Graph. Requests run in worker threads, so the connection is shared
+    behind a lock.
+    """
+
+    def __init__(self, path: str = DEFAULT_MIRROR_PATH, mmap_size: int = DEFAULT_MMAP_SIZE) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self.connection.executescript(SCHEMA)
+        self.total_messages_read = 0
+        self.total_attachments_read = 0
+
+    def get_listing(
+        self,
+        mailbox: Optional[str],
+        scope: Optional[MailboxScope],
+        max_emails: Optional[int] = None,
+    ) -> Optional[List[Dict]]:
+        """
+        Returns the mirrored messages of a listing, in the order Graph listed them.
+
+        Args:
+            mailbox (Optional[str]): The mailbox of the listing. If None, the signed-in user's.
+            scope (Optional[MailboxScope]): The scope of the listing.
+            max_emails (Optional[int]): The number of messages needed. If None, the whole listing.
+
+        Returns:
+            Optional[List[Dict]]: The messages, or None if the mirror does not hold enough
+                of the listing.
+        """
+        mailbox_key, scope_key = get_mailbox_key(mailbox), get_scope_key(scope)
+        with self.lock:
+            listing = self.connection.execute(
+                "SELECT complete FROM listings WHERE mailbox = ? AND scope = ?",
+                (mailbox_key, scope_key),
+            ).fetchone()
+            if listing is None:
+                return None
+            rows = self.connection.execute(
+                "SELECT messages.data FROM listing_messages "
+                "JOIN messages ON messages.mailbox = listing_messages.mailbox "
+                "AND messages.id = listing_messages.message_id "
+                "WHERE listing_messages.mailbox = ? AND listing_messages.scope = ? "
+                "ORDER BY listing_messages.position"
+                + ("" if max_emails is None else " LIMIT ?"),
+                (mailbox_key, scope_key)
+                + (() if max_emails is None else (max_emails,)),
+            ).fetchall()
+        complete = bool(listing[0])
+        if not complete and (max_emails is None or len(rows) < max_emails):
+            return None
+        self.total_messages_read += len(rows)
+        return [decode(data) for (data,) in rows]
+
+    def save_listing(
+        self,
+        mailbox: Optional[str],
+        scope: Optional[MailboxScope],
+        emails: List[Dict],
+        complete: bool,
+        start: int = 0,
+    ) -> None:
+        """
+        Stores the messages of a listing from a position on.
+
+        A listing saved from position 0 replaces any previous copy of it, and later
+        pages of the same listing are appended as they are fetched.
+
+        Args:
+            mailbox (Optional[str]): The mailbox of the listing. If None, the signed-in user's.
+            scope (Optional[MailboxScope]): The scope of the listing.
+            emails (List[Dict]): The messages, in the order Graph listed them.
+            complete (bool): Whether the listing holds every message of the scope, or was
+                cut at a maximum number of emails or interrupted.
+            start (int): The position of the first message in the listing.
+        """
+        mailbox_key, scope_key = get_mailbox_key(mailbox), get_scope_key(scope)
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO messages (mailbox, id, data) VALUES (?, ?, ?)",
+                [(mailbox_key, email["id"], encode(email)) for email in emails],
+            )
+            self.connection.execute(
+                "DELETE FROM listing_messages "
+                "WHERE mailbox = ? AND scope = ? AND position >= ?",
+                (mailbox_key, scope_key, start),
+            )
+            self.connection.executemany(
+                "INSERT INTO listing_messages (mailbox, scope, position, message_id) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (mailbox_key, scope_key, position, email["id"])
+                    for position, email in enumerate(emails, start)
+                ],
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO listings (mailbox, scope, complete) VALUES (?, ?, ?)",
+                (mailbox_key, scope_key, int(complete)),
+            )
+
+    def get_attachments(self, mailbox: Optional[str], message_id: str) -> Optional[List[Dict]]:
+        """Returns the mirrored attachments of a message, or None if they were never fetched."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data FROM attachments WHERE mailbox = ? AND message_id = ?",
+                (get_mailbox_key(mailbox), message_id),
+            ).fetchone()
+        if row is None:
+            return None
+        self.total_attachments_read += 1
+        return decode(row[0])
+
+    def save_attachments(
+        self, mailbox: Optional[str], message_id: str, attachments: List[Dict]
+    ) -> None:
+        """Stores the attachments of a message."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO attachments (mailbox, message_id, data) VALUES (?, ?, ?)",
+                (get_mailbox_key(mailbox), message_id, encode(attachments)),
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,87 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+# Page requests kept in flight ahead of the page being consumed
+DEFAULT_PREFETCH_PAGES = 4
+
+FetchPage = Callable[[str, Optional[Dict[str, str]]], Dict]
+
+
+async def follow_next_links(
+    fetch_page: FetchPage,
+    url: Optional[str],
+    params: Optional[Dict[str, str]],
+    max_items: Optional[int] = None,
+    fetched: int = 0,
+) -> AsyncIterator[List[Dict]]:
+    """Yields the pages of a Graph listing one round trip at a time, from `url` on."""
+    while url and (max_items is None or fetched < max_items):
+        data = await asyncio.to_thread(fetch_page, url, params)
+        items = data.get("value", [])
+        fetched += len(items)
+        yield items
+        # Next links already carry the query parameters
+        url, params = data.get("@odata.nextLink"), None
+
+
+async def prefetch_pages(
+    fetch_page: FetchPage,
+    endpoint: str,
+    params: Dict[str, str],
+    max_items: Optional[int] = None,
+    lookahead: int = DEFAULT_PREFETCH_PAGES,
+) -> AsyncIterator[List[Dict]]:
+    """
+    Yields the pages of a Graph listing in order, with up to `lookahead` requests in flight.
+
+    Pages are addressed by `$skip` ranges of `$top` items, so a page is requested
+    before the previous one came back instead of one round trip per next link.
+    Listings that cannot skip, such as searches, follow next links one page at a time.
+    Graph may also return a page short of `$top` before the end of a listing, after
+    which the `$skip` ranges would miss items, so the rest follows next links too.
+
+    Args:
+        fetch_page (FetchPage): Blocking function returning the JSON of a page, run in a thread.
+        endpoint (str): The listing URL.
+        params (Dict[str, str]): The query parameters of the listing, with `$top`.
+        max_items (Optional[int]): Stops requesting pages past this many items.
+        lookahead (int): Maximum number of page requests in flight.
+
+    Yields:
+        List[Dict]: The items of each page.
+    """
+    if "$search" in params or lookahead <= 1:
+        async for items in follow_next_links(fetch_page, endpoint, params, max_items):
+            yield items
+        return
+
+    page_size = int(params["$top"])
+    in_flight: deque[asyncio.Future] = deque()
+    next_skip = 0
+    fetched = 0
+    try:
+        while True:
+            while len(in_flight) < lookahead and (max_items is None or next_skip < max_items):
+                page_params = {**params, "$skip": str(next_skip)}
+                in_flight.append(
+                    asyncio.ensure_future(asyncio.to_thread(fetch_page, endpoint, page_params))
+                )
+                next_skip += page_size
+            if not in_flight:
+                return
+            data = await in_flight.popleft()
+            items = data.get("value", [])
+            fetched += len(items)
+            yield items
+            next_link = data.get("@odata.nextLink")
+            if not next_link:
+                return
+            if len(items) < page_size:
+                break
+    finally:
+        # Pages requested past the end of the listing, or past a short page, are dropped
+        for future in in_flight:
+            future.cancel()
+    async for items in follow_next_links(fetch_page, next_link, None, max_items, fetched):
+        yield items
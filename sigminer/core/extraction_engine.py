@@ -0,0 +1,1220 @@
+import asyncio
+import contextlib
+import csv
+import os
+import time
+from concurrent.futures import Executor
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional, Type
+
+import aiofiles
+from pydantic import BaseModel
+
+from sigminer.auth.token_provider import TokenProvider
+from sigminer.core.budget import BudgetTracker
+from sigminer.core.email.email_manager import GRAPH_BASE_URL, EmailManager
+from sigminer.core.email.graph_client import DEFAULT_MAX_CONCURRENCY
+from sigminer.core.email.graph_query import push_down_hosts
+from sigminer.core.email.html_parsing import DEFAULT_PARSE_WORKERS, create_parse_executor
+from sigminer.core.email.mirror import DEFAULT_MIRROR_PATH, MailboxMirror
+from sigminer.core.email.prefetch import DEFAULT_PREFETCH_PAGES
+from sigminer.core.llm.batch_client import BatchClient
+from sigminer.core.llm.multi_modal_llm import (
+    BATCH_COST_DISCOUNT,
+    DEFAULT_CONFIDENCE_THRESHOLD,
+    Completion,
+    MultiModalLLM,
+)
+from sigminer.core.llm.preflight import DEFAULT_EXPECTED_OUTPUT_TOKENS
+from sigminer.core.live_metrics import DEFAULT_METRICS_INTERVAL, get_live_snapshot
+from sigminer.core.loop_monitor import (
+    DEFAULT_BLOCKING_THRESHOLD,
+    BlockingEvent,
+    LoopLagMonitor,
+)
+from sigminer.core.metrics_exporter import MetricsServer, write_textfile
+from sigminer.core.profiling import (
+    DEFAULT_SLOW_CALLBACK_THRESHOLD,
+    RunProfiler,
+    get_profile_paths,
+)
+from sigminer.core.llm.schema_registry import SchemaRegistry
+from sigminer.core.models.extraction import (
+    FieldConfig,
+    LauncherConfig,
+    LogLevel,
+    MailboxScope,
+)
+from sigminer.core.tracing import Tracer, trace_attributes
+from sigminer.core.utils.prompt_models import get_extraction_query
+
+DEFAULT_BATCH_POLL_INTERVAL = 30.0
+DEFAULT_MAX_CONCURRENT_EMAILS = 20
+DEFAULT_BUDGET_SAMPLE_SIZE = 20
+# Emails fetched ahead of the extraction when streaming
+DEFAULT_PREFETCH_QUEUE_SIZE = 200
+DEFAULT_LOG_PATH = "process_log.txt"
+
+
+def get_sender_address(email: dict) -> Optional[str]:
+    return email.get("from", {}).get("emailAddress", {}).get("address", None)
+
+
+def interleave(email_lists: list[list[dict]]) -> list[dict]:
+    """Interleaves the emails of several mailboxes, so none waits behind another."""
+    emails = []
+    for index in range(max((len(email_list) for email_list in email_lists), default=0)):
+        emails.extend(
+            email_list[index] for email_list in email_lists if index < len(email_list)
+        )
+    return emails
+
+
+class ExtractionEngine:
+    """
+    Runs an extraction on a plain asyncio event loop.
+
+    Logs and progress are reported through callbacks, so the engine runs the same
+    behind the desktop app and headless.
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        launcher_config: LauncherConfig,
+        batch_client: Optional[BatchClient] = None,
+        on_log: Optional[Callable[[str, LogLevel], None]] = None,
+        on_progress: Optional[Callable[[int], None]] = None,
+        log_path: str = DEFAULT_LOG_PATH,
+        on_metrics: Optional[Callable[[dict], None]] = None,
+        metrics_interval: float = DEFAULT_METRICS_INTERVAL,
+        token_provider: Optional[TokenProvider] = None,
+        completion: Optional[Completion] = None,
+        graph_base_url: str = GRAPH_BASE_URL,
+    ):
+        self.on_log = on_log or (lambda message, level: None)
+        self.on_progress = on_progress or (lambda progress: None)
+        self.on_metrics = on_metrics
+        self.metrics_interval = metrics_interval
+        self.log_path = log_path
+        self.stop_requested = False
+        self.launcher_config = launcher_config
+        self.access_token = access_token
+        self.token_provider = token_provider
+        self.schema_registry = SchemaRegistry()
+        self.tracer = Tracer(record_spans=bool(launcher_config.get("trace_path")))
+        self.loop_monitor = LoopLagMonitor(
+            blocking_threshold=launcher_config.get(
+                "loop_blocking_threshold", DEFAULT_BLOCKING_THRESHOLD
+            ),
+            on_blocked=self.log_blocking_event,
+        )
+        self.llm = MultiModalLLM(
+            truncation_strategy=launcher_config.get("truncation_strategy", "head_tail"),
+            schema_registry=self.schema_registry,
+            completion=completion,
+            tracer=self.tracer,
+        )
+        self.batch_client = batch_client or BatchClient()
+        mirror_mode = launcher_config.get("mirror_mode", "off")
+        self.mirror = (
+            MailboxMirror(launcher_config.get("mirror_path") or DEFAULT_MIRROR_PATH)
+            if mirror_mode != "off"
+            else None
+        )
+        self.email_manager = EmailManager(
+            self.access_token,
+            html_parser=launcher_config.get("html_parser", "html.parser"),
+            max_concurrency=launcher_config.get(
+                "max_concurrent_per_mailbox", DEFAULT_MAX_CONCURRENCY
+            ),
+            token_provider=token_provider,
+            mirror=self.mirror,
+            mirror_mode=mirror_mode,
+            graph_base_url=graph_base_url,
+            tracer=self.tracer,
+        )
+        self.parse_executor: Optional[Executor] = None
+        self.mailbox_semaphores: dict[Optional[str], asyncio.Semaphore] = {}
+        self.csv_file_path = launcher_config["file_path"]
+        self.total_cost = 0.0
+        self.total_time = timedelta()
+        self.total_contacts_processed = 0
+        self.total_meta_processed = 0
+        self.total_meta_found = 0
+        self.total_emails_excluded = 0  # New metric for excluded emails
+        self.total_escalations = 0
+        self.total_llm_errors = 0
+        self.total_emails_skipped = 0
+        self.total_emails_host_filtered = 0
+        self.total_emails_host_filtered_server = 0
+        self.host_filter_pushed_down = False
+        self.server_filtered_count_known = True
+        self.budget_tracker: Optional[BudgetTracker] = None
+        self.budget_throttled = False
+        self.budget_stopped = False
+        self.downgraded = False
+        self.meta_non_null_counts = {
+            field["field_name"]: 0 for field in launcher_config["fields"]
+        }
+        self.meta_costs = {
+            field["field_name"]: 0.0 for field in launcher_config["fields"]
+        }
+        self.total_emails_expected: Optional[int] = None
+        self.processing_started_at: Optional[float] = None
+        self.last_email_processed_at: Optional[float] = None
+        self.email_queue: Optional[asyncio.Queue] = None
+        self.existing_contacts = {}  # Dictionary email => contact row
+        self.headers = set(["email_address"])  # CSV file headers
+
+    def get_timestamp(self):
+        """Returns the current timestamp."""
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    async def log_message(self, message, level: LogLevel = "INFO"):
+        """Writes a message to the log file and sends it with its level to `on_log`."""
+        timestamped_message = f"{self.get_timestamp()} - {message}"
+        async with aiofiles.open(self.log_path, "a") as log_file:
+            await log_file.write(timestamped_message + "\n")
+        self.on_log(timestamped_message, level)
+
+    async def load_existing_contacts(self):
+        """Loads existing contacts from the CSV file."""
+        if os.path.exists(self.csv_file_path):
+            await self.log_message(
+                f"Loading existing contacts from {self.csv_file_path}"
+            )
+            async with aiofiles.open(self.csv_file_path, mode="r") as csvfile:
+                content = await csvfile.readlines()
+                if not content:
+                    await self.log_message("The CSV file is empty.", "WARNING")
+                    return
+                reader = csv.DictReader(content)
+                if reader.fieldnames is None:
+                    await self.log_message("The CSV file is corrupted or empty.", "ERROR")
+                    return
+                self.headers = set(reader.fieldnames)
+                self.existing_contacts = {row["email_address"]: row for row in reader}
+
+    async def write_final_csv(self):
+        """Writes the updated contacts to the CSV file."""
+        with self.tracer.span("csv.write"):
+            all_fieldnames = set(self.headers)
+            for field in self.launcher_config["fields"]:
+                all_fieldnames.add(field["field_name"])
+
+            all_fieldnames = ["email_address"] + [
+                field for field in all_fieldnames if field != "email_address"
+            ]
+
+            async with aiofiles.open(self.csv_file_path, mode="w", newline="") as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=all_fieldnames)
+                await self.log_message("Writing headers to the CSV file.")
+                await writer.writeheader()
+                for contact in self.existing_contacts.values():
+                    contact_filtered = {key: contact.get(key, "") for key in all_fieldnames}
+                    await writer.writerow(contact_filtered)
+
+    def build_field_query(self, email: dict, field: FieldConfig) -> dict:
+        """Builds the query arguments used to extract a metadata field from an email."""
+        field_name = field["field_name"]
+        email_content = email.get("body", {}).get("content", "No content")
+        email_subject = email.get("subject", "Unknown subject")
+
+        MetaClass: Type[BaseModel] = self.schema_registry.get_answer_model()
+        query = get_extraction_query(field_name, field.get("guideline", ""))
+
+        chunks = [
+            f"<email_subject>{email_subject}</email_subject>",
+            f"<email_content>{email_content}</email_content>",
+        ]
+        return {
+            "input_data": query,
+            "chunks": chunks,
+            "images": email.get("images", []),
+            "output_cls": MetaClass,
+        }
+
+    def build_exclusion_query(self, email: dict) -> Optional[dict]:
+        """Builds the exclusion check query arguments, or None if no guideline applies."""
+        exclusion_guideline = self.launcher_config.get("exclusion_guideline")
+        email_content = email.get("body", {}).get("content", "")
+        if not (exclusion_guideline and exclusion_guideline.strip() and email_content):
+            return None
+        query = f"Should this email be excluded based on the guideline: '{exclusion_guideline}'? Respond with True or False."
+        return {
+            "input_data": query,
+            "chunks": [f"<email_content>{email_content}</email_content>"],
+            "images": email.get("images", []),
+            "output_cls": self.schema_registry.get_exclusion_model(),
+        }
+
+    async def record_answer(
+        self,
+        email: dict,
+        field: FieldConfig,
+        answer: Optional[BaseModel],
+        cost: float,
+        answered_by: str,
+    ) -> Optional[BaseModel]:
+        """Updates the field metrics with an answer and logs it. The total cost is updated by the caller."""
+        field_name = field["field_name"]
+        email_address = get_sender_address(email)
+
+        if answer is None:
+            await self.log_message(f"Query for {field_name} returned None.", "WARNING")
+            return None
+
+        self.meta_costs[field_name] += cost
+        self.total_meta_processed += 1
+        if answer.dict().get("answer") != "null" and answer.dict().get("answer") != "":
+            self.total_meta_found += 1
+            self.meta_non_null_counts[field_name] += 1
+
+        await self.log_message(
+            f"Response for {field_name} from {email_address} ({answered_by}): {answer.dict()}"
+        )
+        return answer
+
+    async def process_email_meta(
+        self, email: dict, field: FieldConfig
+    ) -> Optional[BaseModel]:
+        await self.log_message(
+            f"Processing metadata '{field['field_name']}' for email '{email.get('subject', 'Unknown subject')}'"
+        )
+
+        models = self.get_cascade_models()
+        try:
+            with trace_attributes(field=field["field_name"]):
+                answer, cost, answered_by = await self.llm.cascade_query(
+                    models=models,
+                    confidence_threshold=self.get_confidence_threshold(),
+                    **self.build_field_query(email, field),
+                )
+        except Exception as e:
+            # A failed field leaves it empty, the other fields and emails still run
+            self.total_llm_errors += 1
+            await self.log_message(f"Query for {field['field_name']} failed: {e}", "ERROR")
+            return None
+        self.total_cost += cost
+        if answered_by != models[0]:
+            self.total_escalations += 1
+
+        return await self.record_answer(email, field, answer, cost, answered_by)
+
+    def get_cascade_models(self) -> list[str]:
+        """Returns the models to try in order: the selected model, then the escalation model."""
+        if self.downgraded:
+            return [self.launcher_config["budget"]["downgrade_model"]]
+        models = [self.launcher_config["model"]]
+        escalation_model = self.launcher_config.get("escalation_model")
+        if escalation_model and escalation_model not in models:
+            models.append(escalation_model)
+        return models
+
+    def get_confidence_threshold(self) -> float:
+        return self.launcher_config.get(
+            "confidence_threshold", DEFAULT_CONFIDENCE_THRESHOLD
+        )
+
+    def is_host_filtered(self, email_address: str) -> bool:
+        """Checks whether the sender host is filtered out by the include/exclude host list."""
+        email_host = email_address.split("@")[-1]
+        excluded_hosts = self.launcher_config["excluded_hosts"]
+        if not excluded_hosts:
+            return False
+        if self.launcher_config["include_mode"]:
+            return email_host not in excluded_hosts
+        return email_host in excluded_hosts
+
+    def get_contact(self, email_address: str) -> dict:
+        if email_address in self.existing_contacts:
+            return self.existing_contacts[email_address]
+        return {"email_address": email_address}
+
+    def get_fields_to_process(self, contact: dict) -> list[FieldConfig]:
+        """Returns the fields missing from a contact, or that can be overwritten."""
+        return [
+            field
+            for field in self.launcher_config["fields"]
+            if field["field_name"] not in contact
+            or contact[field["field_name"]] in ["", "0", "null"]
+            or field["can_be_overwritten"]
+        ]
+
+    def merge_answers(
+        self,
+        email_address: str,
+        fields: list[FieldConfig],
+        answers: list[Optional[BaseModel]],
+    ):
+        """Stores the non-empty answers in the contact of the given address."""
+        results = self.get_contact(email_address)
+        for field, answer in zip(fields, answers):
+            if answer and answer.dict().get("answer") not in ["null", "", "0"]:
+                results[field["field_name"]] = answer.dict().get("answer", "")
+        self.existing_contacts[email_address] = results
+
+    def get_mailboxes(self) -> list[Optional[str]]:
+        """Returns the mailboxes of the run, None being the signed-in user's."""
+        return self.launcher_config.get("mailboxes") or [None]
+
+    def get_mailbox_semaphore(self, mailbox: Optional[str]) -> asyncio.Semaphore:
+        """
+        Returns the semaphore bounding the Graph requests waiting on a mailbox.
+
+        The Graph client adapts the requests actually sent to throttling, this bound
+        keeps worker threads from piling up behind it.
+        """
+        if mailbox not in self.mailbox_semaphores:
+            self.mailbox_semaphores[mailbox] = asyncio.Semaphore(
+                self.launcher_config.get(
+                    "max_concurrent_per_mailbox", DEFAULT_MAX_CONCURRENCY
+                )
+            )
+        return self.mailbox_semaphores[mailbox]
+
+    async def produce_mailbox_emails(
+        self,
+        mailbox: Optional[str],
+        max_emails: Optional[int],
+        sender_scope: Optional[MailboxScope],
+        emit: Callable[[dict], Awaitable[None]],
+    ):
+        """
+        Fetches the emails of a mailbox, with the sender hosts pushed down when possible,
+        and counts the emails of the scope that Graph filtered out by sender.
+        """
+        scope = self.launcher_config.get("scope")
+        fetched = 0
+        async for email in self.email_manager.stream_emails(
+            max_emails,
+            mailbox,
+            sender_scope or scope,
+            self.launcher_config.get("prefetch_pages", DEFAULT_PREFETCH_PAGES),
+        ):
+            fetched += 1
+            await emit(email)
+        if len(self.get_mailboxes()) > 1:
+            await self.log_message(
+                f"Fetched {fetched} emails from mailbox {mailbox or 'me'}"
+            )
+
+        if sender_scope is None:
+            return
+        if max_emails is not None and fetched >= max_emails:
+            # The run stopped before the end of the scope
+            self.server_filtered_count_known = False
+            return
+        total_emails = await asyncio.to_thread(
+            self.email_manager.count_emails, mailbox, scope
+        )
+        if total_emails is None:
+            self.server_filtered_count_known = False
+        else:
+            self.total_emails_host_filtered_server += max(total_emails - fetched, 0)
+
+    def get_sender_scope(self) -> Optional[MailboxScope]:
+        """Returns the scope with the sender hosts pushed down, or None if they cannot be."""
+        sender_scope = push_down_hosts(
+            self.launcher_config.get("scope"),
+            self.launcher_config["excluded_hosts"],
+            self.launcher_config["include_mode"],
+        )
+        self.host_filter_pushed_down = sender_scope is not None
+        return sender_scope
+
+    async def produce_emails(
+        self,
+        max_emails: Optional[int],
+        get_emit: Callable[[Optional[str]], Callable[[dict], Awaitable[None]]],
+    ):
+        """
+        Fetches the emails of every mailbox concurrently, up to `max_emails` each, and
+        hands each email to the callback returned by `get_emit` for its mailbox.
+
+        A mailbox that cannot be read is logged and skipped, unless none can be read.
+        """
+        sender_scope = self.get_sender_scope()
+        if sender_scope is not None:
+            await self.log_message(
+                f"Filtering sender hosts server side with search: {sender_scope['search']}"
+            )
+
+        mailboxes = self.get_mailboxes()
+        results = await asyncio.gather(
+            *[
+                self.produce_mailbox_emails(
+                    mailbox, max_emails, sender_scope, get_emit(mailbox)
+                )
+                for mailbox in mailboxes
+            ],
+            return_exceptions=True,
+        )
+        failures = []
+        for mailbox, result in zip(mailboxes, results):
+            if isinstance(result, Exception):
+                failures.append(result)
+                await self.log_message(
+                    f"Failed to fetch emails from mailbox {mailbox or 'me'}: {result}", "ERROR"
+                )
+        if len(failures) == len(mailboxes):
+            raise failures[0]
+
+    async def fetch_emails(self, max_emails: Optional[int]) -> list[dict]:
+        """Fetches the emails of every mailbox, interleaved so none waits behind another."""
+        email_lists = {mailbox: [] for mailbox in self.get_mailboxes()}
+
+        def get_emit(mailbox: Optional[str]):
+            async def emit(email: dict):
+                email_lists[mailbox].append(email)
+
+            return emit
+
+        await self.produce_emails(max_emails, get_emit)
+        return interleave(list(email_lists.values()))
+
+    async def count_expected_emails(self, max_emails: Optional[int]) -> Optional[int]:
+        """Counts the emails a streamed run will fetch, or None if Graph cannot tell."""
+        # The count runs before the listing, so it needs the sender hosts pushed down too
+        scope = self.get_sender_scope() or self.launcher_config.get("scope")
+        counts = await asyncio.gather(
+            *[
+                asyncio.to_thread(self.email_manager.count_emails, mailbox, scope)
+                for mailbox in self.get_mailboxes()
+            ]
+        )
+        if None in counts:
+            return None
+        return sum(
+            count if max_emails is None else min(count, max_emails) for count in counts
+        )
+
+    async def load_images(self, email: dict):
+        """Attaches the inline images of an email, parsed in the parse pool."""
+        mailbox = email.get("mailbox")
+        with self.tracer.span("images.load"):
+            async with self.get_mailbox_semaphore(mailbox):
+                email["images"] = await self.email_manager.get_image_urls(
+                    email.get("body", {}).get("content", ""),
+                    email.get("id", ""),
+                    self.parse_executor,
+                    mailbox,
+                )
+
+    def mark_email_processed(self, total_emails: Optional[int]):
+        self.total_contacts_processed += 1
+        self.last_email_processed_at = time.time()
+        if not total_emails:
+            return
+        progress = int((self.total_contacts_processed / total_emails) * 100)
+        self.on_progress(progress)
+
+    async def process_email(self, email: dict, total_emails: int):
+        """Processes an email and updates missing or null metadata."""
+        with (
+            trace_attributes(email_id=email.get("id"), mailbox=email.get("mailbox")),
+            self.tracer.span("email.process"),
+        ):
+            email_address = get_sender_address(email)
+
+            if email_address is None:
+                self.mark_email_processed(total_emails)
+                return
+
+            # Check the sender host before spending on the exclusion guideline
+            if self.is_host_filtered(email_address):
+                self.total_emails_host_filtered += 1
+                self.mark_email_processed(total_emails)
+                return
+
+            # Check exclusion guideline
+            exclusion_query = self.build_exclusion_query(email)
+            if exclusion_query:
+                try:
+                    with trace_attributes(field="exclusion"):
+                        result = await self.llm.query(
+                            model=self.get_cascade_models()[0], **exclusion_query
+                        )
+                except Exception as e:
+                    # The email is kept when the exclusion check cannot answer
+                    self.total_llm_errors += 1
+                    await self.log_message(f"Exclusion check failed: {e}", "ERROR")
+                    result = None
+                if result:
+                    self.total_cost += result[1]
+                if result and result[0].dict().get("answer") is True:
+                    self.total_emails_excluded += 1
+                    self.mark_email_processed(total_emails)
+                    return
+
+            await self.load_images(email)
+
+            fields = self.get_fields_to_process(self.get_contact(email_address))
+            answers = await asyncio.gather(
+                *[self.process_email_meta(email, field) for field in fields]
+            )
+            self.merge_answers(email_address, fields, answers)
+
+            # Emit the progress update
+            self.mark_email_processed(total_emails)
+
+    async def process_emails_in_batch(self, emails: list[dict]):
+        """
+        Processes the emails through the Batch API: exclusion checks, field extraction
+        and escalation of low-confidence answers each run as one batch.
+        """
+        total_emails = len(emails)
+        poll_interval = self.launcher_config.get(
+            "batch_poll_interval", DEFAULT_BATCH_POLL_INTERVAL
+        )
+
+        candidates = []
+        for email in emails:
+            email_address = get_sender_address(email)
+            if email_address is None:
+                self.mark_email_processed(total_emails)
+            elif self.is_host_filtered(email_address):
+                self.total_emails_host_filtered += 1
+                self.mark_email_processed(total_emails)
+            else:
+                candidates.append(email)
+
+        # Exclusion checks
+        exclusion_queries = {}
+        for index, email in enumerate(candidates):
+            exclusion_query = self.build_exclusion_query(email)
+            if exclusion_query:
+                exclusion_queries[f"exclusion-{index}"] = exclusion_query
+        exclusion_results = await self.run_batch(
+            exclusion_queries, self.get_cascade_models()[0], poll_interval
+        )
+        self.total_cost += sum(cost for _, cost in exclusion_results.values())
+        included = []
+        for index, email in enumerate(candidates):
+            result = exclusion_results.get(f"exclusion-{index}")
+            if result and result[0].dict().get("answer") is True:
+                self.total_emails_excluded += 1
+                self.mark_email_processed(total_emails)
+            else:
+                included.append(email)
+
+        if not await self.should_continue():
+            for email in included:
+                self.total_emails_skipped += 1
+                self.mark_email_processed(total_emails)
+            return
+
+        # Field extraction, planned against the contacts known before the run
+        planned: dict[str, tuple[int, FieldConfig]] = {}
+        field_queries = {}
+        image_semaphore = asyncio.Semaphore(DEFAULT_MAX_CONCURRENT_EMAILS)
+
+        async def load_images(email: dict):
+            async with image_semaphore:
+                await self.load_images(email)
+
+        await asyncio.gather(*[load_images(email) for email in included])
+        for index, email in enumerate(included):
+            contact = self.get_contact(get_sender_address(email))
+            for field_index, field in enumerate(self.get_fields_to_process(contact)):
+                custom_id = f"field-{index}-{field_index}"
+                planned[custom_id] = (index, field)
+                field_queries[custom_id] = self.build_field_query(email, field)
+
+        models = self.get_cascade_models()
+        results = await self.run_batch(field_queries, models[0], poll_interval)
+        answered_by = {custom_id: models[0] for custom_id in planned}
+
+        self.total_cost += sum(cost for _, cost in results.values())
+
+        # Escalation of empty or low-confidence answers
+        if len(models) > 1 and await self.should_continue() and not self.downgraded:
+            escalations = {
+                custom_id: query
+                for custom_id, query in field_queries.items()
+                if not self.llm.is_confident(
+                    results.get(custom_id, (None, 0.0))[0],
+                    self.get_confidence_threshold(),
+                )
+            }
+            escalated = await self.run_batch(escalations, models[-1], poll_interval)
+            self.total_cost += sum(cost for _, cost in escalated.values())
+            for custom_id, (answer, cost) in escalated.items():
+                current, current_cost = results.get(custom_id, (None, 0.0))
+                if self.llm.is_better(answer, current):
+                    current = answer
+                    answered_by[custom_id] = models[-1]
+                results[custom_id] = (current, current_cost + cost)
+                self.total_escalations += 1
+
+        planned_by_email: dict[int, list[str]] = {}
+        for custom_id, (index, _) in planned.items():
+            planned_by_email.setdefault(index, []).append(custom_id)
+
+        for index, email in enumerate(included):
+            fields, answers = [], []
+            for custom_id in planned_by_email.get(index, []):
+                field = planned[custom_id][1]
+                answer, cost = results.get(custom_id, (None, 0.0))
+                fields.append(field)
+                answers.append(
+                    await self.record_answer(
+                        email, field, answer, cost, answered_by[custom_id]
+                    )
+                )
+            self.merge_answers(get_sender_address(email), fields, answers)
+            self.mark_email_processed(total_emails)
+
+    async def run_batch(
+        self, queries: dict[str, dict], model: str, poll_interval: float
+    ) -> dict[str, tuple]:
+        """Runs the queries as one batch and returns the parsed answer and cost per custom ID."""
+        if not queries:
+            return {}
+
+        async def log_status(batch: dict):
+            counts = batch.get("request_counts") or {}
+            await self.log_message(
+                f"Batch {batch['id']} is {batch['status']} "
+                f"({counts.get('completed', 0)}/{counts.get('total', len(queries))} requests completed)"
+            )
+
+        await self.log_message(f"Submitting a batch of {len(queries)} requests to {model}")
+        bodies = await self.batch_client.execute(
+            [
+                {
+                    "custom_id": custom_id,
+                    "body": self.llm.build_batch_body(model=model, **query),
+                }
+                for custom_id, query in queries.items()
+            ],
+            poll_interval=poll_interval,
+            on_status=log_status,
+        )
+
+        results = {}
+        for custom_id, body in bodies.items():
+            result = self.llm.parse_batch_response(
+                body, queries[custom_id]["output_cls"], model
+            )
+            if result is not None:
+                results[custom_id] = result
+        return results
+
+    def get_spent_tokens(self) -> int:
+        return sum(
+            usage["prompt_tokens"] + usage["completion_tokens"]
+            for usage in self.llm.usage.values()
+        )
+
+    def plan_email_queries(self, email: dict) -> list[dict]:
+        """Returns the queries an email would go through, without its images."""
+        email_address = get_sender_address(email)
+        if email_address is None or self.is_host_filtered(email_address):
+            return []
+        queries = []
+        exclusion_query = self.build_exclusion_query(email)
+        if exclusion_query:
+            queries.append(exclusion_query)
+        for field in self.get_fields_to_process(self.get_contact(email_address)):
+            queries.append(self.build_field_query(email, field))
+        return queries
+
+    async def project_budget(
+        self, emails: list[dict], total_emails: Optional[int] = None
+    ):
+        """
+        Projects the spend of the run from a sample of emails before processing them.
+
+        `total_emails` defaults to the number of emails given, when they are not all
+        fetched yet.
+        """
+        budget = self.launcher_config.get("budget")
+        if not budget or not emails:
+            return
+        self.budget_tracker = BudgetTracker(budget, total_emails or len(emails))
+
+        sample_size = budget.get("sample_size", DEFAULT_BUDGET_SAMPLE_SIZE)
+        sample = emails[:: max(len(emails) // sample_size, 1)][:sample_size]
+        model = self.get_cascade_models()[0]
+        sample_cost = 0.0
+        sample_tokens = 0
+        for email in sample:
+            for query in self.plan_email_queries(email):
+                estimate = self.llm.estimate(model=model, **query)
+                sample_cost += estimate.predicted_cost
+                sample_tokens += estimate.prompt_tokens + DEFAULT_EXPECTED_OUTPUT_TOKENS
+        if self.launcher_config.get("execution_mode") == "batch":
+            sample_cost *= BATCH_COST_DISCOUNT
+
+        self.budget_tracker.set_estimate(
+            sample_cost / len(sample), sample_tokens / len(sample)
+        )
+        await self.log_message(
+            f"Budget projection from {len(sample)} sampled emails: {self.budget_tracker.describe()}"
+        )
+        await self.check_budget()
+
+    async def check_budget(self) -> bool:
+        """
+        Updates the budget tracker with the actual spend. Once the projected spend goes
+        over budget, emails are processed one at a time on the downgrade model, if any,
+        so the run can stop close to the budget.
+
+        Returns:
+            bool: False if the budget is exhausted and processing must stop.
+        """
+        if self.budget_tracker is None:
+            return True
+
+        self.budget_tracker.update(
+            self.total_cost, self.get_spent_tokens(), self.total_contacts_processed
+        )
+        if self.budget_tracker.is_exhausted():
+            if not self.budget_stopped:
+                self.budget_stopped = True
+                await self.log_message(
+                    f"Budget exhausted, stopping the extraction: {self.budget_tracker.describe()}",
+                    "WARNING",
+                )
+            return False
+
+        if self.budget_tracker.is_projected_over() and not self.budget_throttled:
+            self.budget_throttled = True
+            downgrade_model = self.launcher_config["budget"].get("downgrade_model")
+            if downgrade_model:
+                self.downgraded = True
+            await self.log_message(
+                f"Projected spend is over budget ({self.budget_tracker.describe()}), "
+                "processing one email at a time"
+                + (f" with {downgrade_model}" if downgrade_model else ""),
+                "WARNING",
+            )
+        return True
+
+    async def process_email_within_budget(self, email: dict, total_emails: int):
+        async with self.email_semaphore:
+            throttle = (
+                self.budget_throttle
+                if self.budget_throttled
+                else contextlib.nullcontext()
+            )
+            async with throttle:
+                if not await self.should_continue():
+                    self.total_emails_skipped += 1
+                    self.mark_email_processed(total_emails)
+                    return
+                await self.process_email(email, total_emails)
+
+    @contextlib.contextmanager
+    def parse_pool(self):
+        """Runs the HTML parsing of the emails in a pool while the context is open."""
+        self.parse_executor = create_parse_executor(
+            self.launcher_config.get("parse_executor", "thread"),
+            self.launcher_config.get("parse_workers", DEFAULT_PARSE_WORKERS),
+        )
+        try:
+            yield
+        finally:
+            self.parse_executor.shutdown(wait=False, cancel_futures=True)
+            self.parse_executor = None
+
+    def start_interactive(self) -> int:
+        """Sets up the concurrency limits of interactive processing and returns them."""
+        max_concurrent_emails = self.launcher_config.get(
+            "max_concurrent_emails", DEFAULT_MAX_CONCURRENT_EMAILS
+        )
+        self.email_semaphore = asyncio.Semaphore(max_concurrent_emails)
+        self.budget_throttle = asyncio.Lock()
+        return max_concurrent_emails
+
+    async def process_emails(self, emails: list[dict]):
+        """Processes the emails in the configured execution mode."""
+        self.schema_registry.warm()
+        await self.project_budget(emails)
+
+        with self.parse_pool():
+            if self.launcher_config.get("execution_mode") == "batch":
+                await self.process_emails_in_batch(emails)
+            else:
+                self.start_interactive()
+                tasks = [
+                    self.process_email_within_budget(email, len(emails) - 1)
+                    for email in emails
+                ]
+                await asyncio.gather(*tasks)
+
+    def can_stream(self) -> bool:
+        """Checks whether emails can be processed while the mailboxes are listed."""
+        return (
+            self.launcher_config.get("stream_emails", True)
+            and self.launcher_config.get("execution_mode") != "batch"
+            and (self.launcher_config.get("shard_processes") or 1) <= 1
+        )
+
+    async def process_email_stream(self, max_emails: Optional[int]) -> list[dict]:
+        """
+        Processes the emails while they are fetched, instead of after the whole listing.
+
+        Pages are prefetched into a bounded queue that the extraction drains, so
+        downloading a large mailbox overlaps with the LLM calls and memory stays bounded
+        when the extraction is the slower stage.
+
+        Returns:
+            list[dict]: The emails fetched.
+        """
+        self.schema_registry.warm()
+        expected_emails = await self.count_expected_emails(max_emails)
+        self.total_emails_expected = expected_emails
+        emails: list[dict] = []
+        queue: asyncio.Queue = asyncio.Queue(
+            self.launcher_config.get("prefetch_queue_size", DEFAULT_PREFETCH_QUEUE_SIZE)
+        )
+        self.email_queue = queue
+        workers_count = self.start_interactive()
+
+        listing = {"fetched": 0, "done": False}
+
+        async def emit(email: dict):
+            listing["fetched"] += 1
+            await queue.put(email)
+
+        async def produce():
+            try:
+                await self.produce_emails(max_emails, lambda mailbox: emit)
+            finally:
+                listing["done"] = True
+                if not expected_emails:
+                    self.total_emails_expected = listing["fetched"]
+                for _ in range(workers_count):
+                    await queue.put(None)
+
+        def get_total_emails() -> Optional[int]:
+            # Without a count, progress is only known once the listing is complete
+            if expected_emails:
+                return expected_emails
+            return listing["fetched"] if listing["done"] else None
+
+        async def consume(pending: list[dict]):
+            while True:
+                email = pending.pop(0) if pending else await queue.get()
+                if email is None:
+                    return
+                emails.append(email)
+                await self.process_email_within_budget(email, get_total_emails())
+                if self.stop_requested or self.budget_stopped:
+                    # The emails left to list would only be skipped
+                    producer.cancel()
+
+        with self.parse_pool():
+            producer = asyncio.create_task(produce())
+            try:
+                pending = []
+                budget = self.launcher_config.get("budget")
+                if budget:
+                    # The projection needs a sample before any email is processed
+                    sample_size = budget.get("sample_size", DEFAULT_BUDGET_SAMPLE_SIZE)
+                    while len(pending) < sample_size:
+                        email = await queue.get()
+                        if email is None:
+                            await queue.put(None)
+                            break
+                        pending.append(email)
+                    await self.project_budget(pending, expected_emails)
+                await asyncio.gather(*[consume(pending) for _ in range(workers_count)])
+            finally:
+                producer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await producer
+        return emails
+
+    def get_counters(self) -> dict:
+        """Returns the counters of the run that only grow, without the latencies."""
+        return {
+            "total_cost": self.total_cost,
+            "total_contacts_processed": self.total_contacts_processed,
+            "total_meta_processed": self.total_meta_processed,
+            "total_meta_found": self.total_meta_found,
+            "total_emails_excluded": self.total_emails_excluded,
+            "total_escalations": self.total_escalations,
+            "total_llm_errors": self.total_llm_errors,
+            "total_emails_skipped": self.total_emails_skipped,
+            "total_emails_host_filtered": self.total_emails_host_filtered,
+            "total_truncations": self.llm.total_truncations,
+            "graph_retries": self.email_manager.client.total_retries,
+            "graph_throttled": self.email_manager.client.total_throttled,
+            "meta_non_null_counts": dict(self.meta_non_null_counts),
+            "meta_costs": dict(self.meta_costs),
+            "usage": {model: dict(usage) for model, usage in self.llm.usage.items()},
+        }
+
+    def get_latencies(self) -> dict:
+        """Returns the stage timings and event loop lags of the run."""
+        return {
+            "stages": self.tracer.get_stages(),
+            "spans": list(self.tracer.spans),
+            "histograms": self.tracer.get_histograms(),
+            "loop_lags": list(self.loop_monitor.lags),
+            "loop_blocked": self.loop_monitor.total_blocked,
+        }
+
+    def add_counters(self, counters: dict):
+        """Adds the counters of another run, such as a shard, to this run."""
+        self.total_cost += counters["total_cost"]
+        self.total_contacts_processed += counters["total_contacts_processed"]
+        self.total_meta_processed += counters["total_meta_processed"]
+        self.total_meta_found += counters["total_meta_found"]
+        self.total_emails_excluded += counters["total_emails_excluded"]
+        self.total_escalations += counters["total_escalations"]
+        self.total_llm_errors += counters["total_llm_errors"]
+        self.total_emails_skipped += counters["total_emails_skipped"]
+        self.total_emails_host_filtered += counters["total_emails_host_filtered"]
+        self.llm.total_truncations += counters["total_truncations"]
+        self.email_manager.client.total_retries += counters["graph_retries"]
+        self.email_manager.client.total_throttled += counters["graph_throttled"]
+        for field_name, count in counters["meta_non_null_counts"].items():
+            self.meta_non_null_counts[field_name] += count
+        for field_name, cost in counters["meta_costs"].items():
+            self.meta_costs[field_name] += cost
+        for model, usage in counters["usage"].items():
+            totals = self.llm.usage.setdefault(model, dict.fromkeys(usage, 0))
+            for key, value in usage.items():
+                totals[key] += value
+
+    def add_latencies(self, latencies: dict):
+        """Adds the stage timings and event loop lags of another run to this run."""
+        self.tracer.merge(
+            latencies["stages"], latencies["spans"], latencies["histograms"]
+        )
+        self.loop_monitor.merge(latencies["loop_lags"], latencies["loop_blocked"])
+
+    async def launch_extraction(self):
+        """Launches the extraction process and updates the CSV file at the end."""
+        await self.log_message(f"Launcher configuration: {self.launcher_config}")
+
+        max_emails = self.launcher_config.get("max_emails", None)
+        await self.log_message(
+            f"Maximum number of emails to process: {max_emails or 'None'}"
+            + (" per mailbox" if len(self.get_mailboxes()) > 1 else "")
+        )
+
+        self.loop_monitor.start()
+        profiler = None
+        metrics_server = None
+        reporter = None
+        try:
+            if self.launcher_config.get("profile"):
+                profiler = RunProfiler(
+                    *get_profile_paths(self.log_path),
+                    duration=self.launcher_config.get("profile_seconds"),
+                    slow_callback_threshold=self.launcher_config.get(
+                        "slow_callback_threshold", DEFAULT_SLOW_CALLBACK_THRESHOLD
+                    ),
+                    loop_monitor=self.loop_monitor,
+                )
+                profiler.start()
+
+            await self.load_existing_contacts()
+
+            metrics_port = self.launcher_config.get("metrics_port")
+            if metrics_port is not None:
+                metrics_server = MetricsServer(self, metrics_port).start()
+                await self.log_message(
+                    f"Metrics served on http://{metrics_server.host}:{metrics_server.port}/metrics"
+                )
+            if self.on_metrics is not None or self.launcher_config.get("metrics_textfile"):
+                reporter = asyncio.create_task(self.report_live_metrics())
+            if self.can_stream():
+                start_time = datetime.now()
+                self.processing_started_at = time.monotonic()
+                emails = await self.process_email_stream(max_emails)
+                await self.log_message(
+                    f"Email extraction completed. Total emails processed: {len(emails)}"
+                )
+            else:
+                emails = await self.fetch_emails(max_emails)
+                await self.log_message(
+                    f"Email extraction completed. Total emails processed: {len(emails)}"
+                )
+                self.total_emails_expected = len(emails)
+
+                start_time = datetime.now()
+                self.processing_started_at = time.monotonic()
+                shard_processes = self.launcher_config.get("shard_processes") or 1
+                if (
+                    shard_processes > 1
+                    and self.launcher_config.get("execution_mode") != "batch"
+                ):
+                    from sigminer.core.sharding import process_emails_in_shards
+
+                    await process_emails_in_shards(self, emails, shard_processes)
+                else:
+                    await self.process_emails(emails)
+            end_time = datetime.now()
+            if reporter is not None:
+                reporter.cancel()
+                self.publish_metrics()
+
+            await self.write_final_csv()
+        finally:
+            # Torn down on failures too, so a failed run leaves nothing running behind
+            if reporter is not None:
+                reporter.cancel()
+            self.loop_monitor.stop()
+            if self.mirror is not None:
+                self.mirror.close()
+            if metrics_server is not None:
+                metrics_server.close()
+            if profiler is not None:
+                profiler.stop()
+
+        self.total_time = end_time - start_time
+        average_time_per_email = (
+            self.total_time / len(emails) if emails else timedelta()
+        )
+        average_cost_per_email = self.total_cost / len(emails) if emails else 0.0
+
+        if self.total_emails_skipped:
+            await self.log_message(
+                "The extraction stopped before processing every email.", "WARNING"
+            )
+        else:
+            await self.log_message("All emails have been processed successfully.")
+        await self.log_message(f"Total request cost: ${self.total_cost:.4f}")
+        await self.log_message(f"Total execution time: {self.total_time}")
+        await self.log_message(
+            f"Average time per email: {average_time_per_email.total_seconds() * 1000:.2f} ms"
+        )
+        await self.log_message(f"Average cost per email: ${average_cost_per_email:.4f}")
+        await self.log_message(
+            f"Total contacts processed: {self.total_contacts_processed}"
+        )
+        await self.log_message(f"Total metadata processed: {self.total_meta_processed}")
+        await self.log_message(f"Total metadata found: {self.total_meta_found}")
+        await self.log_message(
+            f"Total emails excluded: {self.total_emails_excluded}"
+        )  # Log excluded emails
+        await self.log_message(
+            f"Total emails included: {self.total_contacts_processed - self.total_emails_excluded}"
+        )  # Log excluded emails
+        if self.host_filter_pushed_down:
+            server_filtered = (
+                str(self.total_emails_host_filtered_server)
+                if self.server_filtered_count_known
+                else "unknown"
+            )
+            await self.log_message(
+                f"Total emails filtered by sender host: {server_filtered} server side, "
+                f"{self.total_emails_host_filtered} client side"
+            )
+        else:
+            await self.log_message(
+                f"Total emails filtered by sender host: {self.total_emails_host_filtered} client side"
+            )
+        await self.log_message(
+            f"Total prompts truncated to fit the context window: {self.llm.total_truncations}"
+        )
+        await self.log_message(
+            f"Total Graph requests throttled: {self.email_manager.client.total_throttled} "
+            f"({self.email_manager.client.total_retries} retries)"
+        )
+        if self.mirror is not None:
+            await self.log_message(
+                f"Total emails read from the mirror {self.mirror.path}: "
+                f"{self.mirror.total_messages_read} "
+                f"({self.mirror.total_attachments_read} with mirrored attachments)"
+            )
+        if self.budget_tracker is not None:
+            await self.log_message(f"Budget: {self.budget_tracker.describe()}")
+        if self.total_emails_skipped:
+            reason = "the budget" if self.budget_stopped else "a stop request"
+            await self.log_message(
+                f"Total emails skipped because of {reason}: {self.total_emails_skipped}",
+                "WARNING",
+            )
+        if self.total_llm_errors:
+            await self.log_message(
+                f"Total model queries failed after retries: {self.total_llm_errors}", "WARNING"
+            )
+        if len(self.get_cascade_models()) > 1:
+            await self.log_message(
+                f"Total metadata escalated to {self.get_cascade_models()[-1]}: {self.total_escalations}"
+            )
+
+        for field_name, count in self.meta_non_null_counts.items():
+            await self.log_message(f"Total non-null values for {field_name}: {count}")
+
+        for field_name, cost in self.meta_costs.items():
+            await self.log_message(f"Total cost for {field_name}: ${cost:.4f}")
+
+        for model, usage in self.llm.usage.items():
+            cache_hit_rate = (
+                usage["cached_tokens"] / usage["prompt_tokens"]
+                if usage["prompt_tokens"]
+                else 0.0
+            )
+            await self.log_message(
+                f"Tokens for {model}: {usage['prompt_tokens']} prompt "
+                f"({usage['cached_tokens']} cached, {cache_hit_rate:.1%} cache hit rate), "
+                f"{usage['completion_tokens']} completion"
+            )
+            if usage["latency"]:
+                await self.log_message(
+                    f"Average latency for {model}: "
+                    f"{usage['latency'] / usage['requests'] * 1000:.2f} ms"
+                )
+
+        # Stages overlap across concurrent emails, so their totals add up past the run time
+        stages = sorted(
+            self.tracer.get_stages().items(), key=lambda item: item[1]["total"], reverse=True
+        )
+        for name, stage in stages:
+            await self.log_message(
+                f"Time in {name}: {stage['total']:.2f} s over {stage['count']} calls "
+                f"({stage['total'] / stage['count'] * 1000:.2f} ms average, "
+                f"{stage['max'] * 1000:.2f} ms max)"
+            )
+        for line in self.loop_monitor.get_summary():
+            await self.log_message(line)
+        trace_path = self.launcher_config.get("trace_path")
+        if trace_path:
+            self.tracer.export(trace_path, self.launcher_config.get("trace_format", "jsonl"))
+            await self.log_message(f"Trace of {len(self.tracer.spans)} spans written to {trace_path}")
+        if profiler is not None:
+            await self.log_message(
+                f"Profile written to {profiler.report_path} "
+                f"(raw profile for pstats or snakeviz in {profiler.profile_path})"
+            )
+
+        await self.log_message(
+            "The extraction process is now complete. You may safely close this thread."
+        )
+
+    async def log_blocking_event(self, event: BlockingEvent):
+        await self.log_message(
+            f"Event loop blocked for {event.duration * 1000:.0f} ms, "
+            f"in:\n{event.stack.rstrip()}",
+            "WARNING",
+        )
+
+    async def report_live_metrics(self):
+        """Publishes the live metrics at a fixed interval, until cancelled."""
+        while True:
+            self.publish_metrics()
+            await asyncio.sleep(self.metrics_interval)
+
+    def publish_metrics(self):
+        """Sends a snapshot of the live metrics and updates the metrics textfile."""
+        if self.on_metrics is not None:
+            self.on_metrics(get_live_snapshot(self))
+        metrics_textfile = self.launcher_config.get("metrics_textfile")
+        if metrics_textfile:
+            write_textfile(self, metrics_textfile)
+
+    def stop(self):
+        """Requests a clean stop: emails not started yet are skipped and the CSV is still written."""
+        self.stop_requested = True
+
+    async def should_continue(self) -> bool:
+        return not self.stop_requested and await self.check_budget()
@@ -0,0 +1,102 @@
+import time
+from typing import Optional
+
+# Seconds between two snapshots sent to the live metrics panel
+DEFAULT_METRICS_INTERVAL = 1.0
+# Stages whose calls in flight are shown, in pipeline order
+LIVE_STAGES = {
+    "graph.page": "Graph pages",
+    "images.load": "Image loads",
+    "html.parse": "HTML parsing",
+    "llm.query": "Model queries",
+    "email.process": "Emails",
+}
+
+
+def get_live_snapshot(engine) -> dict:
+    """
+    Aggregates the counters of a running extraction into one snapshot.
+
+    Throughput and ETA follow the emails processed since the extraction started, and
+    the projected spend extrapolates the spend per email to the expected emails, or
+    follows the budget tracker when the run has a budget.
+    """
+    elapsed = (
+        time.monotonic() - engine.processing_started_at
+        if engine.processing_started_at is not None
+        else 0.0
+    )
+    processed = engine.total_contacts_processed
+    expected: Optional[int] = engine.total_emails_expected
+    throughput = processed / elapsed if elapsed > 0 else 0.0
+    remaining = max(expected - processed, 0) if expected is not None else None
+
+    prompt_tokens = sum(usage["prompt_tokens"] for usage in engine.llm.usage.values())
+    cached_tokens = sum(usage["cached_tokens"] for usage in engine.llm.usage.values())
+    if engine.budget_tracker is not None:
+        projected_cost: Optional[float] = engine.budget_tracker.projected_cost
+    elif expected and processed:
+        projected_cost = engine.total_cost / processed * expected
+    else:
+        projected_cost = None
+
+    in_flight = engine.tracer.get_in_flight()
+    return {
+        "elapsed_seconds": elapsed,
+        "processed_emails": processed,
+        "expected_emails": expected,
+        "emails_per_second": throughput,
+        "in_flight": {stage: in_flight.get(stage, 0) for stage in LIVE_STAGES},
+        "queued_emails": engine.email_queue.qsize() if engine.email_queue is not None else 0,
+        "graph_throttled": engine.email_manager.client.total_throttled,
+        "graph_retry_wait_seconds": engine.email_manager.client.total_retry_wait,
+        "cache_hit_rate": cached_tokens / prompt_tokens if prompt_tokens else None,
+        "total_cost": engine.total_cost,
+        "projected_cost": projected_cost,
+        "eta_seconds": (
+            remaining / throughput if remaining is not None and throughput > 0 else None
+        ),
+    }
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "unknown"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def format_snapshot(snapshot: dict) -> list[tuple[str, str]]:
+    """Returns the label and value of each line of the live metrics panel."""
+    expected = snapshot["expected_emails"]
+    cache_hit_rate = snapshot["cache_hit_rate"]
+    projected_cost = snapshot["projected_cost"]
+    in_flight = snapshot["in_flight"]
+    return [
+        (
+            "Emails",
+            f"{snapshot['processed_emails']} / {expected if expected is not None else '?'}",
+        ),
+        ("Throughput", f"{snapshot['emails_per_second']:.2f} emails/s"),
+        ("ETA", format_duration(snapshot["eta_seconds"])),
+        (
+            "In flight",
+            ", ".join(f"{LIVE_STAGES[stage]} {count}" for stage, count in in_flight.items()),
+        ),
+        ("Queued emails", str(snapshot["queued_emails"])),
+        (
+            "Graph throttling",
+            f"{snapshot['graph_throttled']} throttled, "
+            f"{snapshot['graph_retry_wait_seconds']:.1f} s waited",
+        ),
+        (
+            "Prompt cache hit rate",
+            f"{cache_hit_rate:.1%}" if cache_hit_rate is not None else "unknown",
+        ),
+        (
+            "Spend",
+            f"${snapshot['total_cost']:.4f}"
+            + (f" (${projected_cost:.4f} projected)" if projected_cost is not None else ""),
+        ),
+    ]
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+TERMINAL_BATCH_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Limits of a batch input file set by the Batch API
+MAX_BATCH_REQUESTS = 50000
+MAX_BATCH_FILE_BYTES = 200 * 1024 * 1024
+
+
+class BatchClient:
+    """
+    Client for the OpenAI Batch API.
+
+    The base URL can point to any server exposing the same `/files` and `/batches`
+    endpoints, which allows running the batch flow against a local stand-in server.
+    Requests past the limits of one input file are split across several batches.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = OPENAI_BASE_URL,
+        completion_window: str = "24h",
+        max_batch_requests: int = MAX_BATCH_REQUESTS,
+        max_batch_bytes: int = MAX_BATCH_FILE_BYTES,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.completion_window = completion_window
+        self.max_batch_requests = max_batch_requests
+        self.max_batch_bytes = max_batch_bytes
+        api_key = api_key or os.environ.get("OPENAI_API_KEY", "")
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+
+    def upload_file(self, content: str) -> str:
+        """
+        Uploads a JSONL batch input file.
+
+        Args:
+            content (str): The JSONL content, one request per line.
+
+        Returns:
+            str: The ID of the uploaded file.
+        """
+        response = requests.post(
+            f"{self.base_url}/files",
+            headers=self.headers,
+            data={"purpose": "batch"},
+            files={"file": ("batch_input.jsonl", content.encode("utf-8"))},
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def create_batch(self, input_file_id: str) -> Dict[str, Any]:
+        """Creates a chat completion batch from an uploaded input file."""
+        response = requests.post(
+            f"{self.base_url}/batches",
+            headers=self.headers,
+            json={
+                "input_file_id": input_file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": self.completion_window,
+            },
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def retrieve_batch(self, batch_id: str) -> Dict[str, Any]:
+        """Retrieves the current state of a batch."""
+        response = requests.get(f"{self.base_url}/batches/{batch_id}", headers=self.headers)
+        response.raise_for_status()
+        return response.json()
+
+    def download_file(self, file_id: str) -> str:
+        """Downloads the content of an output or error file."""
+        response = requests.get(
+            f"{self.base_url}/files/{file_id}/content", headers=self.headers
+        )
+        response.raise_for_status()
+        return response.text
+
+    def build_input_files(self, batch_requests: List[Dict[str, Any]]) -> List[str]:
+        """Builds the JSONL input files of the requests, each within the batch limits."""
+        files: List[str] = []
+        lines: List[str] = []
+        size = 0
+        for request in batch_requests:
+            line = json.dumps(
+                {
+                    "custom_id": request["custom_id"],
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": request["body"],
+                }
+            )
+            # Lines are joined by a newline byte
+            line_size = len(line.encode("utf-8")) + 1
+            if lines and (
+                len(lines) >= self.max_batch_requests or size + line_size > self.max_batch_bytes
+            ):
+                files.append("\n".join(lines))
+                lines, size = [], 0
+            lines.append(line)
+            size += line_size
+        if lines:
+            files.append("\n".join(lines))
+        return files
+
+    async def execute(
+        self,
+        batch_requests: List[Dict[str, Any]],
+        poll_interval: float = 30.0,
+        on_status: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Submits chat completion requests as batches and waits for the results.
+
+        The requests go in a single batch unless they exceed the request count or the
+        file size of one input file, in which case the batches run concurrently.
+
+        Args:
+            batch_requests (List[Dict[str, Any]]): Items with a `custom_id` and a chat completion `body`.
+            poll_interval (float): Seconds to wait between two status checks.
+            on_status (Optional[Callable]): Called with the batch object after every status check.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: A dictionary mapping each custom ID to its response body.
+            Requests that failed are missing from the dictionary.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        for file_results in await asyncio.gather(
+            *[
+                self.execute_file(content, poll_interval, on_status)
+                for content in self.build_input_files(batch_requests)
+            ]
+        ):
+            results.update(file_results)
+        return results
+
+    async def execute_file(
+        self,
+        content: str,
+        poll_interval: float,
+        on_status: Optional[Callable[[Dict[str, Any]], Any]],
+    ) -> Dict[str, Dict[str, Any]]:
+        """Runs one batch from the content of its input file."""
+        input_file_id = await asyncio.to_thread(self.upload_file, content)
+        batch = await asyncio.to_thread(self.create_batch, input_file_id)
+
+        while batch["status"] not in TERMINAL_BATCH_STATUSES:
+            if on_status:
+                await on_status(batch)
+            await asyncio.sleep(poll_interval)
+            batch = await asyncio.to_thread(self.retrieve_batch, batch["id"])
+        if on_status:
+            await on_status(batch)
+
+        if batch.get("error_file_id"):
+            errors = await asyncio.to_thread(self.download_file, batch["error_file_id"])
+            logger.warning(f"Batch {batch['id']} returned errors: {errors}")
+
+        if not batch.get("output_file_id"):
+            raise Exception(f"Batch {batch['id']} ended with status '{batch['status']}'")
+
+        output = await asyncio.to_thread(self.download_file, batch["output_file_id"])
+        results: Dict[str, Dict[str, Any]] = {}
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                results[item["custom_id"]] = response["body"]
+        return results
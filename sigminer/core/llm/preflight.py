@@ -0,0 +1,221 @@
+import base64
+import io
+import json
+import logging
+import math
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+TruncationStrategy = Literal["head_tail", "head", "none"]
+
+DEFAULT_MAX_INPUT_TOKENS = 128000
+DEFAULT_MAX_OUTPUT_TOKENS = 1024
+DEFAULT_EXPECTED_OUTPUT_TOKENS = 200
+DEFAULT_TAIL_RATIO = 0.3
+TRUNCATION_MARKER = "\n[... content truncated ...]\n"
+
+LOW_DETAIL_IMAGE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+IMAGE_TILE_SIZE = 512
+# Largest cost of a high detail image: 2048x768 once resized, i.e. 8 tiles
+MAX_IMAGE_TOKENS = LOW_DETAIL_IMAGE_TOKENS + 8 * IMAGE_TILE_TOKENS
+
+
+class PreflightEstimate(BaseModel):
+    model: str
+    text_tokens: int
+    image_tokens: int
+    max_input_tokens: int
+    predicted_cost: float
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self.text_tokens + self.image_tokens
+
+    @property
+    def fits(self) -> bool:
+        return self.prompt_tokens <= self.max_input_tokens
+
+
+def get_max_input_tokens(model: str) -> int:
+    """Returns the context window of a model, or a default when the model is unknown."""
+    from litellm import get_model_info
+
+    try:
+        return get_model_info(model).get("max_input_tokens") or DEFAULT_MAX_INPUT_TOKENS
+    except Exception:
+        return DEFAULT_MAX_INPUT_TOKENS
+
+
+def count_text_tokens(model: str, text: str) -> int:
+    from litellm import token_counter
+
+    return token_counter(model=model, text=text)
+
+
+def estimate_image_tokens(image: Union[str, bytes], detail: str = "auto") -> int:
+    """
+    Estimates the tokens billed for an image, following OpenAI's tiling rules: the image
+    is fit in 2048x2048, its shortest side scaled down to 768px, then billed per 512px tile.
+
+    Args:
+        image (Union[str, bytes]): Raw image bytes, a base64 data URL or a remote URL.
+        detail (str): The image detail level sent with the image.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    if detail == "low":
+        return LOW_DETAIL_IMAGE_TOKENS
+
+    if isinstance(image, str):
+        if not image.startswith("data:"):
+            return MAX_IMAGE_TOKENS
+        image = base64.b64decode(image.split(",", 1)[-1])
+
+    from PIL import Image
+
+    try:
+        width, height = Image.open(io.BytesIO(image)).size
+    except Exception:
+        return MAX_IMAGE_TOKENS
+
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+
+    tiles = math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE)
+    return LOW_DETAIL_IMAGE_TOKENS + tiles * IMAGE_TILE_TOKENS
+
+
+def truncate_text(
+    model: str,
+    text: str,
+    max_tokens: int,
+    strategy: TruncationStrategy = "head_tail",
+    tail_ratio: float = DEFAULT_TAIL_RATIO,
+) -> str:
+    """
+    Truncates a text to a number of tokens.
+
+    The `head_tail` strategy keeps the beginning of the text and its end, where email
+    signatures are found. The `head` strategy only keeps the beginning.
+    """
+    if strategy == "none":
+        return text
+
+    from litellm import decode, encode
+
+    tokens = list(encode(model=model, text=text))
+    if len(tokens) <= max_tokens:
+        return text
+
+    if strategy == "head":
+        return decode(model=model, tokens=tokens[:max_tokens]) + TRUNCATION_MARKER
+
+    tail_tokens = int(max_tokens * tail_ratio)
+    head_tokens = max_tokens - tail_tokens
+    head = decode(model=model, tokens=tokens[:head_tokens])
+    tail = decode(model=model, tokens=tokens[len(tokens) - tail_tokens :]) if tail_tokens else ""
+    return head + TRUNCATION_MARKER + tail
+
+
+def predict_cost(
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int = DEFAULT_EXPECTED_OUTPUT_TOKENS,
+) -> float:
+    """Predicts the cost of a request, or 0 when the model pricing is unknown."""
+    from litellm import cost_per_token
+
+    try:
+        prompt_cost, completion_cost = cost_per_token(
+            model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+    except Exception:
+        return 0.0
+    return prompt_cost + completion_cost
+
+
+def get_request_text(request: Dict[str, Any]) -> str:
+    """Concatenates the text sent with a chat completion request, tool definitions included."""
+    texts: List[str] = []
+    for message in request["messages"]:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        elif isinstance(content, list):
+            texts.extend(part["text"] for part in content if part.get("type") == "text")
+    if request.get("tools"):
+        texts.append(json.dumps(request["tools"]))
+    return "\n".join(texts)
+
+
+def get_request_images(request: Dict[str, Any]) -> List[Dict[str, str]]:
+    images = []
+    for message in request["messages"]:
+        content = message.get("content")
+        if isinstance(content, list):
+            images.extend(part["image_url"] for part in content if part.get("type") == "image_url")
+    return images
+
+
+def estimate_request(
+    request: Dict[str, Any],
+    expected_output_tokens: int = DEFAULT_EXPECTED_OUTPUT_TOKENS,
+    exact: bool = True,
+) -> PreflightEstimate:
+    """
+    Estimates the prompt tokens and cost of a chat completion request.
+
+    When `exact` is False, the UTF-8 size of the text is used as an upper bound of its
+    token count, which avoids tokenizing requests that are far below the context window.
+    """
+    model = request["model"]
+    text = get_request_text(request)
+    text_tokens = count_text_tokens(model, text) if exact else len(text.encode("utf-8"))
+    image_tokens = sum(
+        estimate_image_tokens(image["url"], image.get("detail", "auto")) if exact else MAX_IMAGE_TOKENS
+        for image in get_request_images(request)
+    )
+    return PreflightEstimate(
+        model=model,
+        text_tokens=text_tokens,
+        image_tokens=image_tokens,
+        max_input_tokens=get_max_input_tokens(model),
+        predicted_cost=predict_cost(model, text_tokens + image_tokens, expected_output_tokens),
+    )
+
+
+def fit_chunks(
+    model: str,
+    chunks: List[str],
+    overflow_tokens: int,
+    strategy: TruncationStrategy = "head_tail",
+) -> Optional[List[str]]:
+    """
+    Truncates the largest chunk so that the chunks shrink by `overflow_tokens`.
+
+    Returns:
+        Optional[List[str]]: The truncated chunks, or None if they cannot shrink enough.
+    """
+    if strategy == "none" or not chunks:
+        return None
+
+    chunk_tokens = [count_text_tokens(model, chunk) for chunk in chunks]
+    largest = max(range(len(chunks)), key=lambda index: chunk_tokens[index])
+    marker_tokens = count_text_tokens(model, TRUNCATION_MARKER)
+    allowed_tokens = chunk_tokens[largest] - overflow_tokens - marker_tokens
+    if allowed_tokens <= 0:
+        return None
+
+    logger.info(
+        f"Truncating a chunk from {chunk_tokens[largest]} to {allowed_tokens} tokens to fit {model}"
+    )
+    fitted = list(chunks)
+    fitted[largest] = truncate_text(model, chunks[largest], allowed_tokens, strategy)
+    return fitted
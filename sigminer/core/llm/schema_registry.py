@@ -0,0 +1,87 @@
+from typing import Any, Dict, Type
+
+from pydantic import BaseModel, Field, create_model
+
+from sigminer.core.utils.prompt_models import (
+    ANSWER_DESCRIPTION,
+    CONFIDENCE_SCORE_DESCRIPTION,
+    THOUGHT_PROCESS_DESCRIPTION,
+)
+
+META_MODEL_DESCRIPTION = (
+    "This class defines the metadata and the required format for responses."
+)
+
+
+def create_dynamic_model(model_description: str = "") -> Type[BaseModel]:
+    """
+    Dynamically creates the Pydantic model of a metadata answer.
+
+    The schema is the same for every field: the field name and guideline are part of
+    the query, so the tool definition does not break the prompt prefix shared by the
+    queries on an email.
+    """
+    fields = {}
+    fields["thoughtProcess"] = (str, Field(description=THOUGHT_PROCESS_DESCRIPTION))
+    fields["answer"] = (str, Field(description=ANSWER_DESCRIPTION))
+    fields["confidence_score"] = (
+        float,
+        Field(description=CONFIDENCE_SCORE_DESCRIPTION),
+    )
+
+    DynamicModel = create_model("MetaExtraction", **fields)
+    DynamicModel.__doc__ = model_description
+    return DynamicModel
+
+
+def convert_to_tool(pydantic_class: Type[BaseModel]) -> Dict[str, Any]:
+    """Converts a Pydantic model into a function tool definition."""
+    schema = pydantic_class.model_json_schema()
+
+    properties = {}
+    for field_name, field_value in schema["properties"].items():
+        properties[field_name] = {key: value for key, value in field_value.items() if value}
+    schema["properties"] = properties
+
+    return {
+        "type": "function",
+        "function": {
+            "name": schema["title"],
+            "description": schema.get("description", ""),
+            "parameters": schema,
+        },
+    }
+
+
+class SchemaRegistry:
+    """
+    Builds the answer models and their tool definitions once per run.
+
+    Every field shares the metadata answer model, and tools are keyed by model class,
+    so extracting fields from thousands of emails only builds two schemas.
+    """
+
+    def __init__(self) -> None:
+        self._answer_model: Type[BaseModel] | None = None
+        self._exclusion_model: Type[BaseModel] | None = None
+        self._tools: Dict[Type[BaseModel], Dict[str, Any]] = {}
+
+    def get_answer_model(self) -> Type[BaseModel]:
+        if self._answer_model is None:
+            self._answer_model = create_dynamic_model(META_MODEL_DESCRIPTION)
+        return self._answer_model
+
+    def get_exclusion_model(self) -> Type[BaseModel]:
+        if self._exclusion_model is None:
+            self._exclusion_model = create_model("ExclusionCheck", answer=(bool, ...))
+        return self._exclusion_model
+
+    def get_tool(self, pydantic_class: Type[BaseModel]) -> Dict[str, Any]:
+        if pydantic_class not in self._tools:
+            self._tools[pydantic_class] = convert_to_tool(pydantic_class)
+        return self._tools[pydantic_class]
+
+    def warm(self) -> None:
+        """Builds the models and tools of a run before any email is processed."""
+        self.get_tool(self.get_answer_model())
+        self.get_tool(self.get_exclusion_model())
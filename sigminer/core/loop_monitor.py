@@ -0,0 +1,146 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from array import array
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+# Seconds between two samples of the event loop lag
+DEFAULT_LAG_SAMPLE_INTERVAL = 0.05
+# Stalls of the event loop longer than this are reported with a stack, in seconds
+DEFAULT_BLOCKING_THRESHOLD = 0.25
+# Stalls reported with their stack, later ones are only counted
+MAX_BLOCKING_EVENTS = 50
+MAX_STACK_FRAMES = 12
+
+
+def get_percentile(values: Sequence[float], percentile: float) -> float:
+    """Returns a percentile of the values, by nearest rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(int(round(percentile / 100 * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+@dataclass
+class BlockingEvent:
+    duration: float
+    stack: str
+    beat: int
+
+
+class LoopLagMonitor:
+    """
+    Samples the lag of an event loop and catches the code blocking it.
+
+    A task sleeps for `sample_interval` in a loop, and records how late the loop wakes
+    it up. A watchdog thread checks that the task keeps waking up: when it has not for
+    `blocking_threshold`, the loop is stuck in a callback, and the watchdog captures
+    the stack of the loop thread while it still blocks. The stall is reported through
+    `on_blocked` once the loop runs again, with its full duration.
+
+    Sampling costs a wake-up per interval, so the monitor runs on every extraction.
+    """
+
+    def __init__(
+        self,
+        sample_interval: float = DEFAULT_LAG_SAMPLE_INTERVAL,
+        blocking_threshold: float = DEFAULT_BLOCKING_THRESHOLD,
+        on_blocked: Optional[Callable[[BlockingEvent], Awaitable[None]]] = None,
+    ) -> None:
+        self.sample_interval = sample_interval
+        self.blocking_threshold = blocking_threshold
+        self.on_blocked = on_blocked
+        # Packed floats, as a run of several hours takes hundreds of thousands of samples
+        self.lags = array("d")
+        self.blocking_events: List[BlockingEvent] = []
+        self.total_blocked = 0
+        self.lock = threading.Lock()
+        self.beat = 0
+        self.beat_at = 0.0
+        self.captured_beat = -1
+        self.pending_event: Optional[BlockingEvent] = None
+        self.loop_thread_id: Optional[int] = None
+        self.sampler: Optional[asyncio.Task] = None
+        self.watchdog: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    def start(self) -> None:
+        """Starts monitoring, from a coroutine running on the loop to monitor."""
+        self.stopped.clear()
+        self.loop_thread_id = threading.get_ident()
+        self.beat_at = time.monotonic()
+        self.sampler = asyncio.create_task(self.sample())
+        self.watchdog = threading.Thread(target=self.watch, daemon=True)
+        self.watchdog.start()
+
+    def stop(self) -> None:
+        """Stops monitoring, does nothing when the monitor is not running."""
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.cancel()
+            self.sampler = None
+        if self.watchdog is not None:
+            self.watchdog.join()
+            self.watchdog = None
+
+    async def sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            with self.lock:
+                self.beat += 1
+                self.beat_at = time.monotonic()
+                beat = self.beat
+            await asyncio.sleep(self.sample_interval)
+            lag = max(loop.time() - start - self.sample_interval, 0.0)
+            self.lags.append(lag)
+            if lag < self.blocking_threshold:
+                continue
+            self.total_blocked += 1
+            with self.lock:
+                event, self.pending_event = self.pending_event, None
+            if event is None or event.beat != beat:
+                continue
+            event.duration = lag
+            if len(self.blocking_events) < MAX_BLOCKING_EVENTS:
+                self.blocking_events.append(event)
+                if self.on_blocked is not None:
+                    await self.on_blocked(event)
+
+    def watch(self) -> None:
+        while not self.stopped.wait(self.blocking_threshold / 2):
+            with self.lock:
+                beat, beat_at = self.beat, self.beat_at
+            stalled = time.monotonic() - beat_at - self.sample_interval
+            if stalled < self.blocking_threshold or beat == self.captured_beat:
+                continue
+            self.captured_beat = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame)[-MAX_STACK_FRAMES:])
+            with self.lock:
+                self.pending_event = BlockingEvent(stalled, stack, beat)
+
+    def merge(self, lags: Sequence[float], total_blocked: int) -> None:
+        """Adds the samples of another monitor, e.g. in a shard process."""
+        self.lags.extend(lags)
+        self.total_blocked += total_blocked
+
+    def get_summary(self) -> List[str]:
+        """Returns the lines describing the lag and the stalls, for reports."""
+        if not self.lags:
+            return []
+        return [
+            f"Event loop lag over {len(self.lags)} samples: "
+            f"{get_percentile(self.lags, 50) * 1000:.2f} ms p50, "
+            f"{get_percentile(self.lags, 95) * 1000:.2f} ms p95, "
+            f"{get_percentile(self.lags, 99) * 1000:.2f} ms p99, "
+            f"{max(self.lags) * 1000:.2f} ms max",
+            f"Event loop blocked over {self.blocking_threshold * 1000:.0f} ms: "
+            f"{self.total_blocked} times",
+        ]
@@ -0,0 +1,302 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from sigminer.core.tracing import LATENCY_BUCKETS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = {
+        name: str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for name, value in labels.items()
+    }
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped.items()) + "}"
+
+
+class MetricsWriter:
+    """Writes metric families in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+
+    def add(
+        self,
+        name: str,
+        metric_type: str,
+        help_text: str,
+        samples: List[tuple],
+    ) -> None:
+        """Adds a family from its (labels, value) samples, or (suffix, labels, value)."""
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+        for sample in samples:
+            suffix, labels, value = sample if len(sample) == 3 else ("", *sample)
+            self.lines.append(f"{name}{suffix}{format_labels(labels)} {float(value)!r}")
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_metrics(engine) -> str:
+    """
+    Renders the counters of an extraction in the Prometheus text format.
+
+    Counters only grow over a run, so rates and stalls can be alerted on; the latency
+    histograms are split per stage and, for model queries, per model.
+    """
+    writer = MetricsWriter()
+    counters = [
+        ("sigminer_emails_processed_total", "Emails processed.", engine.total_contacts_processed),
+        (
+            "sigminer_emails_excluded_total",
+            "Emails excluded by the guideline.",
+            engine.total_emails_excluded,
+        ),
+        (
+            "sigminer_emails_skipped_total",
+            "Emails skipped by a stop or the budget.",
+            engine.total_emails_skipped,
+        ),
+        (
+            "sigminer_emails_host_filtered_total",
+            "Emails filtered by sender host on the client side.",
+            engine.total_emails_host_filtered,
+        ),
+        (
+            "sigminer_metadata_processed_total",
+            "Field queries answered.",
+            engine.total_meta_processed,
+        ),
+        ("sigminer_metadata_found_total", "Field values found.", engine.total_meta_found),
+        (
+            "sigminer_escalations_total",
+            "Field queries escalated to the next model.",
+            engine.total_escalations,
+        ),
+        (
+            "sigminer_llm_failed_queries_total",
+            "Model queries failed after retries and left unanswered.",
+            engine.total_llm_errors,
+        ),
+        (
+            "sigminer_prompts_truncated_total",
+            "Prompts truncated to the context window.",
+            engine.llm.total_truncations,
+        ),
+        ("sigminer_cost_dollars_total", "Spend on model queries.", engine.total_cost),
+    ]
+    for name, help_text, value in counters:
+        writer.add(name, "counter", help_text, [({}, value)])
+
+    writer.add(
+        "sigminer_field_cost_dollars_total",
+        "counter",
+        "Spend on model queries per field.",
+        [({"field": field_name}, cost) for field_name, cost in engine.meta_costs.items()],
+    )
+    writer.add(
+        "sigminer_field_values_found_total",
+        "counter",
+        "Field values found per field.",
+        [
+            ({"field": field_name}, count)
+            for field_name, count in engine.meta_non_null_counts.items()
+        ],
+    )
+
+    usage = dict(engine.llm.usage)
+    writer.add(
+        "sigminer_llm_requests_total",
+        "counter",
+        "Model queries answered per model.",
+        [({"model": model}, stats["requests"]) for model, stats in usage.items()],
+    )
+    writer.add(
+        "sigminer_llm_tokens_total",
+        "counter",
+        "Tokens per model and kind.",
+        [
+            ({"model": model, "kind": kind}, stats[f"{kind}_tokens"])
+            for model, stats in usage.items()
+            for kind in ("prompt", "cached", "completion")
+        ],
+    )
+
+    stages = engine.tracer.get_stages()
+    graph_errors = sum(
+        stage["errors"] for name, stage in stages.items() if name.startswith("graph.")
+    )
+    llm_errors = stages.get("llm.query", {}).get("errors", 0)
+    client = engine.email_manager.client
+    writer.add(
+        "sigminer_graph_requests_total",
+        "counter",
+        "Graph requests sent, retries included.",
+        [({}, client.total_requests)],
+    )
+    writer.add(
+        "sigminer_graph_retries_total",
+        "counter",
+        "Graph requests retried.",
+        [({}, client.total_retries)],
+    )
+    writer.add(
+        "sigminer_graph_throttled_total",
+        "counter",
+        "Graph requests throttled.",
+        [({}, client.total_throttled)],
+    )
+    writer.add(
+        "sigminer_graph_retry_wait_seconds_total",
+        "counter",
+        "Time waited before retrying Graph requests.",
+        [({}, client.total_retry_wait)],
+    )
+    writer.add(
+        "sigminer_graph_errors_total",
+        "counter",
+        "Graph calls failed after retries.",
+        [({}, graph_errors)],
+    )
+    writer.add("sigminer_llm_errors_total", "counter", "Model queries failed.", [({}, llm_errors)])
+    writer.add(
+        "sigminer_stage_errors_total",
+        "counter",
+        "Calls failed per stage.",
+        [({"stage": name}, stage["errors"]) for name, stage in stages.items()],
+    )
+
+    samples = []
+    for name, models in engine.tracer.get_histograms().items():
+        for model, histogram in models.items():
+            labels = {"stage": name, **({"model": model} if model else {})}
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": repr(bound)}, cumulative))
+            samples.append(("_bucket", {**labels, "le": "+Inf"}, histogram["count"]))
+            samples.append(("_sum", labels, histogram["sum"]))
+            samples.append(("_count", labels, histogram["count"]))
+    writer.add(
+        "sigminer_stage_duration_seconds",
+        "histogram",
+        "Duration of the calls of each stage.",
+        samples,
+    )
+
+    writer.add(
+        "sigminer_event_loop_blocked_total",
+        "counter",
+        "Event loop stalls past the blocking threshold.",
+        [({}, engine.loop_monitor.total_blocked)],
+    )
+
+    in_flight = engine.tracer.get_in_flight()
+    writer.add(
+        "sigminer_in_flight",
+        "gauge",
+        "Calls currently running per stage.",
+        [({"stage": name}, count) for name, count in in_flight.items()],
+    )
+    gauges = [
+        (
+            "sigminer_emails_expected",
+            "Emails expected in the run, when known.",
+            engine.total_emails_expected,
+        ),
+        (
+            "sigminer_emails_queued",
+            "Emails fetched and waiting for extraction.",
+            engine.email_queue.qsize() if engine.email_queue is not None else 0,
+        ),
+        (
+            "sigminer_last_email_processed_timestamp_seconds",
+            "Unix time of the last email processed.",
+            engine.last_email_processed_at,
+        ),
+        (
+            "sigminer_event_loop_lag_seconds",
+            "Last event loop lag sampled.",
+            engine.loop_monitor.lags[-1] if engine.loop_monitor.lags else None,
+        ),
+        ("sigminer_scrape_timestamp_seconds", "Unix time of this snapshot.", time.time()),
+    ]
+    for name, help_text, value in gauges:
+        if value is not None:
+            writer.add(name, "gauge", help_text, [({}, value)])
+    return writer.render()
+
+
+def write_textfile(engine, path: str) -> None:
+    """
+    Writes the metrics for the textfile collector of the node exporter.
+
+    The file is replaced atomically, so the collector never reads it half written.
+    """
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w") as metrics_file:
+        metrics_file.write(render_metrics(engine))
+    os.replace(temporary_path, path)
+
+
+class MetricsServer:
+    """
+    Serves the metrics of an extraction on `/metrics` for Prometheus to scrape.
+
+    The server runs in a daemon thread and renders the counters on each scrape. Start
+    and close it, or use it as a context manager; port 0 picks a free port, exposed by
+    `port`.
+    """
+
+    def __init__(self, engine, port: int, host: str = DEFAULT_METRICS_HOST) -> None:
+        self.engine = engine
+        self.host = host
+        self.requested_port = port
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        engine = self.engine
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_metrics(engine).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.requested_port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self) -> "MetricsServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
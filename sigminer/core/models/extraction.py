@@ -1,8 +1,13 @@
-from typing import TypedDict
+from typing import Literal, NotRequired, TypedDict
 
 from pydantic import BaseModel
 
 
+LogLevel = Literal["INFO", "WARNING", "ERROR"]
+# Levels of the engine logs, from the least to the most severe
+LOG_LEVELS: list[LogLevel] = ["INFO", "WARNING", "ERROR"]
+
+
 class MetaResponse(BaseModel):
     meta_name: str
     extracted_value: str | None
@@ -15,6 +20,21 @@ class FieldConfig(TypedDict):
     can_be_overwritten: bool
 
 
+class BudgetConfig(TypedDict):
+    max_cost: NotRequired[float | None]
+    max_tokens: NotRequired[int | None]
+    downgrade_model: NotRequired[str | None]
+    sample_size: NotRequired[int]
+
+
+class MailboxScope(TypedDict):
+    folders: NotRequired[list[str]]
+    received_after: NotRequired[str | None]
+    received_before: NotRequired[str | None]
+    filter: NotRequired[str | None]
+    search: NotRequired[str | None]
+
+
 class LauncherConfig(TypedDict):
     fields: list[FieldConfig]
     excluded_hosts: list[str]
@@ -23,3 +43,30 @@ class LauncherConfig(TypedDict):
     max_emails: int
     model: str
     exclusion_guideline: str | None
+    escalation_model: NotRequired[str | None]
+    confidence_threshold: NotRequired[float]
+    execution_mode: NotRequired[Literal["interactive", "batch"]]
+    batch_poll_interval: NotRequired[float]
+    truncation_strategy: NotRequired[Literal["head_tail", "head", "none"]]
+    budget: NotRequired[BudgetConfig | None]
+    max_concurrent_emails: NotRequired[int]
+    shard_processes: NotRequired[int]
+    html_parser: NotRequired[Literal["html.parser", "lxml", "selectolax"]]
+    parse_executor: NotRequired[Literal["thread", "process"]]
+    parse_workers: NotRequired[int]
+    mailboxes: NotRequired[list[str]]
+    max_concurrent_per_mailbox: NotRequired[int]
+    scope: NotRequired[MailboxScope | None]
+    stream_emails: NotRequired[bool]
+    prefetch_pages: NotRequired[int]
+    prefetch_queue_size: NotRequired[int]
+    mirror_mode: NotRequired[Literal["off", "auto", "refresh", "offline"]]
+    mirror_path: NotRequired[str | None]
+    trace_path: NotRequired[str | None]
+    trace_format: NotRequired[Literal["jsonl", "chrome"]]
+    metrics_port: NotRequired[int | None]
+    metrics_textfile: NotRequired[str | None]
+    profile: NotRequired[bool]
+    profile_seconds: NotRequired[float | None]
+    slow_callback_threshold: NotRequired[float]
+    loop_blocking_threshold: NotRequired[float]
@@ -0,0 +1,28 @@
+import importlib
+import logging
+import threading
+from typing import Sequence
+
+logger = logging.getLogger(__name__)
+
+# Modules imported where they are first used, as they take seconds to import together
+HEAVY_MODULES = ("litellm", "bs4", "PIL.Image")
+
+
+def preload_modules(modules: Sequence[str] = HEAVY_MODULES) -> threading.Thread:
+    """
+    Imports modules in a daemon thread, so they are ready by the time they are used.
+
+    A module failing to import is skipped: it fails again, with its error, where it is used.
+    """
+
+    def preload() -> None:
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                logger.debug(f"Could not preload {module}: {e}")
+
+    thread = threading.Thread(target=preload, name="preload-modules", daemon=True)
+    thread.start()
+    return thread
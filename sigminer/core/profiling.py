@@ -0,0 +1,154 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+from typing import List, Optional, Tuple
+
+from sigminer.core.loop_monitor import LoopLagMonitor
+
+# Callbacks holding the event loop longer than this are reported, in seconds
+DEFAULT_SLOW_CALLBACK_THRESHOLD = 0.1
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_TOP_CALLBACKS = 20
+
+
+def get_profile_paths(log_path: str) -> Tuple[str, str]:
+    """Returns the paths of the text report and of the raw profile, next to the log file."""
+    base_path = os.path.splitext(log_path)[0]
+    return f"{base_path}_profile.txt", f"{base_path}_profile.prof"
+
+
+class SlowCallbackHandler(logging.Handler):
+    """Collects the slow callbacks asyncio reports in debug mode."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.callbacks: List[Tuple[float, str]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Logged by the event loop as ("Executing %s took %.3f seconds", handle, duration)
+        if record.msg.startswith("Executing") and len(record.args or ()) == 2:
+            handle, duration = record.args
+            self.callbacks.append((duration, str(handle)))
+
+
+class RunProfiler:
+    """
+    Profiles an extraction run on its event loop.
+
+    The loop thread runs under cProfile, and the loop runs in debug mode to report the
+    callbacks holding it longer than `slow_callback_threshold`. The lag and the stalls
+    come from the loop monitor of the run, or from a monitor of the profiler. Wall
+    time against CPU time tells a CPU-bound run from one waiting on the network.
+    `duration` limits the CPU profile to the start of the run, to keep its overhead
+    off long runs.
+
+    Work sent to threads and processes is not in the CPU profile: it shows as the
+    time the loop spends waiting, and the run summary has it per stage.
+    """
+
+    def __init__(
+        self,
+        report_path: str,
+        profile_path: Optional[str] = None,
+        duration: Optional[float] = None,
+        slow_callback_threshold: float = DEFAULT_SLOW_CALLBACK_THRESHOLD,
+        loop_monitor: Optional[LoopLagMonitor] = None,
+    ) -> None:
+        self.report_path = report_path
+        self.profile_path = profile_path
+        self.duration = duration
+        self.slow_callback_threshold = slow_callback_threshold
+        # The profiler runs its own monitor when the run has none
+        self.owns_loop_monitor = loop_monitor is None
+        self.loop_monitor = loop_monitor or LoopLagMonitor()
+        self.profile = cProfile.Profile()
+        self.profiling = False
+        self.slow_callbacks = SlowCallbackHandler()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_debug = False
+        self.profile_timer: Optional[asyncio.TimerHandle] = None
+        self.started_at = 0.0
+        self.cpu_started_at = 0.0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+    def start(self) -> None:
+        """Starts profiling, from a coroutine running on the loop to profile."""
+        self.loop = asyncio.get_running_loop()
+        self.loop_debug = self.loop.get_debug()
+        self.loop.set_debug(True)
+        self.loop.slow_callback_duration = self.slow_callback_threshold
+        logging.getLogger("asyncio").addHandler(self.slow_callbacks)
+        if self.owns_loop_monitor:
+            self.loop_monitor.start()
+        self.started_at = time.perf_counter()
+        self.cpu_started_at = time.process_time()
+        self.profile.enable()
+        self.profiling = True
+        if self.duration is not None:
+            self.profile_timer = self.loop.call_later(self.duration, self.stop_cpu_profile)
+
+    def stop_cpu_profile(self) -> None:
+        if self.profiling:
+            self.profile.disable()
+            self.profiling = False
+
+    def stop(self) -> None:
+        """
+        Stops profiling and writes the report, of the part of the run profiled when the
+        run failed. The loop is always restored, even if the report cannot be written.
+        """
+        try:
+            self.stop_cpu_profile()
+            self.wall_time = time.perf_counter() - self.started_at
+            self.cpu_time = time.process_time() - self.cpu_started_at
+            if self.profile_timer is not None:
+                self.profile_timer.cancel()
+            if self.owns_loop_monitor:
+                self.loop_monitor.stop()
+        finally:
+            logging.getLogger("asyncio").removeHandler(self.slow_callbacks)
+            self.loop.set_debug(self.loop_debug)
+        if self.profile_path:
+            self.profile.dump_stats(self.profile_path)
+        with open(self.report_path, "w") as report_file:
+            report_file.write(self.get_report())
+
+    def get_report(self) -> str:
+        cpu_share = self.cpu_time / self.wall_time if self.wall_time else 0.0
+        lines = [
+            f"Wall time: {self.wall_time:.2f} s",
+            f"CPU time: {self.cpu_time:.2f} s ({cpu_share:.1%} of the wall time)",
+        ]
+        lines.extend(self.loop_monitor.get_summary())
+        callbacks = sorted(self.slow_callbacks.callbacks, reverse=True)
+        lines.append(
+            f"Callbacks holding the event loop over "
+            f"{self.slow_callback_threshold * 1000:.0f} ms: {len(callbacks)}"
+        )
+        for duration, handle in callbacks[:PROFILE_TOP_CALLBACKS]:
+            lines.append(f"  {duration * 1000:.1f} ms  {handle}")
+        for event in self.loop_monitor.blocking_events:
+            lines.append("")
+            lines.append(f"Event loop blocked for {event.duration * 1000:.0f} ms in:")
+            lines.append(event.stack.rstrip())
+
+        lines.append("")
+        lines.append(
+            "CPU profile of the event loop thread"
+            + (f", over the first {self.duration:.0f} s" if self.duration is not None else "")
+            + ":"
+        )
+        stream = io.StringIO()
+        try:
+            stats = pstats.Stats(self.profile, stream=stream)
+        except TypeError:
+            stream.write("No calls were profiled.\n")
+        else:
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        lines.append(stream.getvalue())
+        return "\n".join(lines)
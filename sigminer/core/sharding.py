@@ -0,0 +1,222 @@
+import asyncio
+import multiprocessing
+import queue
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from sigminer.core.models.extraction import LauncherConfig
+
+# Seconds between two checks of the stop flag while waiting for shard events
+EVENT_POLL_INTERVAL = 0.5
+
+
+def get_shard_index(email_address: str, shard_count: int) -> int:
+    """Returns the shard of a sender address, stable across runs and processes."""
+    return zlib.crc32(email_address.lower().encode("utf-8")) % shard_count
+
+
+def shard_emails(emails: list[dict], shard_count: int) -> list[list[dict]]:
+    """
+    Splits emails into shards by sender address.
+
+    All the emails of a sender land in the same shard, so each contact is only ever
+    written by one process and the shards merge without conflicts. Empty shards are
+    dropped.
+    """
+    from sigminer.core.extraction_engine import get_sender_address
+
+    shards = [[] for _ in range(shard_count)]
+    for email in emails:
+        email_address = get_sender_address(email) or ""
+        shards[get_shard_index(email_address, shard_count)].append(email)
+    return [shard for shard in shards if shard]
+
+
+def get_shard_config(launcher_config: LauncherConfig, shard_count: int) -> LauncherConfig:
+    """Returns the configuration of one shard, with an even share of the budget."""
+    shard_config = dict(launcher_config)
+    shard_config["shard_processes"] = 1
+    budget = launcher_config.get("budget")
+    if budget:
+        shard_budget = dict(budget)
+        if budget.get("max_cost") is not None:
+            shard_budget["max_cost"] = budget["max_cost"] / shard_count
+        if budget.get("max_tokens") is not None:
+            shard_budget["max_tokens"] = budget["max_tokens"] // shard_count
+        shard_config["budget"] = shard_budget
+    return shard_config
+
+
+def merge_shard_contacts(
+    existing_contacts: dict[str, dict], shard_contacts: list[dict[str, dict]]
+) -> dict[str, dict]:
+    """
+    Merges the contacts of every shard into the existing contacts.
+
+    Shards hold disjoint senders, and are applied in shard order so the result does
+    not depend on which process finished first.
+    """
+    merged = dict(existing_contacts)
+    for contacts in shard_contacts:
+        for email_address in sorted(contacts):
+            merged[email_address] = contacts[email_address]
+    return merged
+
+
+def subtract_counters(counters: dict, previous: dict) -> dict:
+    """Returns how much the counters of an engine grew since a previous reading."""
+    delta = {}
+    for name, value in counters.items():
+        if isinstance(value, dict):
+            delta[name] = subtract_counters(value, previous.get(name, {}))
+        else:
+            delta[name] = value - previous.get(name, 0)
+    return delta
+
+
+async def run_shard_engine(engine, emails: list[dict], stop_event) -> None:
+    async def watch_stop():
+        while not stop_event.is_set():
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+        engine.stop()
+
+    watcher = asyncio.create_task(watch_stop())
+    engine.loop_monitor.start()
+    try:
+        await engine.process_emails(emails)
+    finally:
+        engine.loop_monitor.stop()
+        watcher.cancel()
+
+
+def run_shard(
+    access_token: str,
+    launcher_config: LauncherConfig,
+    emails: list[dict],
+    existing_contacts: dict[str, dict],
+    log_path: str,
+    events,
+    stop_event,
+    token_provider=None,
+) -> dict:
+    """Processes one shard of emails in a worker process."""
+    from sigminer.core.extraction_engine import ExtractionEngine
+
+    forwarded_counters = {}
+
+    def get_counters_delta() -> dict:
+        nonlocal forwarded_counters
+        counters = engine.get_counters()
+        delta = subtract_counters(counters, forwarded_counters)
+        forwarded_counters = counters
+        return delta
+
+    engine = ExtractionEngine(
+        access_token,
+        launcher_config,
+        on_log=lambda message, level: events.put(("log", (message, level))),
+        on_progress=lambda progress: events.put(("processed", get_counters_delta())),
+        log_path=log_path,
+        token_provider=token_provider,
+    )
+    engine.existing_contacts = existing_contacts
+    try:
+        asyncio.run(run_shard_engine(engine, emails, stop_event))
+    finally:
+        if engine.mirror is not None:
+            engine.mirror.close()
+    # Counters that grew after the last email, such as the emails skipped by a stop
+    events.put(("counters", get_counters_delta()))
+    return {"contacts": engine.existing_contacts, "latencies": engine.get_latencies()}
+
+
+async def forward_shard_events(engine, events, stop_event, total_emails: int) -> None:
+    """
+    Forwards the logs and progress of the shards to the engine.
+
+    Each processed email carries the growth of the counters of its shard, so the
+    live metrics of the parent follow the run instead of jumping at the end.
+    """
+    processed_emails = 0
+    while True:
+        if engine.stop_requested:
+            stop_event.set()
+        try:
+            event, data = await asyncio.to_thread(
+                events.get, timeout=EVENT_POLL_INTERVAL
+            )
+        except queue.Empty:
+            continue
+        if event == "done":
+            return
+        if event == "log":
+            engine.on_log(*data)
+        elif event == "counters":
+            engine.add_counters(data)
+        elif event == "processed":
+            engine.add_counters(data)
+            processed_emails += 1
+            engine.on_progress(int(processed_emails / max(total_emails, 1) * 100))
+
+
+async def process_emails_in_shards(engine, emails: list[dict], shard_count: int):
+    """
+    Processes emails in worker processes, one engine per shard of senders.
+
+    Each worker runs its own event loop, so parsing, token counting and schema
+    validation run in parallel instead of sharing one core. Logs and progress flow
+    back to the parent through a queue with the counters as they grow, and contacts
+    and latencies are merged once every shard has finished.
+    """
+    from sigminer.core.extraction_engine import get_sender_address
+
+    shards = shard_emails(emails, shard_count)
+    shard_config = get_shard_config(engine.launcher_config, len(shards))
+    await engine.log_message(
+        f"Processing {len(emails)} emails in {len(shards)} shard processes."
+    )
+
+    context = multiprocessing.get_context("spawn")
+    loop = asyncio.get_running_loop()
+    with context.Manager() as manager:
+        events = manager.Queue()
+        stop_event = manager.Event()
+        forwarder = asyncio.create_task(
+            forward_shard_events(engine, events, stop_event, len(emails))
+        )
+        try:
+            with ProcessPoolExecutor(
+                max_workers=len(shards), mp_context=context
+            ) as pool:
+                futures = []
+                for shard in shards:
+                    senders = {get_sender_address(email) for email in shard}
+                    shard_contacts = {
+                        email_address: contact
+                        for email_address, contact in engine.existing_contacts.items()
+                        if email_address in senders
+                    }
+                    futures.append(
+                        loop.run_in_executor(
+                            pool,
+                            run_shard,
+                            engine.access_token,
+                            shard_config,
+                            shard,
+                            shard_contacts,
+                            engine.log_path,
+                            events,
+                            stop_event,
+                            engine.token_provider,
+                        )
+                    )
+                results = await asyncio.gather(*futures)
+        finally:
+            events.put(("done", None))
+            await forwarder
+
+    engine.existing_contacts = merge_shard_contacts(
+        engine.existing_contacts, [result["contacts"] for result in results]
+    )
+    for result in results:
+        engine.add_latencies(result["latencies"])
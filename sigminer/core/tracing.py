@@ -0,0 +1,194 @@
+import asyncio
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Literal
+
+TraceFormat = Literal["jsonl", "chrome"]
+TRACE_FORMATS = ["jsonl", "chrome"]
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Attributes added to every span opened in the current task or thread, such as the email ID
+trace_context: ContextVar[Dict[str, Any]] = ContextVar("trace_context", default={})
+
+
+@contextlib.contextmanager
+def trace_attributes(**attributes: Any) -> Iterator[None]:
+    """Tags the spans opened within the block, including in tasks and threads it starts."""
+    token = trace_context.set({**trace_context.get(), **attributes})
+    try:
+        yield
+    finally:
+        trace_context.reset(token)
+
+
+def get_track_id() -> int:
+    """Returns the ID of the running asyncio task, or of the thread outside of a loop."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+class Tracer:
+    """
+    Times the stages of an extraction: Graph paging, attachment fetches, HTML parsing,
+    model queries and CSV writes.
+
+    Durations are always summed per stage for the run summary, and counted in latency
+    histograms per stage and model for the metrics endpoint. When `record_spans` is
+    set, each span is also kept with its attributes, in the shape of OpenTelemetry spans,
+    to be exported as JSON lines or as a Chrome trace opened in Perfetto or
+    chrome://tracing. Stages run in worker threads too, so the tracer is thread-safe.
+    """
+
+    def __init__(self, record_spans: bool = False) -> None:
+        self.record_spans = record_spans
+        self.lock = threading.Lock()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self.in_flight: Dict[str, int] = {}
+        # Stage => model, or "" outside of model queries => bucket counts, count and sum
+        self.histograms: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Times a block as a span of the given stage.
+
+        Yields:
+            Dict[str, Any]: The attributes of the span, to which the block can add results.
+        """
+        attributes = {**trace_context.get(), **attributes}
+        start_time_us = time.time_ns() // 1000
+        start = time.perf_counter()
+        status = "ok"
+        with self.lock:
+            self.in_flight[name] = self.in_flight.get(name, 0) + 1
+        try:
+            yield attributes
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.in_flight[name] -= 1
+            self.add(name, duration, attributes.get("model", ""), status == "error")
+            if self.record_spans:
+                span = {
+                    "name": name,
+                    "start_time_us": start_time_us,
+                    "duration_us": int(duration * 1_000_000),
+                    "status": status,
+                    "pid": os.getpid(),
+                    "track": get_track_id(),
+                    "attributes": attributes,
+                }
+                with self.lock:
+                    self.spans.append(span)
+
+    def add(self, name: str, duration: float, model: str = "", failed: bool = False) -> None:
+        with self.lock:
+            stage = self.stages.setdefault(
+                name, {"count": 0, "total": 0.0, "max": 0.0, "errors": 0}
+            )
+            stage["count"] += 1
+            stage["total"] += duration
+            stage["max"] = max(stage["max"], duration)
+            stage["errors"] += int(failed)
+            histogram = self.get_histogram(name, model)
+            # Durations past the last bucket are only counted in the total
+            bucket = bisect.bisect_left(LATENCY_BUCKETS, duration)
+            if bucket < len(LATENCY_BUCKETS):
+                histogram["buckets"][bucket] += 1
+            histogram["count"] += 1
+            histogram["sum"] += duration
+
+    def get_histogram(self, name: str, model: str) -> Dict[str, Any]:
+        return self.histograms.setdefault(name, {}).setdefault(
+            model, {"buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0}
+        )
+
+    def merge(
+        self,
+        stages: Dict[str, Dict[str, float]],
+        spans: List[Dict[str, Any]],
+        histograms: Dict[str, Dict[str, Dict[str, Any]]],
+    ) -> None:
+        """
+        Adds the stages, spans and histograms recorded by another tracer, e.g. in a shard
+        process.
+        """
+        with self.lock:
+            for name, other in stages.items():
+                stage = self.stages.setdefault(
+                    name, {"count": 0, "total": 0.0, "max": 0.0, "errors": 0}
+                )
+                stage["count"] += other["count"]
+                stage["total"] += other["total"]
+                stage["max"] = max(stage["max"], other["max"])
+                stage["errors"] += other["errors"]
+            for name, models in histograms.items():
+                for model, other in models.items():
+                    histogram = self.get_histogram(name, model)
+                    histogram["buckets"] = [
+                        count + other_count
+                        for count, other_count in zip(histogram["buckets"], other["buckets"])
+                    ]
+                    histogram["count"] += other["count"]
+                    histogram["sum"] += other["sum"]
+            self.spans.extend(spans)
+
+    def get_in_flight(self) -> Dict[str, int]:
+        """Returns the number of calls currently running in each stage."""
+        with self.lock:
+            return dict(self.in_flight)
+
+    def get_stages(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return {name: dict(stage) for name, stage in self.stages.items()}
+
+    def get_histograms(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self.lock:
+            return {
+                name: {
+                    model: {**histogram, "buckets": list(histogram["buckets"])}
+                    for model, histogram in models.items()
+                }
+                for name, models in self.histograms.items()
+            }
+
+    def export(self, path: str, trace_format: TraceFormat = "jsonl") -> None:
+        """Writes the recorded spans to a local file, in JSON lines or Chrome trace format."""
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span["start_time_us"])
+        with open(path, "w") as trace_file:
+            if trace_format == "jsonl":
+                for span in spans:
+                    trace_file.write(json.dumps(span, default=str) + "\n")
+                return
+            if trace_format != "chrome":
+                raise ValueError(f"Unknown trace format: {trace_format}")
+            # Tracks are numbered, each task getting its own row in the viewer
+            tracks: Dict[tuple, int] = {}
+            events = [
+                {
+                    "name": span["name"],
+                    "cat": span["name"].split(".")[0],
+                    "ph": "X",
+                    "ts": span["start_time_us"],
+                    "dur": span["duration_us"],
+                    "pid": span["pid"],
+                    "tid": tracks.setdefault((span["pid"], span["track"]), len(tracks) + 1),
+                    "args": {**span["attributes"], "status": span["status"]},
+                }
+                for span in spans
+            ]
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file, default=str)
@@ -7,6 +7,19 @@ THOUGHT_PROCESS_DESCRIPTION = """
 Be concise.
 """
 
+CONFIDENCE_SCORE_DESCRIPTION = """
+A number between 0 and 1 expressing how confident you are that the answer is correct and complete.
+Use 1 when the answer is stated explicitly in the source material, and a low value when it is guessed or missing.
+"""
+
+ANSWER_DESCRIPTION = """
+The value of the requested metadata, as it will be stored in database.
+Empty string if it cannot be found.
+"""
+
 
-def get_answer_field_description(meta: str, description: str) -> str:
-    return f"This value will be stored in database in the {meta} column. {description}"
+def get_extraction_query(field_name: str, guideline: str = "") -> str:
+    query = f"Extract this metadata: {field_name}."
+    if guideline:
+        query += f" Guideline: {guideline}"
+    return query + " If impossible, return an empty string."
@@ -94,7 +94,8 @@ class AuthView(QWidget):
         self.setFixedSize(400, 300)
 
     def authenticate(self):
-        from sigminer.auth.auth_manager import AuthManager
+        from sigminer.auth.auth_manager import GRAPH_SCOPES, AuthManager
+        from sigminer.auth.token_provider import MsalTokenProvider
         from PyQt5.QtWidgets import QMessageBox
 
         client_id = self.client_id_input.text()
@@ -106,8 +107,11 @@ class AuthView(QWidget):
 
         try:
             auth_manager = AuthManager(client_id, tenant_id)
-            access_token = auth_manager.get_access_token(["User.Read", "Mail.Read"])
+            access_token = auth_manager.get_access_token(GRAPH_SCOPES)
             QMessageBox.information(self, "Success", "Authentication successful")
-            self.on_authenticated_callback(access_token)
+            # Long extractions outlive the token, the provider refreshes it silently
+            self.on_authenticated_callback(
+                access_token, MsalTokenProvider(auth_manager, GRAPH_SCOPES)
+            )
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Authentication failed: {e}")
@@ -1,7 +1,7 @@
 import hashlib
 import json
 
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QDoubleValidator, QFont
 from PyQt5.QtWidgets import (
     QComboBox,
     QDialog,
@@ -21,14 +21,36 @@ from PyQt5.QtWidgets import (
 )
 
 from sigminer.config.config_manager import ConfigManager
+from sigminer.core.email.graph_query import build_message_params
 from sigminer.ui.extraction_view import ExtractionView
 from sigminer.ui.field_form_view import FieldFormView
 
+AVAILABLE_MODELS = [
+    "gpt-4o",
+    "gpt-4o-2024-08-06",
+    "gpt-4o-mini",
+    "o1-mini",
+    "gpt-4-turbo",
+    "gpt-3.5-turbo-0125",
+]
+NO_ESCALATION = "No escalation"
+EXECUTION_MODES = {
+    "Interactive": "interactive",
+    "Batch (overnight, half price)": "batch",
+}
+MIRROR_MODES = {
+    "Off": "off",
+    "Reuse mirrored emails, record the others": "auto",
+    "Record again": "refresh",
+    "Offline (mirrored emails only)": "offline",
+}
+
 
 class EmailView(QWidget):
-    def __init__(self, access_token):
+    def __init__(self, access_token, token_provider=None):
         super().__init__()
         self.access_token = access_token
+        self.token_provider = token_provider
         self.config_manager = ConfigManager()
         self.field_forms = []
         self.excluded_hosts = []  # List of domains to exclude
@@ -125,6 +147,64 @@ class EmailView(QWidget):
         self.file_path_button.clicked.connect(self.open_file_dialog)
         main_layout.addWidget(self.file_path_button)
 
+        # Label for mailboxes input
+        self.mailboxes_label = QLabel(
+            "Mailboxes to process (comma-separated, leave empty for yours):"
+        )
+        main_layout.addWidget(self.mailboxes_label)
+
+        # Input for the user or shared mailboxes merged into the same contacts
+        self.mailboxes_input = QLineEdit(self)
+        self.mailboxes_input.setPlaceholderText(
+            "Enter user IDs or addresses (e.g., sales@contoso.com)"
+        )
+        self.mailboxes_input.textChanged.connect(self.on_field_modified)
+        main_layout.addWidget(self.mailboxes_input)
+
+        # Folders and received-date window, applied by Graph
+        self.folders_label = QLabel(
+            "Folders to process (comma-separated, leave empty for all):"
+        )
+        main_layout.addWidget(self.folders_label)
+
+        self.folders_input = QLineEdit(self)
+        self.folders_input.setPlaceholderText(
+            "Enter folder names or IDs (e.g., inbox, archive)"
+        )
+        self.folders_input.textChanged.connect(self.on_field_modified)
+        main_layout.addWidget(self.folders_input)
+
+        self.received_window_label = QLabel(
+            "Received between (YYYY-MM-DD, leave empty for no limit):"
+        )
+        main_layout.addWidget(self.received_window_label)
+
+        received_window_layout = QHBoxLayout()
+        self.received_after_input = QLineEdit(self)
+        self.received_after_input.setPlaceholderText("From")
+        self.received_after_input.textChanged.connect(self.on_field_modified)
+        received_window_layout.addWidget(self.received_after_input)
+        self.received_before_input = QLineEdit(self)
+        self.received_before_input.setPlaceholderText("Until (excluded)")
+        self.received_before_input.textChanged.connect(self.on_field_modified)
+        received_window_layout.addWidget(self.received_before_input)
+        main_layout.addLayout(received_window_layout)
+
+        # Raw Graph predicates for advanced scoping
+        self.message_filter_input = QLineEdit(self)
+        self.message_filter_input.setPlaceholderText(
+            "Optional Graph $filter (e.g., hasAttachments eq true)"
+        )
+        self.message_filter_input.textChanged.connect(self.on_field_modified)
+        main_layout.addWidget(self.message_filter_input)
+
+        self.message_search_input = QLineEdit(self)
+        self.message_search_input.setPlaceholderText(
+            "Optional Graph $search (e.g., invoice), not combinable with dates or $filter"
+        )
+        self.message_search_input.textChanged.connect(self.on_field_modified)
+        main_layout.addWidget(self.message_search_input)
+
         # Label for max emails input
         self.max_emails_label = QLabel("Max emails to process (leave empty for all):")
         main_layout.addWidget(self.max_emails_label)
@@ -136,24 +216,61 @@ class EmailView(QWidget):
         )
         main_layout.addWidget(self.max_emails_input)
 
+        # Label for max budget input
+        self.max_cost_label = QLabel("Max budget in $ (leave empty for no budget):")
+        main_layout.addWidget(self.max_cost_label)
+
+        # Input for the max amount of dollars to spend on the run
+        self.max_cost_input = QLineEdit(self)
+        self.max_cost_input.setPlaceholderText(
+            "Enter max budget in $ (leave empty for no budget)"
+        )
+        self.max_cost_input.setValidator(QDoubleValidator(0.0, 1e9, 4, self))
+        self.max_cost_input.textChanged.connect(self.on_field_modified)
+        main_layout.addWidget(self.max_cost_input)
+
         # Label for OpenAI model selection
         self.model_selector_label = QLabel("Select OpenAI Model:")
         main_layout.addWidget(self.model_selector_label)
 
         self.model_selector = QComboBox(self)
-        self.model_selector.addItems(
-            [
-                "gpt-4o",
-                "gpt-4o-2024-08-06",
-                "gpt-4o-mini",
-                "o1-mini",
-                "gpt-4-turbo",
-                "gpt-3.5-turbo-0125",
-            ]
-        )
+        self.model_selector.addItems(AVAILABLE_MODELS)
         self.model_selector.setCurrentIndex(0)  # Set default selected value
         main_layout.addWidget(self.model_selector)
 
+        # Model used to retry low-confidence or empty answers
+        self.escalation_selector_label = QLabel(
+            "Escalate low-confidence answers to:"
+        )
+        main_layout.addWidget(self.escalation_selector_label)
+
+        self.escalation_selector = QComboBox(self)
+        self.escalation_selector.addItems([NO_ESCALATION] + AVAILABLE_MODELS)
+        self.escalation_selector.setCurrentIndex(0)
+        self.escalation_selector.currentIndexChanged.connect(self.on_field_modified)
+        main_layout.addWidget(self.escalation_selector)
+
+        # Interactive requests or an offline batch submitted to the Batch API
+        self.execution_mode_label = QLabel("Execution mode:")
+        main_layout.addWidget(self.execution_mode_label)
+
+        self.execution_mode_selector = QComboBox(self)
+        self.execution_mode_selector.addItems(list(EXECUTION_MODES))
+        self.execution_mode_selector.setCurrentIndex(0)
+        self.execution_mode_selector.currentIndexChanged.connect(
+            self.on_field_modified
+        )
+        main_layout.addWidget(self.execution_mode_selector)
+
+        # Local copy of the mailbox, so trial runs on new guidelines skip Graph
+        self.mirror_mode_label = QLabel("Mailbox mirror:")
+        main_layout.addWidget(self.mirror_mode_label)
+
+        self.mirror_mode_selector = QComboBox(self)
+        self.mirror_mode_selector.addItems(list(MIRROR_MODES))
+        self.mirror_mode_selector.setCurrentIndex(0)
+        main_layout.addWidget(self.mirror_mode_selector)
+
         # Button to show model pricing
         self.model_pricing_button = QPushButton("Show Model Pricing", self)
         self.model_pricing_button.clicked.connect(self.show_model_pricing)
@@ -257,15 +374,59 @@ class EmailView(QWidget):
                     else None
                 ),
                 "model": self.model_selector.currentText(),  # Add selected model to config
+                "escalation_model": self.get_escalation_model(),
+                "execution_mode": self.get_execution_mode(),
+                "budget": self.get_budget(),
+                "mailboxes": self.get_mailboxes(),
+                "scope": self.get_scope(),
+                "mirror_mode": MIRROR_MODES[self.mirror_mode_selector.currentText()],
             }
+            build_message_params(config_data["scope"])  # Validates the scope
 
             # Create the modal and launch the process in the background
-            modal = ExtractionView(self, self.access_token, config_data)
+            modal = ExtractionView(
+                self, self.access_token, config_data, self.token_provider
+            )
             modal.exec_()
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to launch service: {e}")
 
+    def get_escalation_model(self):
+        escalation_model = self.escalation_selector.currentText()
+        return None if escalation_model == NO_ESCALATION else escalation_model
+
+    def get_budget(self):
+        try:
+            return {"max_cost": float(self.max_cost_input.text())}
+        except ValueError:
+            return None
+
+    def get_mailboxes(self):
+        return [
+            mailbox.strip()
+            for mailbox in self.mailboxes_input.text().split(",")
+            if mailbox.strip()
+        ]
+
+    def get_scope(self):
+        scope = {
+            "folders": [
+                folder.strip()
+                for folder in self.folders_input.text().split(",")
+                if folder.strip()
+            ],
+            "received_after": self.received_after_input.text().strip(),
+            "received_before": self.received_before_input.text().strip(),
+            "filter": self.message_filter_input.text().strip(),
+            "search": self.message_search_input.text().strip(),
+        }
+        scope = {key: value for key, value in scope.items() if value}
+        return scope or None
+
+    def get_execution_mode(self):
+        return EXECUTION_MODES[self.execution_mode_selector.currentText()]
+
     def show_launch_modal(self, data):
         modal = ExtractionView(self, data)
         modal.exec_()
@@ -330,6 +491,11 @@ class EmailView(QWidget):
             "file_path": self.file_path_button.text(),  # Use button text for file path
             "max_emails": self.max_emails_input.text(),
             "model": self.model_selector.currentText(),  # Add selected model to preset
+            "escalation_model": self.get_escalation_model(),
+            "execution_mode": self.get_execution_mode(),
+            "budget": self.get_budget(),
+            "mailboxes": self.get_mailboxes(),
+            "scope": self.get_scope(),
         }
 
         current_preset_name = self.preset_selector.currentText()
@@ -413,12 +579,41 @@ class EmailView(QWidget):
             max_emails = preset_data.get("max_emails", "")
             self.max_emails_input.setText(max_emails)
 
+            # Load mailboxes
+            self.mailboxes_input.setText(", ".join(preset_data.get("mailboxes", [])))
+
+            # Load folders, received-date window and predicates
+            scope = preset_data.get("scope") or {}
+            self.folders_input.setText(", ".join(scope.get("folders", [])))
+            self.received_after_input.setText(scope.get("received_after") or "")
+            self.received_before_input.setText(scope.get("received_before") or "")
+            self.message_filter_input.setText(scope.get("filter") or "")
+            self.message_search_input.setText(scope.get("search") or "")
+
+            # Load max budget
+            budget = preset_data.get("budget") or {}
+            max_cost = budget.get("max_cost")
+            self.max_cost_input.setText("" if max_cost is None else str(max_cost))
+
             # Load OpenAI model
             model = preset_data.get("model", "")
             index = self.model_selector.findText(model)
             if index >= 0:
                 self.model_selector.setCurrentIndex(index)
 
+            # Load escalation model
+            escalation_model = preset_data.get("escalation_model") or NO_ESCALATION
+            index = self.escalation_selector.findText(escalation_model)
+            self.escalation_selector.setCurrentIndex(max(index, 0))
+
+            # Load execution mode
+            execution_mode = preset_data.get("execution_mode", "interactive")
+            labels = {mode: label for label, mode in EXECUTION_MODES.items()}
+            index = self.execution_mode_selector.findText(
+                labels.get(execution_mode, "")
+            )
+            self.execution_mode_selector.setCurrentIndex(max(index, 0))
+
             self.update_hosts_label()
 
             self.original_preset_hash = self.get_preset_hash(preset_data)
@@ -443,6 +638,11 @@ class EmailView(QWidget):
             "include_mode": include_mode,
             "exclusion_guideline": exclusion_guideline,
             "model": self.model_selector.currentText(),  # Add selected model to hash calculation
+            "escalation_model": self.get_escalation_model(),
+            "execution_mode": self.get_execution_mode(),
+            "budget": self.max_cost_input.text().strip(),
+            "mailboxes": self.get_mailboxes(),
+            "scope": self.get_scope(),
         }
         current_hash = self.get_preset_hash(preset_data)
         if len(self.field_forms) > 0 and current_hash != self.original_preset_hash:
@@ -1,24 +1,48 @@
+from typing import Optional
+
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import (
     QVBoxLayout,
+    QHBoxLayout,
     QDialog,
-    QTextEdit,
+    QComboBox,
     QDialogButtonBox,
+    QFormLayout,
+    QGroupBox,
+    QLabel,
+    QLineEdit,
+    QListView,
     QProgressBar,
 )
-from PyQt5.QtGui import QTextCursor
 
+from sigminer.auth.token_provider import TokenProvider
 from sigminer.core.extraction_worker import ExtractionWorker, LauncherConfig
+from sigminer.core.live_metrics import format_snapshot
+from sigminer.core.models.extraction import LOG_LEVELS
+from sigminer.ui.log_model import LogFilterProxyModel, LogListModel
+
+# Milliseconds between two batches of log lines added to the view
+LOG_FLUSH_INTERVAL = 100
 
 
 class ExtractionView(QDialog):
-    def __init__(self, parent, access_token: str, launcher_config: LauncherConfig):
+    def __init__(
+        self,
+        parent,
+        access_token: str,
+        launcher_config: LauncherConfig,
+        token_provider: Optional[TokenProvider] = None,
+    ):
         super().__init__(parent)
         self.init_ui()
 
         # Launch the service in a separate thread
-        self.worker = ExtractionWorker(access_token, launcher_config)
+        self.worker = ExtractionWorker(
+            access_token, launcher_config, token_provider=token_provider
+        )
         self.worker.log_signal.connect(self.append_log)
         self.worker.progress_signal.connect(self.update_progress)
+        self.worker.metrics_signal.connect(self.update_metrics)
         self.worker.start()
 
     def init_ui(self):
@@ -29,12 +53,44 @@ class ExtractionView(QDialog):
 
         layout = QVBoxLayout()
 
-        # Display logs of the ongoing process
-        self.log_output = QTextEdit(self)
-        self.log_output.setReadOnly(True)
+        # Live metrics, refreshed from the periodic snapshots of the worker
+        self.metrics_box = QGroupBox("Live metrics", self)
+        self.metrics_layout = QFormLayout()
+        self.metrics_box.setLayout(self.metrics_layout)
+        self.metric_labels = {}
+        layout.addWidget(self.metrics_box)
+
+        # Filter the logs by level and search them
+        filter_layout = QHBoxLayout()
+        self.level_combo = QComboBox(self)
+        self.level_combo.addItems(LOG_LEVELS)
+        self.level_combo.currentTextChanged.connect(self.filter_logs_by_level)
+        filter_layout.addWidget(QLabel("Level:", self))
+        filter_layout.addWidget(self.level_combo)
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("Search logs")
+        self.search_input.textChanged.connect(self.search_logs)
+        filter_layout.addWidget(self.search_input)
+        layout.addLayout(filter_layout)
+
+        # Display the last logs of the ongoing process, the full log is in the log file
+        self.log_model = LogListModel(parent=self)
+        self.log_filter = LogFilterProxyModel(self)
+        self.log_filter.setSourceModel(self.log_model)
+        self.log_output = QListView(self)
+        self.log_output.setModel(self.log_filter)
+        self.log_output.setUniformItemSizes(True)
+        self.log_output.setWordWrap(False)
         self.log_output.setStyleSheet("font-size: 14pt;")
         layout.addWidget(self.log_output)
 
+        # Logs are added in batches rather than one repaint per line
+        self.pending_logs = []
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(LOG_FLUSH_INTERVAL)
+        self.log_timer.timeout.connect(self.flush_logs)
+        self.log_timer.start()
+
         # Add a progress bar
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setRange(0, 100)
@@ -48,10 +104,34 @@ class ExtractionView(QDialog):
         self.setLayout(layout)
         self.update_close_button_message(0)  # Initialize the close button message
 
-    def append_log(self, log):
-        """Add logs to the text area."""
-        self.log_output.append(log)
-        self.log_output.moveCursor(QTextCursor.End)  # Auto-scroll to the bottom
+    def append_log(self, log, level):
+        """Queue logs until the next batch is added to the view."""
+        self.pending_logs.append((level, log))
+
+    def flush_logs(self):
+        """Add the queued logs to the view."""
+        if not self.pending_logs:
+            return
+        scroll_bar = self.log_output.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        logs, self.pending_logs = self.pending_logs, []
+        self.log_model.append_lines(logs)
+        if at_bottom:
+            self.log_output.scrollToBottom()  # Auto-scroll unless the user scrolled up
+
+    def filter_logs_by_level(self, level):
+        self.log_filter.set_min_level(level)
+
+    def search_logs(self, text):
+        self.log_filter.set_search_text(text)
+
+    def update_metrics(self, snapshot):
+        """Update the live metrics panel with a snapshot."""
+        for name, value in format_snapshot(snapshot):
+            if name not in self.metric_labels:
+                self.metric_labels[name] = QLabel(self)
+                self.metrics_layout.addRow(f"{name}:", self.metric_labels[name])
+            self.metric_labels[name].setText(value)
 
     def update_progress(self, progress):
         """Update the progress bar."""
@@ -0,0 +1,78 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QSortFilterProxyModel, Qt
+from PyQt5.QtGui import QColor
+
+from sigminer.core.models.extraction import LOG_LEVELS, LogLevel
+
+# Lines kept in memory, the full log stays in the log file on disk
+DEFAULT_MAX_LOG_LINES = 10000
+LevelRole = Qt.UserRole + 1
+
+LEVEL_COLORS = {"WARNING": QColor("#b8860b"), "ERROR": QColor("#dc3545")}
+
+
+class LogListModel(QAbstractListModel):
+    """
+    Ring buffer of the last log lines, shown in a list view.
+
+    Lines are appended in batches, and the oldest lines are dropped once the buffer is
+    full, so memory stays bounded however long the run. A list view only renders the
+    visible rows, unlike a text edit re-laying out the whole document.
+    """
+
+    def __init__(self, max_lines: int = DEFAULT_MAX_LOG_LINES, parent=None) -> None:
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.lines: list[tuple[LogLevel, str]] = []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        level, message = self.lines[index.row()]
+        if role == Qt.DisplayRole:
+            return message
+        if role == LevelRole:
+            return level
+        if role == Qt.ForegroundRole:
+            return LEVEL_COLORS.get(level)
+        return None
+
+    def append_lines(self, lines: list[tuple[LogLevel, str]]) -> None:
+        """Appends a batch of (level, message) lines, dropping the oldest past the maximum."""
+        lines = lines[-self.max_lines :]
+        if not lines:
+            return
+        overflow = len(self.lines) + len(lines) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            del self.lines[:overflow]
+            self.endRemoveRows()
+        start = len(self.lines)
+        self.beginInsertRows(QModelIndex(), start, start + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+
+
+class LogFilterProxyModel(QSortFilterProxyModel):
+    """Filters log lines by minimum level and by a case-insensitive search text."""
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.min_level: LogLevel = "INFO"
+        self.search_text = ""
+
+    def set_min_level(self, level: LogLevel) -> None:
+        self.min_level = level
+        self.invalidateFilter()
+
+    def set_search_text(self, text: str) -> None:
+        self.search_text = text.casefold()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent) -> bool:
+        level, message = self.sourceModel().lines[source_row]
+        if LOG_LEVELS.index(level) < LOG_LEVELS.index(self.min_level):
+            return False
+        return not self.search_text or self.search_text in message.casefold()
@@ -49,12 +49,12 @@ class MainWindow(QMainWindow):
         window_geometry.moveCenter(center_point)
         self.move(center_point.x() - window_geometry.width() // 2, 0)
 
-    def on_authenticated(self, access_token):
+    def on_authenticated(self, access_token, token_provider=None):
         # Enable the settings button after authentication
         self.settings_action.setEnabled(True)
 
         # Add and switch to the email view
-        self.email_view = EmailView(access_token)
+        self.email_view = EmailView(access_token, token_provider)
         self.stack.addWidget(self.email_view)
         self.stack.setCurrentWidget(self.email_view)
 
@@ -64,17 +64,19 @@ def test_get_access_token_interactive_fail(auth_manager):
     assert "Unable to obtain a token" in str(excinfo.value)
 
 
-@patch("builtins.open", new_callable=MagicMock)
-@patch("os.path.exists", return_value=True)
-def test_save_cache(mock_exists, mock_open, auth_manager):
+def test_save_cache(auth_manager, tmp_path, monkeypatch):
+    cache_path = tmp_path / "sigminer" / "token_cache.bin"
+    monkeypatch.setattr(auth_manager, "CACHE_PATH", str(cache_path))
     auth_manager.token_cache.has_state_changed = True
     auth_manager.token_cache.serialize = MagicMock(return_value="serialized_cache_data")
-    mock_file = MagicMock()
-    mock_open.return_value.__enter__.return_value = mock_file
     auth_manager.save_cache()
-    mock_open.assert_called_once_with(auth_manager.CACHE_PATH, "w")
     auth_manager.token_cache.serialize.assert_called_once()
-    mock_file.write.assert_called_once_with("serialized_cache_data")
+    assert cache_path.read_text() == "serialized_cache_data"
+    # The cache is replaced atomically, no temporary file is left behind
+    assert sorted(path.name for path in cache_path.parent.iterdir()) == [
+        "token_cache.bin",
+        "token_cache.bin.lock",
+    ]
 
 
 @patch("os.makedirs")
@@ -85,3 +87,12 @@ def test_save_cache_no_change(mock_exists, mock_open, mock_makedirs, auth_manage
     auth_manager.save_cache()
     mock_open.assert_not_called()
     mock_makedirs.assert_not_called()
+
+
+def test_get_access_token_non_interactive_fail(auth_manager):
+    auth_manager.app.get_accounts.return_value = []
+
+    with pytest.raises(Exception) as excinfo:
+        auth_manager.get_access_token(scopes=["User.Read"], interactive=False)
+    assert "Unable to obtain a token silently" in str(excinfo.value)
+    auth_manager.app.acquire_token_interactive.assert_not_called()
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from pydantic import BaseModel
+
+from sigminer.core.llm.batch_client import BatchClient
+from sigminer.core.llm.multi_modal_llm import MultiModalLLM
+
+
+class Answer(BaseModel):
+    answer: str
+
+
+def make_completion(custom_id):
+    arguments = json.dumps({"answer": f"answer for {custom_id}"})
+    return {
+        "id": f"chatcmpl-{custom_id}",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [
+            {
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": "call",
+                            "type": "function",
+                            "function": {"name": "Answer", "arguments": arguments},
+                        }
+                    ],
+                },
+                "finish_reason": "tool_calls",
+            }
+        ],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+    }
+
+
+class StandInBatchServer(BaseHTTPRequestHandler):
+    """Implements the subset of the Batch API used by BatchClient."""
+
+    files = {}
+    batches = {}
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/v1/files":
+            part = body.split(b'filename="')[1]
+            content = re.search(rb"\r\n\r\n(.*?)\r\n--", part, re.S).group(1).decode()
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = content
+            self.send_json({"id": file_id})
+        elif self.path == "/v1/batches":
+            request = json.loads(body)
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "status": "in_progress",
+                "input_file_id": request["input_file_id"],
+            }
+            self.send_json(self.batches[batch_id])
+
+    def do_GET(self):
+        if match := re.fullmatch(r"/v1/batches/(.+)", self.path):
+            batch = self.batches[match.group(1)]
+            lines = self.files[batch["input_file_id"]].splitlines()
+            output = "\n".join(
+                json.dumps(
+                    {
+                        "custom_id": json.loads(line)["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "body": make_completion(json.loads(line)["custom_id"]),
+                        },
+                    }
+                )
+                for line in lines
+            )
+            output_file_id = f"file-{len(self.files)}"
+            self.files[output_file_id] = output
+            batch.update(status="completed", output_file_id=output_file_id)
+            self.send_json(batch)
+        elif match := re.fullmatch(r"/v1/files/(.+)/content", self.path):
+            body = self.files[match.group(1)].encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+@pytest.fixture
+def batch_client():
+    StandInBatchServer.files = {}
+    StandInBatchServer.batches = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInBatchServer)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield BatchClient(
+        api_key="test", base_url=f"http://127.0.0.1:{server.server_port}/v1"
+    )
+    server.shutdown()
+
+
+def test_execute_returns_bodies_by_custom_id(batch_client):
+    llm = MultiModalLLM(default_model="gpt-4o-mini")
+    statuses = []
+
+    async def on_status(batch):
+        statuses.append(batch["status"])
+
+    requests = [
+        {
+            "custom_id": custom_id,
+            "body": llm.build_batch_body("Extract the company", output_cls=Answer),
+        }
+        for custom_id in ["a", "b"]
+    ]
+    results = asyncio.run(
+        batch_client.execute(requests, poll_interval=0, on_status=on_status)
+    )
+
+    assert set(results) == {"a", "b"}
+    assert statuses == ["in_progress", "completed"]
+    answer, cost = llm.parse_batch_response(results["a"], Answer)
+    assert answer.answer == "answer for a"
+    assert cost > 0
+
+
+def test_execute_splits_requests_past_the_batch_limits(batch_client):
+    batch_client.max_batch_requests = 2
+    requests = [
+        {"custom_id": str(index), "body": {"model": "gpt-4o-mini"}} for index in range(5)
+    ]
+
+    results = asyncio.run(batch_client.execute(requests, poll_interval=0))
+
+    assert set(results) == {str(index) for index in range(5)}
+    assert len(StandInBatchServer.batches) == 3
+
+    # The file size limit splits the requests too
+    batch_client.max_batch_requests = 50000
+    line_size = len(batch_client.build_input_files(requests[:1])[0]) + 1
+    batch_client.max_batch_bytes = line_size * 2
+    assert [
+        content.count("\n") + 1 for content in batch_client.build_input_files(requests)
+    ] == [2, 2, 1]
+
+
+def test_batch_usage_is_recorded_under_the_requested_model():
+    llm = MultiModalLLM(default_model="gpt-4o-mini")
+    body = make_completion("a")
+    body["model"] = "gpt-4o-mini-2024-07-18"
+
+    llm.parse_batch_response(body, Answer, "gpt-4o-mini")
+
+    assert list(llm.usage) == ["gpt-4o-mini"]
+
+
+def test_execute_without_requests_submits_nothing(batch_client):
+    assert asyncio.run(batch_client.execute([])) == {}
+    assert StandInBatchServer.batches == {}
+
+
+def test_batch_body_omits_null_parameters():
+    body = MultiModalLLM(default_model="gpt-4o-mini").build_batch_body("Hello")
+    assert "tools" not in body
+    assert "tool_choice" not in body
+    assert body["model"] == "gpt-4o-mini"
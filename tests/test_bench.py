@@ -0,0 +1,202 @@
+import asyncio
+import json
+
+import pytest
+
+from sigminer.bench.evaluation import (
+    get_evaluation_config,
+    load_corpus,
+    run_evaluation,
+    save_corpus,
+    score_contacts,
+)
+from sigminer.bench.fake_graph import FakeGraphServer
+from sigminer.bench.fake_llm import FakeCompletion, FakeLLMError
+from sigminer.bench.runner import BenchmarkOptions, get_percentile, run_benchmark
+from sigminer.bench.synthetic import SIGNATURE_FIELDS, generate_mailbox
+from sigminer.core.email.email_manager import EmailManager
+from sigminer.core.llm.batch_client import BatchClient
+
+
+def test_synthetic_mailbox_is_reproducible():
+    first = generate_mailbox(20, thread_depth=3, image_rate=0.5, seed=1)
+    second = generate_mailbox(20, thread_depth=3, image_rate=0.5, seed=1)
+
+    assert first.messages == second.messages
+    assert first.messages[0]["body"]["content"].count("<blockquote>") == 3
+    with_images = [message for message in first.messages if "cid:" in message["body"]["content"]]
+    assert with_images
+    assert all(first.attachments[message["id"]] for message in with_images)
+    for message in first.messages:
+        contact = first.contacts[message["from"]["emailAddress"]["address"]]
+        assert f"Company: {contact['Company']}" in message["body"]["content"]
+
+
+def test_fake_graph_server_pages_messages_and_attachments():
+    mailbox = generate_mailbox(25, image_rate=1.0)
+    with FakeGraphServer(mailbox, throttle_rate=0.2, seed=3) as graph:
+        manager = EmailManager("token", graph_base_url=graph.base_url)
+        manager.client.backoff_max = 0.0
+
+        emails = asyncio.run(collect(manager.stream_emails(None, "shared@contoso.com", None, 2)))
+        count = manager.count_emails("shared@contoso.com")
+        attachments = manager.fetch_attachments(emails[0]["id"])
+
+    assert [email["id"] for email in emails] == [message["id"] for message in mailbox.messages]
+    assert count == 25
+    assert attachments[0]["contentType"] == "image/png"
+
+
+async def collect(emails):
+    return [email async for email in emails]
+
+
+def test_fake_completion_reads_signature_fields():
+    completion = FakeCompletion(completion_tokens=7)
+    tool = {
+        "type": "function",
+        "function": {
+            "name": "MetaExtraction",
+            "parameters": {"properties": {"answer": {"type": "string"}}},
+        },
+    }
+    content = [
+        {"type": "text", "text": "<p>--<br>Jane Doe<br>Phone: +33 1 23 45 67 89</p>"},
+        {"type": "text", "text": "Extract this metadata: Phone."},
+    ]
+
+    response = asyncio.run(
+        completion(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": content}],
+            tools=[tool],
+        )
+    )
+
+    arguments = json.loads(response.choices[0].message.tool_calls[0].function.arguments)
+    assert arguments["answer"] == "+33 1 23 45 67 89"
+    assert response.usage.completion_tokens == 7
+
+
+def test_fake_completion_fails_after_retries():
+    completion = FakeCompletion(error_rate=1.0)
+
+    with pytest.raises(FakeLLMError):
+        asyncio.run(completion(model="gpt-4o-mini", messages=[], num_retries=2))
+    assert completion.total_requests == 3
+
+
+def test_percentile_by_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+
+    assert get_percentile(values, 50) == 50.0
+    assert get_percentile(values, 95) == 95.0
+    assert get_percentile([], 95) == 0.0
+
+
+def test_benchmark_runs_end_to_end():
+    report = run_benchmark(BenchmarkOptions(emails=30, senders=5, llm_latency=0.0))
+
+    assert report["emails"] == 30
+    assert report["contacts"] == 5
+    assert report["emails_per_second"] > 0
+    assert report["latency_p95_ms"] >= report["latency_p50_ms"]
+    assert report["tokens_per_contact"] > 0
+
+
+def test_benchmark_reports_failed_queries_and_completes():
+    report = run_benchmark(
+        BenchmarkOptions(emails=20, senders=5, llm_latency=0.0, llm_error_rate=0.5)
+    )
+
+    assert report["emails"] == 20
+    assert report["llm_errors"] > 0
+    # Queries failing all their retries leave their field empty without stopping the run
+    assert report["llm_failed_queries"] > 0
+    assert report["contacts"] > 0
+
+
+def test_scores_count_wrong_values_as_false_positives_and_negatives():
+    labels = {
+        "a@contoso.com": {"Company": "Contoso", "Phone": ""},
+        "b@fabrikam.com": {"Company": "Fabrikam", "Phone": "+33 1"},
+    }
+    contacts = {
+        "a@contoso.com": {"Company": " contoso ", "Phone": "+44 2"},
+        "b@fabrikam.com": {"Company": "Northwind"},
+    }
+
+    scores = score_contacts(contacts, labels, ["Company", "Phone"])
+
+    assert scores["Company"]["precision"] == 0.5
+    assert scores["Company"]["recall"] == 0.5
+    assert scores["Phone"]["false_positives"] == 1
+    assert scores["Phone"]["false_negatives"] == 1
+    assert scores["all"]["true_positives"] == 1
+
+
+def test_scores_match_addresses_in_any_case(tmp_path):
+    path = str(tmp_path / "corpus.json")
+    with open(path, "w") as corpus_file:
+        json.dump(
+            {"messages": [], "labels": {"Jane.Doe@Contoso.com": {"Company": "Contoso"}}},
+            corpus_file,
+        )
+    contacts = {"jane.doe@CONTOSO.com": {"Company": "Contoso"}}
+
+    scores = score_contacts(contacts, load_corpus(path).contacts, ["Company"])
+
+    assert scores["Company"]["true_positives"] == 1
+    assert scores["Company"]["false_negatives"] == 0
+
+
+def test_evaluation_of_a_batch_preset_stays_local(monkeypatch):
+    def upload_file(self, content):
+        pytest.fail("the evaluation uploaded the corpus to the Batch API")
+
+    monkeypatch.setattr(BatchClient, "upload_file", upload_file)
+    preset = {
+        "fields": [{"field_name": "Company", "guideline": "", "can_be_overwritten": False}],
+        "excluded_hosts": [],
+        "include_mode": False,
+        "exclusion_guideline": "",
+        "model": "gpt-4o-mini",
+        "execution_mode": "batch",
+        "budget": {"max_cost": 0.0},
+    }
+    config = get_evaluation_config(preset)
+
+    report = run_evaluation(generate_mailbox(6, senders=2, seed=4), config, FakeCompletion())
+
+    assert "budget" not in config
+    assert report["emails"] == 6
+    assert report["scores"]["Company"]["recall"] == 1.0
+
+
+def test_evaluation_scores_a_saved_corpus(tmp_path):
+    path = str(tmp_path / "corpus.json")
+    save_corpus(generate_mailbox(12, senders=4, seed=2), path)
+    preset = {
+        "fields": [
+            {"field_name": field_name, "guideline": "", "can_be_overwritten": False}
+            for field_name in SIGNATURE_FIELDS
+        ],
+        "excluded_hosts": [],
+        "include_mode": False,
+        "exclusion_guideline": "",
+        "file_path": "/data/contacts.csv",
+        "max_emails": "5",
+        "model": "gpt-4o",
+        "scope": {"folders": ["inbox", "archive"]},
+    }
+
+    report = run_evaluation(
+        load_corpus(path), get_evaluation_config(preset, model="gpt-4o-mini"), FakeCompletion()
+    )
+
+    assert report["model"] == "gpt-4o-mini"
+    assert report["emails"] == 12
+    assert report["scores"]["all"]["precision"] == 1.0
+    assert report["scores"]["all"]["recall"] == 1.0
+    assert report["prompt_tokens"] > 0
+    assert report["total_cost"] > 0
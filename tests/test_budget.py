@@ -0,0 +1,42 @@
+import pytest
+
+from sigminer.core.budget import MIN_OBSERVED_EMAILS, BudgetTracker
+
+
+def test_projection_uses_the_sampled_estimate_first():
+    tracker = BudgetTracker({"max_cost": 10.0}, total_emails=1000)
+    tracker.set_estimate(cost_per_email=0.02, tokens_per_email=5000)
+
+    tracker.update(spent_cost=0.05, spent_tokens=12000, processed_emails=2)
+
+    assert tracker.projected_cost == pytest.approx(0.05 + 0.02 * 998)
+    assert tracker.is_projected_over()
+    assert not tracker.is_exhausted()
+
+
+def test_projection_follows_the_actual_spend_rate():
+    tracker = BudgetTracker({"max_cost": 10.0}, total_emails=1000)
+    tracker.set_estimate(cost_per_email=0.02, tokens_per_email=5000)
+
+    tracker.update(spent_cost=0.1, spent_tokens=0, processed_emails=MIN_OBSERVED_EMAILS)
+
+    assert tracker.projected_cost == pytest.approx(10.0)
+    assert not tracker.is_projected_over()
+
+
+def test_token_budget_is_exhausted():
+    tracker = BudgetTracker({"max_tokens": 10000}, total_emails=10)
+
+    tracker.update(spent_cost=1.0, spent_tokens=10000, processed_emails=5)
+
+    assert tracker.is_exhausted()
+    assert "10000 tokens spent" in tracker.describe()
+
+
+def test_no_limit_never_stops():
+    tracker = BudgetTracker({}, total_emails=10)
+
+    tracker.update(spent_cost=100.0, spent_tokens=10**9, processed_emails=5)
+
+    assert not tracker.is_exhausted()
+    assert not tracker.is_projected_over()
@@ -0,0 +1,66 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from sigminer.cli import build_parser, launcher_config_from_preset
+
+PRESET = {
+    "fields": [{"field_name": "Company", "guideline": "", "can_be_overwritten": False}],
+    "excluded_hosts": ["gmail.com"],
+    "include_mode": False,
+    "exclusion_guideline": "",
+    "file_path": "/data/contacts.csv",
+    "max_emails": "500",
+    "model": "gpt-4o-mini",
+}
+
+
+def test_launcher_config_from_preset_parses_ui_values():
+    args = build_parser().parse_args(["extract", "--preset", "Leads"])
+
+    config = launcher_config_from_preset(PRESET, args)
+
+    assert config["max_emails"] == 500
+    assert config["exclusion_guideline"] is None
+    assert config["file_path"] == "/data/contacts.csv"
+    assert config["scope"] is None
+
+
+def test_launcher_config_from_preset_applies_overrides():
+    args = build_parser().parse_args(
+        [
+            "extract",
+            "--preset",
+            "Leads",
+            "--max-emails",
+            "10",
+            "--file-path",
+            "/tmp/out.csv",
+            "--folder",
+            "inbox",
+            "--received-after",
+            "2024-01-01",
+        ]
+    )
+
+    config = launcher_config_from_preset(PRESET, args)
+
+    assert config["max_emails"] == 10
+    assert config["file_path"] == "/tmp/out.csv"
+    assert config["scope"] == {"folders": ["inbox"], "received_after": "2024-01-01"}
+
+
+def test_extract_defaults_to_env_token_source():
+    args = build_parser().parse_args(["extract", "--preset", "Leads"])
+
+    assert args.token_source == "env"
+    assert args.preset == "Leads"
+
+
+def test_engine_does_not_import_qt():
+    code = (
+        "import sys; import sigminer.core.extraction_engine, sigminer.cli; "
+        "sys.exit('PyQt5' in sys.modules)"
+    )
+    root = Path(__file__).resolve().parents[1]
+    assert subprocess.run([sys.executable, "-c", code], cwd=root).returncode == 0
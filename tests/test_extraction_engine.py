@@ -0,0 +1,253 @@
+import asyncio
+import logging
+
+import pytest
+
+from sigminer.core import extraction_engine
+from sigminer.core.extraction_engine import ExtractionEngine, interleave
+
+
+def make_engine(**config):
+    launcher_config = {
+        "fields": [{"field_name": "company", "guideline": "", "can_be_overwritten": False}],
+        "excluded_hosts": [],
+        "include_mode": False,
+        "file_path": "contacts.csv",
+        "max_emails": None,
+        "model": "gpt-4o-mini",
+        "exclusion_guideline": None,
+        **config,
+    }
+    return ExtractionEngine("token", launcher_config, log_path="/dev/null")
+
+
+def test_interleave_alternates_mailboxes():
+    assert interleave([[1, 2, 3], [4], [5, 6]]) == [1, 4, 5, 2, 6, 3]
+    assert interleave([]) == []
+
+
+def test_fetch_emails_from_every_mailbox(monkeypatch):
+    engine = make_engine(mailboxes=["sales@contoso.com", "broken", "ops@contoso.com"])
+
+    async def stream_emails(max_emails, mailbox, scope, lookahead):
+        if mailbox == "broken":
+            raise Exception("403 Forbidden")
+        for i in range(max_emails):
+            yield {"id": f"{mailbox}-{i}", "mailbox": mailbox}
+
+    monkeypatch.setattr(engine.email_manager, "stream_emails", stream_emails)
+    logs = []
+    engine.on_log = lambda message, level: logs.append((level, message))
+
+    emails = asyncio.run(engine.fetch_emails(2))
+
+    assert [email["id"] for email in emails] == [
+        "sales@contoso.com-0",
+        "ops@contoso.com-0",
+        "sales@contoso.com-1",
+        "ops@contoso.com-1",
+    ]
+    errors = [message for level, message in logs if level == "ERROR"]
+    assert len(errors) == 1 and "mailbox broken: 403 Forbidden" in errors[0]
+
+
+def test_fetch_emails_fails_when_no_mailbox_can_be_read(monkeypatch):
+    engine = make_engine()
+
+    async def stream_emails(max_emails, mailbox, scope, lookahead):
+        raise Exception("401 Unauthorized")
+        yield
+
+    monkeypatch.setattr(engine.email_manager, "stream_emails", stream_emails)
+
+    with pytest.raises(Exception, match="401"):
+        asyncio.run(engine.fetch_emails(None))
+
+
+def test_mailbox_url():
+    engine = make_engine()
+
+    assert engine.email_manager.get_mailbox_url().endswith("/v1.0/me")
+    assert engine.email_manager.get_mailbox_url("sales@contoso.com").endswith(
+        "/v1.0/users/sales@contoso.com"
+    )
+
+
+def test_included_hosts_are_filtered_server_side(monkeypatch):
+    engine = make_engine(excluded_hosts=["contoso.com"], include_mode=True)
+    scopes = []
+
+    async def stream_emails(max_emails, mailbox, scope, lookahead):
+        scopes.append(scope)
+        for id in ("1", "2"):
+            yield {"id": id}
+
+    monkeypatch.setattr(engine.email_manager, "stream_emails", stream_emails)
+    monkeypatch.setattr(engine.email_manager, "count_emails", lambda mailbox, scope: 50)
+
+    emails = asyncio.run(engine.fetch_emails(None))
+
+    assert len(emails) == 2
+    assert scopes == [{"search": "from:contoso.com"}]
+    assert engine.total_emails_host_filtered_server == 48
+
+
+def test_host_filter_runs_before_the_exclusion_check(monkeypatch):
+    engine = make_engine(
+        excluded_hosts=["gmail.com"], exclusion_guideline="Newsletters"
+    )
+
+    async def query(**kwargs):
+        pytest.fail("the exclusion check ran on a filtered email")
+
+    monkeypatch.setattr(engine.llm, "query", query)
+    email = {
+        "id": "1",
+        "from": {"emailAddress": {"address": "jane@gmail.com"}},
+        "body": {"content": "Hello"},
+    }
+
+    asyncio.run(engine.process_email(email, 1))
+
+    assert engine.total_emails_host_filtered == 1
+
+
+def test_stream_processes_emails_while_they_are_fetched(monkeypatch):
+    engine = make_engine(prefetch_queue_size=2, max_concurrent_emails=3)
+    fetched = []
+    processed = []
+
+    async def stream_emails(max_emails, mailbox, scope, lookahead):
+        for i in range(10):
+            fetched.append(i)
+            yield {"id": str(i)}
+
+    async def process_email(email, total_emails):
+        # The queue bounds how far the listing runs ahead of the extraction
+        assert len(fetched) - len(processed) <= 2 + 3 + 1
+        processed.append(email["id"])
+        engine.mark_email_processed(total_emails)
+
+    monkeypatch.setattr(engine.email_manager, "stream_emails", stream_emails)
+    monkeypatch.setattr(engine.email_manager, "count_emails", lambda mailbox, scope: 10)
+    monkeypatch.setattr(engine, "process_email", process_email)
+    progress = []
+    engine.on_progress = progress.append
+
+    emails = asyncio.run(engine.process_email_stream(None))
+
+    assert sorted(processed, key=int) == [str(i) for i in range(10)]
+    assert len(emails) == 10
+    assert progress[-1] == 100
+
+
+def test_failed_run_tears_down_what_it_started(monkeypatch, tmp_path):
+    engine = make_engine(
+        file_path=str(tmp_path / "contacts.csv"),
+        mirror_mode="auto",
+        mirror_path=str(tmp_path / "mirror.db"),
+        metrics_port=0,
+        profile=True,
+    )
+    engine.log_path = str(tmp_path / "extraction.log")
+    engine.on_metrics = lambda snapshot: None
+    servers = []
+
+    class MetricsServer(extraction_engine.MetricsServer):
+        def start(self):
+            servers.append(self)
+            return super().start()
+
+    monkeypatch.setattr(extraction_engine, "MetricsServer", MetricsServer)
+
+    async def process_email_stream(max_emails):
+        raise Exception("401 Unauthorized")
+
+    monkeypatch.setattr(engine, "process_email_stream", process_email_stream)
+
+    async def run():
+        with pytest.raises(Exception, match="401"):
+            await engine.launch_extraction()
+        await asyncio.sleep(0)
+        # The metrics reporter and the loop lag sampler are cancelled
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+        assert not asyncio.get_running_loop().get_debug()
+        assert not logging.getLogger("asyncio").handlers
+
+    asyncio.run(run())
+
+    with pytest.raises(Exception, match="closed"):
+        engine.mirror.connection.execute("SELECT 1")
+    assert servers and not servers[0].thread.is_alive()
+    assert engine.loop_monitor.watchdog is None
+    # The part of the run profiled before the failure is still reported
+    assert (tmp_path / "extraction_profile.txt").exists()
+
+
+def test_stream_counts_the_emails_of_the_pushed_down_scope(monkeypatch):
+    engine = make_engine(excluded_hosts=["contoso.com"], include_mode=True)
+
+    async def stream_emails(max_emails, mailbox, scope, lookahead):
+        for i in range(3):
+            yield {"id": str(i)}
+
+    async def process_email(email, total_emails):
+        engine.mark_email_processed(total_emails)
+
+    def count_emails(mailbox, scope):
+        return 3 if scope == {"search": "from:contoso.com"} else 1000
+
+    monkeypatch.setattr(engine.email_manager, "stream_emails", stream_emails)
+    monkeypatch.setattr(engine.email_manager, "count_emails", count_emails)
+    monkeypatch.setattr(engine, "process_email", process_email)
+    progress = []
+    engine.on_progress = progress.append
+
+    asyncio.run(engine.process_email_stream(None))
+
+    assert engine.total_emails_expected == 3
+    assert progress[-1] == 100
+
+
+def test_batch_budget_projection_applies_the_batch_discount():
+    emails = [
+        {
+            "id": str(i),
+            "from": {"emailAddress": {"address": f"jane{i}@contoso.com"}},
+            "subject": "Hello",
+            "body": {"content": "Jane Doe, Contoso"},
+        }
+        for i in range(4)
+    ]
+    costs = {}
+    for execution_mode in ("interactive", "batch"):
+        engine = make_engine(budget={"max_cost": 10.0}, execution_mode=execution_mode)
+        asyncio.run(engine.project_budget(emails))
+        costs[execution_mode] = engine.budget_tracker.estimated_cost_per_email
+
+    assert costs["interactive"] > 0
+    assert costs["batch"] == pytest.approx(costs["interactive"] / 2)
+
+
+def test_stream_stops_listing_after_a_stop(monkeypatch):
+    engine = make_engine(prefetch_queue_size=10, max_concurrent_emails=2)
+    fetched = []
+
+    async def stream_emails(max_emails, mailbox, scope, lookahead):
+        for i in range(5000):
+            fetched.append(i)
+            yield {"id": str(i)}
+
+    async def process_email(email, total_emails):
+        engine.stop()
+        engine.mark_email_processed(total_emails)
+
+    monkeypatch.setattr(engine.email_manager, "stream_emails", stream_emails)
+    monkeypatch.setattr(engine.email_manager, "count_emails", lambda mailbox, scope: 5000)
+    monkeypatch.setattr(engine, "process_email", process_email)
+
+    emails = asyncio.run(engine.process_email_stream(None))
+
+    # Only the emails already queued when the stop came are listed, then skipped
+    assert len(fetched) <= 10 + 2 + 2
+    assert engine.total_emails_skipped == len(emails) - 1
@@ -0,0 +1,126 @@
+import pytest
+import requests
+
+from sigminer.auth.token_provider import MsalTokenProvider, StaticTokenProvider
+from sigminer.core.email.graph_client import ConcurrencyGovernor, GraphClient
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+def make_client(monkeypatch, responses, token_provider=None, **options):
+    client = GraphClient(token_provider or StaticTokenProvider("token"), **options)
+    delays = []
+    client.sent_tokens = []
+
+    def get(url, headers, params, timeout):
+        client.sent_tokens.append(headers["Authorization"])
+        return responses.pop(0)
+
+    monkeypatch.setattr(client.session, "get", get)
+    monkeypatch.setattr("sigminer.core.email.graph_client.time.sleep", delays.append)
+    return client, delays
+
+
+def test_throttled_requests_honor_retry_after(monkeypatch):
+    client, delays = make_client(
+        monkeypatch,
+        [
+            FakeResponse(429, {"Retry-After": "7"}),
+            FakeResponse(503),
+            FakeResponse(200),
+        ],
+        backoff_base=2.0,
+    )
+
+    assert client.get("https://graph/messages").status_code == 200
+    assert delays[0] == 7.0
+    assert 0 <= delays[1] <= 4.0
+    assert client.total_throttled == 2
+    assert client.total_retries == 2
+
+
+def test_retries_are_bounded(monkeypatch):
+    client, delays = make_client(
+        monkeypatch, [FakeResponse(429) for _ in range(3)], max_retries=2
+    )
+
+    with pytest.raises(requests.HTTPError, match="429"):
+        client.get("https://graph/messages")
+    assert len(delays) == 2
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    client, delays = make_client(monkeypatch, [FakeResponse(404)])
+
+    with pytest.raises(requests.HTTPError, match="404"):
+        client.get("https://graph/messages")
+    assert delays == []
+
+
+def test_governor_halves_on_throttling_and_grows_back():
+    governor = ConcurrencyGovernor(max_limit=4)
+
+    governor.on_throttled()
+    governor.on_throttled()
+    assert governor.limit == 1
+    governor.on_throttled()
+    assert governor.limit == 1
+
+    governor.on_success()
+    assert governor.limit == 2
+    governor.on_success()
+    governor.on_success()
+    assert governor.limit == 3
+
+
+class FakeAuthManager:
+    client_id = "client"
+    tenant_id = "tenant"
+
+    def __init__(self):
+        self.calls = []
+
+    def acquire_token_silent(self, scopes, force_refresh=False):
+        self.calls.append(force_refresh)
+        return {"access_token": f"token-{len(self.calls)}", "expires_in": 3600}
+
+
+def test_token_is_refreshed_once_on_unauthorized(monkeypatch):
+    auth_manager = FakeAuthManager()
+    client, delays = make_client(
+        monkeypatch,
+        [FakeResponse(401), FakeResponse(200)],
+        token_provider=MsalTokenProvider(auth_manager),
+    )
+
+    assert client.get("https://graph/messages").status_code == 200
+    assert client.sent_tokens == ["Bearer token-1", "Bearer token-2"]
+    assert auth_manager.calls == [False, True]
+
+
+def test_repeated_unauthorized_fails(monkeypatch):
+    client, delays = make_client(monkeypatch, [FakeResponse(401), FakeResponse(401)])
+
+    with pytest.raises(requests.HTTPError, match="401"):
+        client.get("https://graph/messages")
+
+
+def test_token_is_refreshed_before_expiry(monkeypatch):
+    auth_manager = FakeAuthManager()
+    provider = MsalTokenProvider(auth_manager, refresh_margin=300)
+    now = [1000.0]
+    monkeypatch.setattr("sigminer.auth.token_provider.time.time", lambda: now[0])
+
+    assert provider.get_token() == "token-1"
+    now[0] += 3000
+    assert provider.get_token() == "token-1"
+    now[0] += 400
+    assert provider.get_token() == "token-2"
@@ -0,0 +1,96 @@
+import pytest
+
+from sigminer.core.email.email_manager import EmailManager
+from sigminer.core.email.graph_query import (
+    build_message_params,
+    get_message_paths,
+    push_down_hosts,
+)
+
+
+def test_default_params_select_the_used_properties():
+    params = build_message_params()
+
+    assert params == {"$select": "id,subject,body,from,receivedDateTime", "$top": "100"}
+
+
+def test_scope_is_pushed_into_the_filter():
+    params = build_message_params(
+        {
+            "received_after": "2024-01-01",
+            "received_before": "2024-02-01T12:00:00+01:00",
+            "filter": "hasAttachments eq true",
+        },
+        max_emails=20,
+    )
+
+    assert params["$top"] == "20"
+    assert params["$filter"] == (
+        "receivedDateTime ge 2024-01-01T00:00:00Z"
+        " and receivedDateTime lt 2024-02-01T11:00:00Z"
+        " and (hasAttachments eq true)"
+    )
+
+
+def test_search_cannot_be_combined_with_a_filter():
+    assert build_message_params({"search": "invoice"})["$search"] == '"invoice"'
+    with pytest.raises(ValueError):
+        build_message_params({"search": "invoice", "received_after": "2024-01-01"})
+
+
+def test_folders_are_listed_separately():
+    assert get_message_paths() == ["messages"]
+    assert get_message_paths({"folders": ["inbox", "archive"]}) == [
+        "mailFolders/inbox/messages",
+        "mailFolders/archive/messages",
+    ]
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+def test_get_emails_stops_across_folders_at_max_emails(monkeypatch):
+    calls = []
+
+    def get(url, headers, params, timeout):
+        calls.append((url, params))
+        if "nextLink" in url:
+            return FakeResponse({"value": [{"id": "inbox-2"}]})
+        folder = url.split("/")[-2]
+        return FakeResponse(
+            {"value": [{"id": f"{folder}-1"}], "@odata.nextLink": f"{url}?nextLink"}
+        )
+
+    manager = EmailManager("token")
+    monkeypatch.setattr(manager.client.session, "get", get)
+
+    emails = manager.get_emails(3, scope={"folders": ["inbox", "archive"]})
+
+    assert [email["id"] for email in emails] == ["inbox-1", "inbox-2", "archive-1"]
+    assert calls[1][1] is None
+    assert calls[2][1]["$top"] == "1"
+
+
+def test_include_mode_hosts_are_pushed_into_the_search():
+    scope = push_down_hosts({"folders": ["inbox"]}, ["contoso.com", "fabrikam.com"], True)
+
+    assert scope == {"folders": ["inbox"], "search": "from:contoso.com OR from:fabrikam.com"}
+    assert push_down_hosts({"search": "invoice"}, ["contoso.com"], True)["search"] == (
+        "(invoice) AND (from:contoso.com)"
+    )
+
+
+def test_hosts_are_filtered_client_side_when_graph_cannot():
+    assert push_down_hosts(None, ["gmail.com"], include_mode=False) is None
+    assert push_down_hosts(None, [], include_mode=True) is None
+    assert push_down_hosts({"received_after": "2024-01-01"}, ["contoso.com"], True) is None
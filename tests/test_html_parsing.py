@@ -0,0 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sigminer.core.email.email_manager import EmailManager
+from sigminer.core.email.html_parsing import extract_image_cids, to_data_urls
+
+HTML = '<p>Jane Doe</p><img src="cid:logo@01"><img src="https://x.com/a.png"><img>'
+
+
+def test_extract_image_cids():
+    assert extract_image_cids(HTML) == ["logo@01"]
+
+
+def test_text_without_cid_is_not_parsed(monkeypatch):
+    monkeypatch.setattr(
+        "sigminer.core.email.html_parsing.get_img_sources",
+        lambda *args: pytest.fail("parsed"),
+    )
+    assert extract_image_cids("<img src='https://x.com/a.png'>") == []
+
+
+def test_unknown_parser_is_rejected():
+    with pytest.raises(ValueError):
+        extract_image_cids(HTML, parser="regex")
+
+
+@pytest.mark.parametrize("parser", ["lxml", "selectolax"])
+def test_optional_parsers_match_html_parser(parser):
+    pytest.importorskip(parser)
+    assert extract_image_cids(HTML, parser) == extract_image_cids(HTML)
+
+
+def test_attachments_become_data_urls():
+    urls = to_data_urls(
+        [{"contentId": "logo@01", "contentType": "image/png", "contentBytes": "AAAA"}]
+    )
+    assert urls == {"logo@01": "data:image/png;base64,AAAA"}
+
+
+def test_get_image_urls_in_executor(monkeypatch):
+    manager = EmailManager("token")
+    monkeypatch.setattr(
+        manager,
+        "fetch_attachments",
+        lambda message_id, mailbox: [
+            {"contentId": "other", "contentBytes": "BBBB"},
+            {"contentId": "logo@01", "contentType": "image/png", "contentBytes": "AAAA"},
+        ],
+    )
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        urls = asyncio.run(manager.get_image_urls(HTML, "message-id", executor))
+
+    assert urls == ["data:image/png;base64,AAAA"]
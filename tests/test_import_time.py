@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from sigminer.core.preload import preload_modules
+
+# Seconds the app and the engine may take to import, in a fresh interpreter
+IMPORT_TIME_BUDGET = 1.0
+HEAVY_MODULES = ("litellm", "bs4", "PIL")
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def measure_import(modules: str) -> dict:
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {modules}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+    )
+    env = {**os.environ, "QT_QPA_PLATFORM": "offscreen"}
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_engine_imports_within_budget():
+    measured = measure_import("sigminer.core.extraction_engine, sigminer.cli")
+
+    assert measured["heavy"] == []
+    assert measured["elapsed"] < IMPORT_TIME_BUDGET
+
+
+def test_app_imports_within_budget():
+    pytest.importorskip("PyQt5")
+    measured = measure_import("sigminer.ui.main_window")
+
+    assert measured["heavy"] == []
+    assert measured["elapsed"] < IMPORT_TIME_BUDGET
+
+
+def test_preload_skips_modules_failing_to_import():
+    preload_modules(["json", "sigminer.no_such_module"]).join()
+
+    assert "json" in sys.modules
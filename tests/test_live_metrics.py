@@ -0,0 +1,62 @@
+from sigminer.core.extraction_engine import ExtractionEngine
+from sigminer.core.live_metrics import format_duration, format_snapshot, get_live_snapshot
+
+
+def make_engine():
+    launcher_config = {
+        "fields": [{"field_name": "company", "guideline": "", "can_be_overwritten": False}],
+        "excluded_hosts": [],
+        "include_mode": False,
+        "file_path": "contacts.csv",
+        "max_emails": None,
+        "model": "gpt-4o-mini",
+        "exclusion_guideline": None,
+    }
+    return ExtractionEngine("token", launcher_config, log_path="/dev/null")
+
+
+def test_snapshot_projects_spend_and_eta(monkeypatch):
+    engine = make_engine()
+    engine.processing_started_at = 0.0
+    monkeypatch.setattr("sigminer.core.live_metrics.time.monotonic", lambda: 10.0)
+    engine.total_contacts_processed = 20
+    engine.total_emails_expected = 100
+    engine.total_cost = 0.5
+    engine.llm.usage["gpt-4o"] = {
+        "requests": 10,
+        "prompt_tokens": 1000,
+        "cached_tokens": 250,
+        "completion_tokens": 100,
+        "latency": 1.0,
+    }
+
+    snapshot = get_live_snapshot(engine)
+
+    assert snapshot["emails_per_second"] == 2.0
+    assert snapshot["eta_seconds"] == 40.0
+    assert snapshot["projected_cost"] == 2.5
+    assert snapshot["cache_hit_rate"] == 0.25
+    lines = dict(format_snapshot(snapshot))
+    assert lines["Emails"] == "20 / 100"
+    assert lines["ETA"] == "0:40"
+    assert lines["Spend"] == "$0.5000 ($2.5000 projected)"
+
+
+def test_snapshot_before_processing_starts():
+    snapshot = get_live_snapshot(make_engine())
+
+    assert snapshot["eta_seconds"] is None
+    assert dict(format_snapshot(snapshot))["Emails"] == "0 / ?"
+
+
+def test_in_flight_calls_are_counted_per_stage():
+    engine = make_engine()
+
+    with engine.tracer.span("llm.query"), engine.tracer.span("llm.query"):
+        assert get_live_snapshot(engine)["in_flight"]["llm.query"] == 2
+    assert get_live_snapshot(engine)["in_flight"]["llm.query"] == 0
+
+
+def test_format_duration():
+    assert format_duration(3725) == "1:02:05"
+    assert format_duration(None) == "unknown"
@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from sigminer.ui.log_model import LevelRole, LogFilterProxyModel, LogListModel
+
+
+def test_model_keeps_only_the_last_lines():
+    model = LogListModel(max_lines=3)
+    model.append_lines([("INFO", "line 1"), ("INFO", "line 2")])
+    model.append_lines([("WARNING", "line 3"), ("INFO", "line 4")])
+    assert model.rowCount() == 3
+    assert [model.data(model.index(row)) for row in range(3)] == ["line 2", "line 3", "line 4"]
+    assert model.data(model.index(1), LevelRole) == "WARNING"
+
+    # A batch larger than the buffer keeps its own tail
+    model.append_lines([("INFO", f"batch {index}") for index in range(5)])
+    assert [message for _, message in model.lines] == ["batch 2", "batch 3", "batch 4"]
+
+
+def test_filter_by_level_and_search():
+    model = LogListModel()
+    model.append_lines(
+        [
+            ("INFO", "Processed email 1"),
+            ("WARNING", "Query for Phone returned None."),
+            ("ERROR", "Failed to fetch emails from mailbox a@b.com"),
+            ("INFO", "Processed email 2"),
+        ]
+    )
+    proxy = LogFilterProxyModel()
+    proxy.setSourceModel(model)
+    assert proxy.rowCount() == 4
+
+    proxy.set_min_level("WARNING")
+    assert proxy.rowCount() == 2
+    proxy.set_min_level("ERROR")
+    assert proxy.data(proxy.index(0, 0)) == "Failed to fetch emails from mailbox a@b.com"
+
+    proxy.set_min_level("INFO")
+    proxy.set_search_text("PROCESSED")
+    assert proxy.rowCount() == 2
+
+    # New lines are filtered as they arrive
+    model.append_lines([("INFO", "Processed email 3"), ("WARNING", "Budget exhausted")])
+    assert proxy.rowCount() == 3
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from sigminer.core.loop_monitor import LoopLagMonitor
+
+
+def test_monitor_captures_the_stack_of_blocking_code():
+    blocked = []
+
+    async def on_blocked(event):
+        blocked.append(event)
+
+    def parse_signature():
+        time.sleep(0.3)  # Blocks the loop, like parsing on it would
+
+    async def main():
+        monitor = LoopLagMonitor(0.01, 0.1, on_blocked)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        parse_signature()
+        await asyncio.sleep(0.05)
+        monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(main())
+
+    assert monitor.total_blocked == 1
+    assert len(blocked) == 1
+    assert blocked[0].duration >= 0.25
+    assert "parse_signature" in blocked[0].stack
+    assert max(monitor.lags) >= 0.25
+    assert "Event loop blocked over 100 ms: 1 times" in monitor.get_summary()
+
+
+def test_monitor_stays_quiet_on_a_free_loop():
+    async def main():
+        monitor = LoopLagMonitor(0.01, 0.1)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(main())
+
+    assert monitor.total_blocked == 0
+    assert monitor.blocking_events == []
+    assert len(monitor.lags) >= 5
@@ -0,0 +1,63 @@
+import urllib.request
+
+from sigminer.core.extraction_engine import ExtractionEngine
+from sigminer.core.metrics_exporter import MetricsServer, render_metrics, write_textfile
+
+
+def make_engine():
+    launcher_config = {
+        "fields": [{"field_name": "company", "guideline": "", "can_be_overwritten": False}],
+        "excluded_hosts": [],
+        "include_mode": False,
+        "file_path": "contacts.csv",
+        "max_emails": None,
+        "model": "gpt-4o-mini",
+        "exclusion_guideline": None,
+    }
+    return ExtractionEngine("token", launcher_config, log_path="/dev/null")
+
+
+def test_render_counters_errors_and_histograms():
+    engine = make_engine()
+    engine.total_contacts_processed = 12
+    engine.meta_costs["company"] = 0.25
+    engine.llm.usage["gpt-4o"] = {
+        "requests": 3,
+        "prompt_tokens": 300,
+        "cached_tokens": 100,
+        "completion_tokens": 30,
+        "latency": 1.0,
+    }
+    engine.tracer.add("llm.query", 0.3, "gpt-4o")
+    engine.tracer.add("llm.query", 0.04, "gpt-4o", failed=True)
+    engine.tracer.add("graph.page", 0.1, failed=True)
+
+    lines = render_metrics(engine).splitlines()
+
+    assert "sigminer_emails_processed_total 12.0" in lines
+    assert 'sigminer_field_cost_dollars_total{field="company"} 0.25' in lines
+    assert 'sigminer_llm_tokens_total{model="gpt-4o",kind="cached"} 100.0' in lines
+    assert "sigminer_llm_errors_total 1.0" in lines
+    assert "sigminer_graph_errors_total 1.0" in lines
+    assert "# TYPE sigminer_stage_duration_seconds histogram" in lines
+    assert 'sigminer_stage_duration_seconds_bucket{stage="llm.query",model="gpt-4o",le="0.05"} 1.0' in lines
+    assert 'sigminer_stage_duration_seconds_bucket{stage="llm.query",model="gpt-4o",le="+Inf"} 2.0' in lines
+    assert 'sigminer_stage_duration_seconds_count{stage="graph.page"} 1.0' in lines
+    # Unknown values are left out rather than reported as zero
+    assert not any(line.startswith("sigminer_emails_expected") for line in lines)
+
+
+def test_server_and_textfile_expose_the_same_metrics(tmp_path):
+    engine = make_engine()
+    engine.total_emails_excluded = 4
+
+    with MetricsServer(engine, 0) as server:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            scraped = response.read().decode()
+    path = tmp_path / "sigminer.prom"
+    write_textfile(engine, str(path))
+
+    assert "sigminer_emails_excluded_total 4.0" in scraped.splitlines()
+    assert "sigminer_emails_excluded_total 4.0" in path.read_text().splitlines()
+    assert [file.name for file in tmp_path.iterdir()] == ["sigminer.prom"]
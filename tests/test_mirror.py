@@ -0,0 +1,123 @@
+import asyncio
+import contextlib
+
+import pytest
+
+from sigminer.core.email.email_manager import EmailManager
+from sigminer.core.email.mirror import MailboxMirror
+
+SCOPE = {"folders": ["inbox"]}
+
+
+def make_manager(tmp_path, mirror_mode="auto"):
+    return EmailManager(
+        "token",
+        mirror=MailboxMirror(str(tmp_path / "mirror.sqlite")),
+        mirror_mode=mirror_mode,
+    )
+
+
+def stream(manager, max_emails=None, mailbox=None, scope=SCOPE):
+    async def collect():
+        return [email async for email in manager.stream_emails(max_emails, mailbox, scope)]
+
+    return asyncio.run(collect())
+
+
+def fake_graph(monkeypatch, manager, emails):
+    calls = []
+
+    async def stream_graph_pages(max_emails, mailbox, scope, lookahead):
+        calls.append(mailbox)
+        listed = emails[:max_emails]
+        for start in range(0, len(listed), 2):
+            yield [{**email, "mailbox": mailbox} for email in listed[start : start + 2]]
+
+    monkeypatch.setattr(manager, "stream_graph_pages", stream_graph_pages)
+    return calls
+
+
+def test_listing_is_recorded_then_replayed(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path)
+    emails = [{"id": str(i), "body": {"content": "x" * 100}} for i in range(5)]
+    calls = fake_graph(monkeypatch, manager, emails)
+
+    first = stream(manager)
+    replayed = stream(manager)
+
+    assert calls == [None]
+    assert replayed == first
+    assert manager.mirror.total_messages_read == 5
+    assert manager.count_emails(None, SCOPE) == 5
+
+
+def test_listing_cut_short_is_only_replayed_up_to_its_length(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path)
+    calls = fake_graph(monkeypatch, manager, [{"id": str(i)} for i in range(5)])
+
+    stream(manager, max_emails=2)
+    assert [email["id"] for email in stream(manager, max_emails=2)] == ["0", "1"]
+    assert len(stream(manager, max_emails=3)) == 3
+
+    assert calls == [None, None]
+
+
+def test_interrupted_listing_keeps_the_pages_it_listed(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path)
+    calls = fake_graph(monkeypatch, manager, [{"id": str(i)} for i in range(5)])
+
+    async def interrupt():
+        async with contextlib.aclosing(manager.stream_emails(None, None, SCOPE)) as emails:
+            async for email in emails:
+                if email["id"] == "2":
+                    return
+
+    asyncio.run(interrupt())
+
+    assert [email["id"] for email in stream(manager, max_emails=4)] == ["0", "1", "2", "3"]
+    assert calls == [None]
+    assert len(stream(manager)) == 5
+    assert calls == [None, None]
+
+
+def test_refresh_records_again(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path, "refresh")
+    calls = fake_graph(monkeypatch, manager, [{"id": "1"}])
+
+    stream(manager)
+    stream(manager)
+
+    assert calls == [None, None]
+
+
+def test_offline_never_calls_graph(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path, "offline")
+    calls = fake_graph(monkeypatch, manager, [{"id": "1"}])
+
+    with pytest.raises(ValueError):
+        stream(manager, mailbox="shared@contoso.com")
+    monkeypatch.setattr(
+        manager.client, "get", lambda *args, **kwargs: pytest.fail("Graph was called")
+    )
+    assert manager.fetch_attachments("1") == []
+    assert manager.count_emails("shared@contoso.com", SCOPE) is None
+
+    assert calls == []
+
+
+def test_attachments_are_mirrored(tmp_path, monkeypatch):
+    manager = make_manager(tmp_path)
+    attachments = [{"contentId": "a", "contentType": "image/png", "contentBytes": "AAAA"}]
+
+    class FakeResponse:
+        def json(self):
+            return {"value": attachments}
+
+    requests = []
+    monkeypatch.setattr(
+        manager.client, "get", lambda url, **kwargs: requests.append(url) or FakeResponse()
+    )
+
+    assert manager.fetch_attachments("1") == attachments
+    assert manager.fetch_attachments("1") == attachments
+    assert len(requests) == 1
@@ -0,0 +1,170 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pydantic import BaseModel
+
+from sigminer.core.llm.multi_modal_llm import MultiModalLLM
+
+
+class Answer(BaseModel):
+    answer: str
+    confidence_score: float
+
+
+@pytest.fixture
+def llm():
+    return MultiModalLLM(default_model="gpt-4o-mini")
+
+
+def test_cascade_stops_on_confident_answer(llm):
+    llm.query = AsyncMock(
+        return_value=(Answer(answer="ACME", confidence_score=0.9), 0.01)
+    )
+
+    answer, cost, model = asyncio.run(
+        llm.cascade_query("query", models=["gpt-4o-mini", "gpt-4o"], output_cls=Answer)
+    )
+
+    assert answer.answer == "ACME"
+    assert cost == 0.01
+    assert model == "gpt-4o-mini"
+    llm.query.assert_called_once()
+
+
+def test_cascade_escalates_on_low_confidence(llm):
+    llm.query = AsyncMock(
+        side_effect=[
+            (Answer(answer="ACME?", confidence_score=0.2), 0.01),
+            (Answer(answer="ACME Corp", confidence_score=0.95), 0.1),
+        ]
+    )
+
+    answer, cost, model = asyncio.run(
+        llm.cascade_query("query", models=["gpt-4o-mini", "gpt-4o"], output_cls=Answer)
+    )
+
+    assert answer.answer == "ACME Corp"
+    assert cost == pytest.approx(0.11)
+    assert model == "gpt-4o"
+    assert [call.kwargs["model"] for call in llm.query.call_args_list] == [
+        "gpt-4o-mini",
+        "gpt-4o",
+    ]
+
+
+def test_cascade_escalates_on_empty_answer(llm):
+    llm.query = AsyncMock(
+        side_effect=[
+            (Answer(answer="", confidence_score=1.0), 0.01),
+            (Answer(answer="Jane Doe", confidence_score=0.8), 0.1),
+        ]
+    )
+
+    answer, _, model = asyncio.run(
+        llm.cascade_query("query", models=["gpt-4o-mini", "gpt-4o"], output_cls=Answer)
+    )
+
+    assert answer.answer == "Jane Doe"
+    assert model == "gpt-4o"
+
+
+def test_cascade_keeps_the_most_confident_answer_when_every_model_is_unsure(llm):
+    llm.query = AsyncMock(
+        side_effect=[
+            (Answer(answer="A", confidence_score=0.1), 0.01),
+            (Answer(answer="B", confidence_score=0.3), 0.1),
+        ]
+    )
+
+    answer, cost, model = asyncio.run(
+        llm.cascade_query(
+            "query",
+            models=["gpt-4o-mini", "gpt-4o"],
+            output_cls=Answer,
+            confidence_threshold=0.5,
+        )
+    )
+
+    assert answer.answer == "B"
+    assert cost == pytest.approx(0.11)
+    assert model == "gpt-4o"
+
+
+def test_cascade_keeps_the_first_answer_when_the_escalation_is_less_confident(llm):
+    llm.query = AsyncMock(
+        side_effect=[
+            (Answer(answer="ACME", confidence_score=0.4), 0.01),
+            (Answer(answer="ACME Inc", confidence_score=0.2), 0.1),
+        ]
+    )
+
+    answer, cost, model = asyncio.run(
+        llm.cascade_query("query", models=["gpt-4o-mini", "gpt-4o"], output_cls=Answer)
+    )
+
+    assert answer.answer == "ACME"
+    assert cost == pytest.approx(0.11)
+    assert model == "gpt-4o-mini"
+
+
+def test_cascade_keeps_the_first_answer_when_the_last_model_returns_none(llm):
+    llm.query = AsyncMock(
+        side_effect=[(Answer(answer="ACME", confidence_score=0.2), 0.01), None]
+    )
+
+    answer, cost, model = asyncio.run(
+        llm.cascade_query("query", models=["gpt-4o-mini", "gpt-4o"], output_cls=Answer)
+    )
+
+    assert answer.answer == "ACME"
+    assert cost == 0.01
+    assert model == "gpt-4o-mini"
+
+
+def test_queries_on_the_same_email_share_a_prefix(llm):
+    chunks = [
+        "<email_subject>Hello</email_subject>",
+        "<email_content>Jane Doe, ACME</email_content>",
+    ]
+    first = llm.build_request(
+        "Extract this metadata: Company.",
+        chunks=chunks,
+        images=[b"img"],
+        output_cls=Answer,
+    )
+    second = llm.build_request(
+        "Extract this metadata: Name.",
+        chunks=chunks,
+        images=[b"img"],
+        output_cls=Answer,
+    )
+
+    assert first["tools"] == second["tools"]
+    assert first["messages"][0] == second["messages"][0]
+    first_content = first["messages"][-1]["content"]
+    second_content = second["messages"][-1]["content"]
+    assert first_content[:-1] == second_content[:-1]
+    assert [part["type"] for part in first_content] == ["text", "image_url", "text"]
+    assert "Company" in first_content[-1]["text"]
+    assert "Company" not in first_content[0]["text"]
+
+
+def test_system_message_is_static(llm):
+    assert "date" not in llm._create_system_message()["content"]
+
+
+def test_usage_records_cached_tokens(llm):
+    response = MagicMock()
+    response.usage.prompt_tokens = 2000
+    response.usage.completion_tokens = 50
+    response.usage.prompt_tokens_details.cached_tokens = 1536
+
+    llm._record_usage("gpt-4o-mini", response, latency=0.5)
+    llm._record_usage("gpt-4o-mini", response, latency=0.3)
+
+    usage = llm.usage["gpt-4o-mini"]
+    assert usage["requests"] == 2
+    assert usage["prompt_tokens"] == 4000
+    assert usage["cached_tokens"] == 3072
+    assert usage["latency"] == pytest.approx(0.8)
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+from sigminer.core.email.prefetch import prefetch_pages
+
+TOTAL_ITEMS = 23
+
+
+def make_fetch_page(page_size=5, delay=0.05):
+    state = {"in_flight": 0, "max_in_flight": 0, "calls": []}
+    lock = threading.Lock()
+
+    def fetch_page(url, params):
+        with lock:
+            state["calls"].append(dict(params or {}))
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        time.sleep(delay)
+        with lock:
+            state["in_flight"] -= 1
+        skip = int((params or {}).get("$skip", 0))
+        items = [{"id": i} for i in range(skip, min(skip + page_size, TOTAL_ITEMS))]
+        data = {"value": items}
+        if skip + page_size < TOTAL_ITEMS:
+            data["@odata.nextLink"] = f"{url}?$skip={skip + page_size}"
+        return data
+
+    return fetch_page, state
+
+
+async def collect(pages):
+    return [item["id"] for page in [page async for page in pages] for item in page]
+
+
+def test_pages_are_prefetched_in_order():
+    fetch_page, state = make_fetch_page()
+
+    ids = asyncio.run(collect(prefetch_pages(fetch_page, "url", {"$top": "5"}, lookahead=3)))
+
+    assert ids == list(range(TOTAL_ITEMS))
+    assert state["max_in_flight"] == 3
+
+
+def test_prefetch_stops_at_max_items():
+    fetch_page, state = make_fetch_page()
+
+    ids = asyncio.run(
+        collect(prefetch_pages(fetch_page, "url", {"$top": "5"}, max_items=10, lookahead=4))
+    )
+
+    assert ids == list(range(10))
+    assert [call["$skip"] for call in state["calls"]] == ["0", "5"]
+
+
+def test_searches_follow_next_links():
+    def fetch_page(url, params):
+        if params is None:
+            return {"value": [{"id": 1}]}
+        return {"value": [{"id": 0}], "@odata.nextLink": "next"}
+
+    ids = asyncio.run(
+        collect(prefetch_pages(fetch_page, "url", {"$top": "1", "$search": '"a"'}))
+    )
+
+    assert ids == [0, 1]
+
+
+def test_short_pages_fall_back_to_next_links():
+    calls = []
+
+    def fetch_page(url, params):
+        calls.append((url, dict(params or {})))
+        if params is None:
+            # Next links resume where the short page stopped
+            start = int(url.split("=")[1])
+        else:
+            start = int(params["$skip"])
+        # The second page comes back short, with the rest still to list
+        end = min(start + (3 if start == 5 else 5), TOTAL_ITEMS)
+        data = {"value": [{"id": i} for i in range(start, end)]}
+        if end < TOTAL_ITEMS:
+            data["@odata.nextLink"] = f"url?$skip={end}"
+        return data
+
+    ids = asyncio.run(collect(prefetch_pages(fetch_page, "url", {"$top": "5"}, lookahead=3)))
+
+    assert ids == list(range(TOTAL_ITEMS))
+    assert [url for url, params in calls if not params] == [
+        "url?$skip=8",
+        "url?$skip=13",
+        "url?$skip=18",
+    ]
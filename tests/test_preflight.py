@@ -0,0 +1,79 @@
+import io
+
+from PIL import Image
+
+from sigminer.core.llm.multi_modal_llm import MultiModalLLM
+from sigminer.core.llm.preflight import (
+    LOW_DETAIL_IMAGE_TOKENS,
+    TRUNCATION_MARKER,
+    count_text_tokens,
+    estimate_image_tokens,
+    truncate_text,
+)
+
+
+def make_image(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_truncate_head_tail_keeps_signature():
+    text = "Hello " + "filler " * 2000 + "Jane Doe, CEO at ACME"
+
+    truncated = truncate_text("gpt-4o-mini", text, max_tokens=100)
+
+    assert truncated.startswith("Hello")
+    assert truncated.endswith("Jane Doe, CEO at ACME")
+    assert TRUNCATION_MARKER in truncated
+    assert count_text_tokens("gpt-4o-mini", truncated) < 120
+
+
+def test_truncate_head_drops_the_end():
+    text = "Hello " + "filler " * 2000 + "Jane Doe"
+
+    truncated = truncate_text("gpt-4o-mini", text, max_tokens=50, strategy="head")
+
+    assert truncated.startswith("Hello")
+    assert "Jane Doe" not in truncated
+
+
+def test_short_text_is_not_truncated():
+    assert truncate_text("gpt-4o-mini", "Jane Doe", max_tokens=50) == "Jane Doe"
+
+
+def test_estimate_image_tokens_follows_tiling():
+    assert estimate_image_tokens(make_image(512, 512)) == 85 + 170
+    assert estimate_image_tokens(make_image(1024, 1024)) == 85 + 4 * 170
+    assert (
+        estimate_image_tokens(make_image(4096, 4096), "low") == LOW_DETAIL_IMAGE_TOKENS
+    )
+
+
+def test_oversized_request_is_truncated_to_the_context_window():
+    llm = MultiModalLLM(default_model="gpt-4o-mini", max_output_tokens=0)
+    budget = 2000
+    chunks = [
+        "<email_subject>Hi</email_subject>",
+        "<email_content>" + "word " * 5000 + "</email_content>",
+    ]
+
+    original = llm.estimate("Extract the company", chunks=chunks)
+    assert original.prompt_tokens > budget
+
+    llm.max_output_tokens = original.max_input_tokens - budget
+    fitted = llm.estimate("Extract the company", chunks=chunks)
+
+    assert fitted.prompt_tokens <= budget
+    assert llm.total_truncations == 1
+    assert fitted.predicted_cost < original.predicted_cost
+
+
+def test_no_truncation_strategy_sends_the_request_as_is():
+    llm = MultiModalLLM(default_model="gpt-4o-mini", truncation_strategy="none")
+    chunks = ["<email_content>" + "word " * 5000 + "</email_content>"]
+    llm.max_output_tokens = llm.estimate("query", chunks=chunks).max_input_tokens - 100
+
+    llm.build_request("query", chunks=chunks)
+
+    assert llm.total_truncations == 0
@@ -0,0 +1,43 @@
+import asyncio
+import pstats
+import time
+
+from sigminer.core.profiling import RunProfiler, get_profile_paths
+
+
+def test_profile_paths_are_next_to_the_log_file():
+    assert get_profile_paths("/runs/process_log.txt") == (
+        "/runs/process_log_profile.txt",
+        "/runs/process_log_profile.prof",
+    )
+
+
+def test_profiler_reports_blocking_callbacks_and_loop_lag(tmp_path):
+    report_path = tmp_path / "profile.txt"
+    profile_path = tmp_path / "profile.prof"
+
+    def parse_signature():
+        time.sleep(0.05)  # Blocks the loop, like parsing on it would
+
+    async def main():
+        profiler = RunProfiler(
+            str(report_path),
+            str(profile_path),
+            slow_callback_threshold=0.02,
+        )
+        profiler.start()
+        for _ in range(3):
+            await asyncio.sleep(0.02)
+            parse_signature()
+        profiler.stop()
+        return profiler
+
+    profiler = asyncio.run(main())
+
+    # The last step is still running when the profiler stops
+    assert len(profiler.slow_callbacks.callbacks) >= 2
+    report = report_path.read_text()
+    assert "Callbacks holding the event loop over 20 ms" in report
+    assert "parse_signature" in report
+    assert "Event loop lag over" in report
+    assert pstats.Stats(str(profile_path)).total_calls > 0
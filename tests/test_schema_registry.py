@@ -0,0 +1,40 @@
+from unittest.mock import patch
+
+from sigminer.core.llm import schema_registry
+from sigminer.core.llm.schema_registry import SchemaRegistry
+
+
+def test_answer_model_is_built_once():
+    registry = SchemaRegistry()
+
+    with patch(
+        "sigminer.core.llm.schema_registry.create_dynamic_model",
+        wraps=schema_registry.create_dynamic_model,
+    ) as create:
+        for _ in range(100):
+            registry.get_answer_model()
+
+    assert create.call_count == 1
+
+
+def test_tools_are_cached_per_model():
+    registry = SchemaRegistry()
+    model = registry.get_answer_model()
+
+    tool = registry.get_tool(model)
+
+    assert registry.get_tool(model) is tool
+    assert tool["function"]["name"] == "MetaExtraction"
+    assert set(tool["function"]["parameters"]["properties"]) == {
+        "thoughtProcess",
+        "answer",
+        "confidence_score",
+    }
+
+
+def test_warm_builds_every_schema_of_a_run():
+    registry = SchemaRegistry()
+
+    registry.warm()
+
+    assert len(registry._tools) == 2
@@ -0,0 +1,117 @@
+import asyncio
+import queue
+import threading
+
+from sigminer.core.email.mirror import MailboxMirror
+from sigminer.core.extraction_engine import ExtractionEngine
+from sigminer.core.sharding import (
+    forward_shard_events,
+    get_shard_config,
+    merge_shard_contacts,
+    run_shard,
+    shard_emails,
+    subtract_counters,
+)
+
+LAUNCHER_CONFIG = {
+    "fields": [{"field_name": "company", "guideline": "", "can_be_overwritten": False}],
+    "excluded_hosts": [],
+    "include_mode": False,
+    "file_path": "contacts.csv",
+    "max_emails": None,
+    "model": "gpt-4o-mini",
+    "exclusion_guideline": None,
+}
+
+
+def make_email(address, received="2024-01-01T00:00:00Z"):
+    return {"from": {"emailAddress": {"address": address}}, "receivedDateTime": received}
+
+
+def test_shard_emails_keeps_each_sender_in_one_shard():
+    emails = [make_email(f"user{i % 7}@example.com") for i in range(50)]
+    emails.append(make_email("USER1@example.com"))
+
+    shards = shard_emails(emails, 3)
+
+    assert sum(len(shard) for shard in shards) == len(emails)
+    senders_per_shard = [
+        {email["from"]["emailAddress"]["address"].lower() for email in shard}
+        for shard in shards
+    ]
+    for i, senders in enumerate(senders_per_shard):
+        for other in senders_per_shard[i + 1 :]:
+            assert not senders & other
+    assert shards == shard_emails(emails, 3)
+
+
+def test_shard_emails_drops_empty_shards():
+    assert len(shard_emails([make_email("a@example.com")], 4)) == 1
+
+
+def test_shard_config_splits_the_budget():
+    config = {"fields": [], "budget": {"max_cost": 1.0, "max_tokens": 1000}}
+
+    shard_config = get_shard_config(config, 4)
+
+    assert shard_config["budget"] == {"max_cost": 0.25, "max_tokens": 250}
+    assert shard_config["shard_processes"] == 1
+    assert config["budget"]["max_cost"] == 1.0
+
+
+def test_merge_shard_contacts_is_order_independent():
+    existing = {"a@x.com": {"email_address": "a@x.com", "company": "Old"}}
+    shard_contacts = [
+        {"a@x.com": {"email_address": "a@x.com", "company": "New"}},
+        {"b@y.com": {"email_address": "b@y.com", "company": "Bee"}},
+    ]
+
+    merged = merge_shard_contacts(existing, shard_contacts)
+
+    assert merged == merge_shard_contacts(existing, shard_contacts[::-1])
+    assert merged["a@x.com"]["company"] == "New"
+    assert merged["b@y.com"]["company"] == "Bee"
+
+
+def test_subtract_counters_keeps_only_the_growth():
+    previous = {"total_cost": 0.5, "usage": {"gpt-4o-mini": {"requests": 2}}}
+    counters = {
+        "total_cost": 0.75,
+        "usage": {"gpt-4o-mini": {"requests": 3}, "gpt-4o": {"requests": 1}},
+    }
+
+    assert subtract_counters(counters, previous) == {
+        "total_cost": 0.25,
+        "usage": {"gpt-4o-mini": {"requests": 1}, "gpt-4o": {"requests": 1}},
+    }
+
+
+def test_shard_counters_reach_the_parent_during_the_run(tmp_path, monkeypatch):
+    async def process_email(self, email, total_emails):
+        self.total_cost += 0.25
+        self.mark_email_processed(total_emails)
+
+    closed = []
+    monkeypatch.setattr(ExtractionEngine, "process_email", process_email)
+    monkeypatch.setattr(MailboxMirror, "close", lambda self: closed.append(self.path))
+    events = queue.Queue()
+    emails = [make_email(f"user{i}@example.com") for i in range(3)]
+    mirror_path = str(tmp_path / "mirror.db")
+    shard_config = {
+        **LAUNCHER_CONFIG, "mirror_mode": "auto", "mirror_path": mirror_path
+    }
+
+    result = run_shard(
+        "token", shard_config, emails, {}, "/dev/null", events, threading.Event()
+    )
+    events.put(("done", None))
+
+    engine = ExtractionEngine("token", LAUNCHER_CONFIG, log_path="/dev/null")
+    seen = []
+    engine.on_progress = lambda progress: seen.append((progress, engine.total_cost))
+    asyncio.run(forward_shard_events(engine, events, threading.Event(), len(emails)))
+
+    assert seen == [(33, 0.25), (66, 0.5), (100, 0.75)]
+    assert engine.total_contacts_processed == 3
+    assert "stages" in result["latencies"]
+    assert [str(path) for path in closed] == [mirror_path]
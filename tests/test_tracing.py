@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from sigminer.core.tracing import Tracer, trace_attributes
+
+
+def test_stages_are_summed_without_recording_spans():
+    tracer = Tracer()
+
+    for _ in range(3):
+        with tracer.span("graph.page"):
+            pass
+
+    assert tracer.get_stages()["graph.page"]["count"] == 3
+    assert tracer.spans == []
+
+
+def test_spans_carry_context_attributes_across_threads():
+    tracer = Tracer(record_spans=True)
+
+    def fetch():
+        with tracer.span("graph.attachments") as span:
+            span["status_code"] = 200
+
+    async def process(email_id):
+        with trace_attributes(email_id=email_id), tracer.span("email.process"):
+            with trace_attributes(field="Company"):
+                await asyncio.to_thread(fetch)
+
+    async def main():
+        await asyncio.gather(process("1"), process("2"))
+
+    asyncio.run(main())
+
+    attachments = [span for span in tracer.spans if span["name"] == "graph.attachments"]
+    assert sorted(span["attributes"]["email_id"] for span in attachments) == ["1", "2"]
+    assert all(span["attributes"]["field"] == "Company" for span in attachments)
+    assert all(span["attributes"]["status_code"] == 200 for span in attachments)
+
+
+def test_failed_spans_are_marked():
+    tracer = Tracer(record_spans=True)
+
+    with pytest.raises(ValueError):
+        with tracer.span("llm.query", model="gpt-4o"):
+            raise ValueError()
+
+    assert tracer.spans[0]["status"] == "error"
+    assert tracer.spans[0]["attributes"] == {"model": "gpt-4o"}
+
+
+def test_export_chrome_trace(tmp_path):
+    tracer = Tracer(record_spans=True)
+    with tracer.span("csv.write"):
+        pass
+    path = tmp_path / "trace.json"
+
+    tracer.export(str(path), "chrome")
+
+    event = json.loads(path.read_text())["traceEvents"][0]
+    assert event["ph"] == "X"
+    assert event["name"] == "csv.write"
+    assert event["cat"] == "csv"
+
+
+def test_export_jsonl(tmp_path):
+    tracer = Tracer(record_spans=True)
+    for name in ("graph.page", "html.parse"):
+        with tracer.span(name):
+            pass
+    path = tmp_path / "trace.jsonl"
+
+    tracer.export(str(path))
+
+    names = [json.loads(line)["name"] for line in path.read_text().splitlines()]
+    assert names == ["graph.page", "html.parse"]
+
+
+def test_histograms_count_durations_per_stage_and_model():
+    tracer = Tracer()
+    tracer.add("llm.query", 0.2, "gpt-4o")
+    tracer.add("llm.query", 120.0, "gpt-4o", failed=True)
+    tracer.add("graph.page", 0.001)
+
+    other = Tracer()
+    other.add("llm.query", 0.2, "gpt-4o")
+    tracer.merge(other.get_stages(), [], other.get_histograms())
+
+    histogram = tracer.get_histograms()["llm.query"]["gpt-4o"]
+    assert histogram["count"] == 3
+    assert sum(histogram["buckets"]) == 2  # Past the last bucket
+    assert tracer.get_stages()["llm.query"]["errors"] == 1
+    assert tracer.get_histograms()["graph.page"][""]["buckets"][0] == 1